@@ -0,0 +1,146 @@
+"""Generate synthetic repositories for benchmarking sour.
+
+python benchmarks/generate.py /tmp/bench-repo --files 500 --depth 4 --fanout 4
+"""
+
+import argparse
+import os
+import random
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class RepoShape:
+    """Size and layout of a synthetic repository.
+
+    Attributes:
+        files: Number of markdown files.
+        blocks_per_file: Number of sour blocks in each markdown file.
+        depth: Depth of the directory tree.
+        fanout: Number of subdirectories per directory.
+        readmes: Number of directories with a README.md carrying a description.
+        recipes: Number of recipes in the justfile.
+        sources_per_dir: Number of plain source files per directory.
+        seed: Seed for the random placement of files and blocks.
+        age: Seconds to backdate every mtime by, so nothing looks freshly modified.
+    """
+
+    files: int = 200
+    blocks_per_file: int = 4
+    depth: int = 3
+    fanout: int = 4
+    readmes: int = 20
+    recipes: int = 50
+    sources_per_dir: int = 3
+    seed: int = 0
+    age: int = 3600
+
+
+def _directories(root: Path, depth: int, fanout: int) -> list[Path]:
+    directories = [root]
+    level = [root]
+    for d in range(depth):
+        level = [parent / f"dir{d}_{i}" for parent in level for i in range(fanout)]
+        directories.extend(level)
+    return directories
+
+
+def _justfile(recipes: int) -> str:
+    lines = ['set shell := ["bash", "-c"]', ""]
+    for i in range(recipes):
+        lines += [
+            f"[doc('Recipe number {i}')]",
+            f"[group('group{i % 5}')]",
+            f"recipe{i} target='all':",
+            f"    echo building {{{{ target }}}} {i}",
+            f"    echo done {i}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _block(rng: random.Random, directory: Path, root: Path, recipes: int) -> str:
+    if recipes and rng.random() < 0.5:
+        header = f'<!-- docs JUST recipe="recipe{rng.randrange(recipes)}" -->'
+    else:
+        target = directory.relative_to(root)
+        up = "/".join([".."] * len(target.parts)) or "."
+        path = rng.choice([".", up])
+        header = f'<!-- docs TREE path="{path}" depth={rng.randint(1, 3)} -->'
+    return f"{header}\nstale\n<!-- /docs -->"
+
+
+def generate_repo(root: Path, shape: RepoShape) -> list[Path]:
+    """Create a synthetic repository at `root`, replacing anything already there.
+
+    Every block starts out stale, so the first sync rewrites every markdown file.
+
+    Args:
+        root: Where to create the repository.
+        shape: Size and layout of the repository.
+
+    Returns:
+        The generated markdown files.
+    """
+    rng = random.Random(shape.seed)  # noqa: S311 - reproducible layouts, not secrets
+    if root.exists():
+        shutil.rmtree(root)
+    directories = _directories(root, shape.depth, shape.fanout)
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+        for i in range(shape.sources_per_dir):
+            (directory / f"module{i}.py").write_text(f"# module {i}\n")
+
+    for directory in rng.sample(directories[1:], min(shape.readmes, len(directories) - 1)):
+        (directory / "README.md").write_text(
+            f"---\ndescription: Synthetic {directory.name}\n---\n\n# {directory.name}\n"
+        )
+    if shape.recipes:
+        (root / "justfile").write_text(_justfile(shape.recipes))
+
+    files = []
+    for i in range(shape.files):
+        directory = directories[i % len(directories)]
+        blocks = [_block(rng, directory, root, shape.recipes) for _ in range(shape.blocks_per_file)]
+        path = directory / f"doc{i}.md"
+        path.write_text(f"# Document {i}\n\n" + "\n\nSome prose.\n\n".join(blocks) + "\n")
+        files.append(path)
+
+    backdate(root, shape.age)
+    return files
+
+
+def backdate(root: Path, age: int) -> None:
+    """Set the mtime of everything under `root` to `age` seconds ago."""
+    mtime = time.time() - age
+    for directory, _, names in os.walk(root, topdown=False):
+        for name in names:
+            os.utime(os.path.join(directory, name), (mtime, mtime))
+        os.utime(directory, (mtime, mtime))
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add one option per `RepoShape` field to `parser`."""
+    for name, default in asdict(RepoShape()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+
+
+def shape_from_args(args: argparse.Namespace) -> RepoShape:
+    """Build a `RepoShape` from options added by `add_shape_arguments`."""
+    return RepoShape(**{name: getattr(args, name) for name in asdict(RepoShape())})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", type=Path)
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+    files = generate_repo(args.root, shape_from_args(args))
+    print(f"Generated {len(files)} markdown files in {args.root}")
+
+
+if __name__ == "__main__":
+    main()
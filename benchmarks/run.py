@@ -0,0 +1,251 @@
+"""Time sour on a synthetic repository and compare the results against a baseline.
+
+    python benchmarks/run.py                                  # print timings
+    python benchmarks/run.py --output results.json            # also write them as JSON
+    python benchmarks/run.py --compare benchmarks/baseline.json
+    python benchmarks/run.py --files 2000 --output big.json   # any RepoShape option
+
+Every scenario runs with a cold and a warm filesystem cache. Cold runs first
+evict the repository from the OS page cache: through /proc/sys/vm/drop_caches
+when running as root, else with posix_fadvise on every file, which leaves
+directory entries cached.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+
+from generate import RepoShape, add_shape_arguments, backdate, generate_repo, shape_from_args
+
+from sour import __version__
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+# Report a regression only when a scenario is this much slower than the baseline...
+DEFAULT_TOLERANCE = 0.25
+# ...and by more than this many seconds, so millisecond noise doesn't fail runs
+MIN_DELTA = 0.005
+
+
+def evict_page_cache(root: Path) -> str:
+    """Drop `root` from the OS page cache as far as permissions allow.
+
+    Returns:
+        The method used: "drop_caches", "fadvise" or "none".
+    """
+    os.sync()
+    try:
+        Path("/proc/sys/vm/drop_caches").write_text("3\n")
+    except OSError:
+        pass
+    else:
+        return "drop_caches"
+    if not hasattr(os, "posix_fadvise"):
+        return "none"
+    for directory, _, names in os.walk(root):
+        for name in names:
+            try:
+                fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return "fadvise"
+
+
+def sour(root: Path, *args: str) -> float:
+    """Run the sour CLI in a fresh interpreter and return its wall time."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "sour.main", *args], cwd=root, capture_output=True, check=False)  # noqa: S603
+    return time.perf_counter() - start
+
+
+def _reset_sour_state() -> None:
+    """Forget everything sour memoizes in-process, as a new CLI run would."""
+    from sour.extensions import just
+    from sour.extensions.tree import set_readme_index
+    from sour.scan import set_index
+
+    set_index(None)
+    set_readme_index(None)
+    just._JUSTFILES.clear()
+
+
+def render(root: Path, name: str, options: dict[str, str]) -> float:
+    """Render one block in-process with sour's in-memory caches reset."""
+    from sour.registry import get_extension
+
+    _reset_sour_state()
+    func = get_extension(name)
+    start = time.perf_counter()
+    func("", options, root / "doc0.md")
+    return time.perf_counter() - start
+
+
+class Scenario:
+    """One timed operation.
+
+    Attributes:
+        name: Identifier used in results and baselines.
+        setup: Brings the repository into the scenario's starting state (untimed).
+        run: Performs the operation and returns its duration in seconds.
+    """
+
+    def __init__(self, name: str, setup: Callable[[], None], run: Callable[[], float]):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def scenarios(root: Path, shape: RepoShape) -> list[Scenario]:
+    """The benchmark scenarios for a repository generated from `shape` at `root`."""
+
+    def fresh() -> None:
+        generate_repo(root, shape)
+
+    def synced() -> None:
+        fresh()
+        sour(root, "sync")
+        # As if the last sync happened long ago, so the manifest trusts every stat,
+        # then sync again to record the backdated stats
+        backdate(root, shape.age)
+        sour(root, "sync")
+
+    return [
+        # Every block is stale and there is no block cache or manifest
+        Scenario("sync", fresh, lambda: sour(root, "sync")),
+        # Nothing changed since the last sync: the manifest skips every file
+        Scenario("sync-incremental", synced, lambda: sour(root, "sync")),
+        Scenario("sync-check", fresh, lambda: sour(root, "sync", "--check", "--no-cache")),
+        Scenario("clear", synced, lambda: sour(root, "clear")),
+        Scenario("render-tree", fresh, lambda: render(root, "TREE", {"path": ".", "depth": str(shape.depth)})),
+        Scenario("render-just", fresh, lambda: render(root, "JUST", {"recipe": f"recipe{max(shape.recipes - 1, 0)}"})),
+    ]
+
+
+def measure(scenario: Scenario, root: Path, repeat: int, cold: bool) -> list[float]:
+    """Time a scenario `repeat` times, evicting the page cache first if `cold`."""
+    timings = []
+    for _ in range(repeat):
+        scenario.setup()
+        if cold:
+            evict_page_cache(root)
+        else:
+            scenario.run()  # warm the page cache, then restore the starting state
+            scenario.setup()
+        timings.append(scenario.run())
+    return timings
+
+
+def run_benchmarks(shape: RepoShape, repeat: int = 3, only: list[str] | None = None) -> dict:
+    """Run every scenario cold and warm.
+
+    Args:
+        shape: The synthetic repository to benchmark on.
+        repeat: Runs per scenario; the median is reported.
+        only: Names of the scenarios to run, or None for all.
+
+    Returns:
+        Machine-readable results: metadata plus timings by "<scenario>/<cold|warm>".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="sour-bench-") as tmp:
+        root = Path(tmp) / "repo"
+        eviction = evict_page_cache(Path(tmp))
+        for scenario in scenarios(root, shape):
+            if only and scenario.name not in only:
+                continue
+            for mode in ("cold", "warm"):
+                timings = measure(scenario, root, repeat, cold=mode == "cold")
+                results[f"{scenario.name}/{mode}"] = {
+                    "median": statistics.median(timings),
+                    "min": min(timings),
+                    "runs": timings,
+                }
+    return {
+        "sour": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "eviction": eviction,
+        "shape": asdict(shape),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Compare results against a baseline.
+
+    Timings are absolute, so they are only compared with a baseline recorded on
+    the same platform and Python version; record one with `--update-baseline`.
+
+    Returns:
+        One message per scenario that got slower than the tolerance allows, or a
+        single message if the baseline can't be compared with `current`.
+    """
+    regressions = []
+    if current["shape"] != baseline["shape"]:
+        regressions.append("Baseline was recorded with a different repository shape")
+        return regressions
+    for key in ("platform", "python"):
+        if current.get(key) != baseline.get(key):
+            regressions.append(
+                f"Baseline was recorded on {key} {baseline.get(key)}, not {current.get(key)}; its timings don't apply"
+            )
+            return regressions
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        now, then = result["median"], before["median"]
+        if now > then * (1 + tolerance) and now - then > MIN_DELTA:
+            regressions.append(f"{name}: {now * 1000:.1f} ms vs {then * 1000:.1f} ms baseline ({now / then:.2f}x)")
+    return regressions
+
+
+def _print_table(current: dict, baseline: dict | None) -> None:
+    print(f"{'scenario':<28}{'median':>12}{'baseline':>12}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name) if baseline else None
+        then = f"{before['median'] * 1000:.1f} ms" if before else "-"
+        print(f"{name:<28}{result['median'] * 1000:>9.1f} ms{then:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_shape_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (the median is reported)")
+    parser.add_argument("--only", action="append", help="Run only this scenario (repeatable)")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, e.g. 0.25")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write the results to {BASELINE}")
+    args = parser.parse_args()
+
+    current = run_benchmarks(shape_from_args(args), args.repeat, args.only)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    _print_table(current, baseline)
+
+    for path in filter(None, [args.output, BASELINE if args.update_baseline else None]):
+        path.write_text(json.dumps(current, indent=2) + "\n")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.tolerance)
+        for message in regressions:
+            print(f"Regression: {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,24 @@
 __version__ = "0.1.0"
+
+# The public API, by the module defining each name. Imported on first use so
+# that `import sour` (and with it every CLI command) stays quick to start.
+_EXPORTS = {
+    "Session": "sour.session",
+    "SyncResult": "sour.session",
+    "FileResult": "sour.runner",
+    "BlockResult": "sour.runner",
+    "ExtensionTimeout": "sour.registry",
+    "ExtensionLoadError": "sour.registry",
+    "register_extension": "sour.registry",
+}
+
+__all__ = ["__version__", *_EXPORTS]
+
+
+def __getattr__(name: str) -> object:
+    if name in _EXPORTS:
+        import importlib
+
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    message = f"module 'sour' has no attribute '{name}'"
+    raise AttributeError(message)
@@ -0,0 +1,362 @@
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from sour.config import make_state_dir
+from sour.core import Body, is_streamed
+from sour.profile import span
+from sour.registry import ExtensionInfo, call_extension, call_extension_async
+
+if TYPE_CHECKING:
+    import asyncio
+
+DEFAULT_CACHE_DIR = Path(".sour") / "cache"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Bump when the on-disk entry format or key layout changes
+CACHE_FORMAT = "1"
+
+# Cached bodies larger than this are read back in chunks rather than whole
+STREAM_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+@functools.cache
+def _entry_mode() -> int:
+    """The mode a plain write would give an entry; mkstemp makes files readable by their owner only."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class BlockCache:
+    """Persistent, content-addressed cache of rendered block bodies.
+
+    Entries live in `<directory>/<key[:2]>/<key>` and are written atomically, so one
+    directory can be shared between concurrent runs and restored across CI runners.
+    Reads bump the entry's mtime; `prune` evicts least recently used entries until
+    the cache fits in `max_size` bytes.
+    """
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name: str, version: str, options: dict[str, str], fingerprint: str) -> str:
+        """Compute the cache key for one block invocation.
+
+        Args:
+            name: The extension name.
+            version: The extension version.
+            options: The options parsed from the block header.
+            fingerprint: Digest of the extension's inputs.
+
+        Returns:
+            A hex digest identifying the block's output.
+        """
+        payload = json.dumps([CACHE_FORMAT, name, version, options, fingerprint], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Body | None:
+        """Return the cached body for `key`, or None on a miss.
+
+        Bodies over `STREAM_THRESHOLD` bytes come back as an iterator of chunks.
+        """
+        entry = self._entry(key)
+        try:
+            if entry.stat().st_size > STREAM_THRESHOLD:
+                body: Body = self._read_chunks(entry.open())
+            else:
+                body = entry.read_text()
+        except OSError:
+            self.misses += 1
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(entry)
+        self.hits += 1
+        return body
+
+    @staticmethod
+    def _read_chunks(f: TextIO) -> Iterator[str]:
+        with f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+
+    def put(self, key: str, body: str) -> None:
+        """Store `body` under `key`. Failures to write are ignored: the cache is best effort."""
+        entry = self._entry(key)
+        try:
+            make_state_dir(entry.parent)
+            fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                f.write(body)
+            os.chmod(tmp, _entry_mode())
+            os.replace(tmp, entry)
+        except OSError:
+            pass
+
+    def _tee(self, key: str, chunks: Iterable[str]) -> Iterator[str]:
+        """Pass a streamed body through, storing it under `key` once it is complete.
+
+        A body that fails or is abandoned halfway is not stored.
+        """
+        entry = self._entry(key)
+        try:
+            make_state_dir(entry.parent)
+            fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-")
+        except OSError:
+            yield from chunks
+            return
+        f = os.fdopen(fd, "w")
+        complete = False
+        try:
+            for chunk in chunks:
+                if not f.closed:
+                    try:
+                        f.write(chunk)
+                    except OSError:
+                        f.close()
+                yield chunk
+            complete = not f.closed
+        finally:
+            f.close()
+            with contextlib.suppress(OSError):
+                if complete:
+                    os.chmod(tmp, _entry_mode())
+                    os.replace(tmp, entry)
+                else:
+                    os.unlink(tmp)
+
+    def _store(self, key: str, body: Body) -> Body:
+        """Store a freshly rendered body, teeing it into the cache if it is streamed."""
+        if is_streamed(body):
+            return self._tee(key, body)
+        self.put(key, body)
+        return body
+
+    def prune(self) -> int:
+        """Evict least recently used entries until the cache fits in `max_size`.
+
+        Returns:
+            The number of evicted entries.
+        """
+        entries = []
+        total = 0
+        for entry in self.directory.glob("*/*"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+            total += stat.st_size
+
+        evicted = 0
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
+
+    def key_for(self, name: str, info: ExtensionInfo, options: dict[str, str], file_path: Path) -> str | None:
+        """Compute the cache key of a block, or None if the extension is not cacheable."""
+        if info.fingerprint is None:
+            return None
+        with span(name, "fingerprint", {"file": str(file_path)}):
+            fingerprint = info.fingerprint(options, file_path)
+        return self.key(name, info.version, options, fingerprint)
+
+    def render(
+        self,
+        name: str,
+        info: ExtensionInfo,
+        content: str,
+        options: dict[str, str],
+        file_path: Path,
+        timeout: float | None = None,
+    ) -> Body:
+        """Render a block through the cache.
+
+        Extensions without a fingerprint are always called directly.
+
+        Args:
+            name: The extension name.
+            info: The registered extension.
+            content: The current block body.
+            options: The options parsed from the block header.
+            file_path: Path to the markdown file being processed.
+            timeout: Seconds the extension may run, or None for no limit.
+
+        Returns:
+            The rendered block body, or an iterable of its chunks.
+        """
+        key = self.key_for(name, info, options, file_path)
+        if key is None:
+            return call_extension(info, content, options, file_path, timeout)
+
+        body = self.get(key)
+        if body is None:
+            body = self._store(key, call_extension(info, content, options, file_path, timeout))
+        return body
+
+    async def render_async(
+        self,
+        name: str,
+        info: ExtensionInfo,
+        content: str,
+        options: dict[str, str],
+        file_path: Path,
+        timeout: float | None = None,
+    ) -> Body:
+        """Render a block through the cache from a running event loop, see `render`."""
+        import asyncio
+
+        key = await asyncio.to_thread(self.key_for, name, info, options, file_path)
+        if key is None:
+            return await call_extension_async(info, content, options, file_path, timeout)
+
+        body = await asyncio.to_thread(self.get, key)
+        if body is None:
+            body = await call_extension_async(info, content, options, file_path, timeout)
+            body = await asyncio.to_thread(self._store, key, body)
+        return body
+
+
+class RenderMemo:
+    """Bodies rendered during one run, shared by blocks making the same invocation.
+
+    Two blocks make the same invocation when they use the same pure extension
+    with the same options from the same directory, and its inputs resolve to
+    the same paths, e.g. one TREE block repeated in README.md and AGENTS.md.
+    Safe to share between threads; on an asyncio loop, identical blocks
+    rendering at the same time wait for the first one. Streamed bodies can
+    only be consumed once, so they are never shared.
+    """
+
+    def __init__(self):
+        self._inputs: dict[tuple[str, str, str], list[Path] | None] = {}
+        self._bodies: dict[str, str] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._tasks: dict[str, asyncio.Future[Body]] = {}
+        self._lock = threading.Lock()
+
+    def inputs(self, info: ExtensionInfo, options: dict[str, str], file_path: Path) -> list[Path] | None:
+        """List the paths a block reads, asking its extension once per options and file.
+
+        Returns:
+            The inputs, or None if the extension doesn't declare them.
+        """
+        if info.inputs is None:
+            return None
+        key = (info.name, json.dumps(options, sort_keys=True), os.path.abspath(file_path))
+        if key not in self._inputs:
+            self._inputs[key] = info.inputs(options, file_path)
+        return self._inputs[key]
+
+    def key(self, info: ExtensionInfo, options: dict[str, str], file_path: Path) -> str | None:
+        """Identify a block's invocation, or return None if its body can't be shared."""
+        if not info.pure or info.inputs is None:
+            return None
+        try:
+            inputs = sorted(os.path.abspath(p) for p in self.inputs(info, options, file_path) or [])
+        except Exception:
+            return None  # the block's own render reports the problem
+        payload = json.dumps(
+            [info.name, info.version, options, os.path.abspath(file_path.parent), inputs], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def render(self, key: str, compute: Callable[[], Body]) -> tuple[Body, bool]:
+        """Return the body for `key`, calling `compute` only the first time.
+
+        Failures are not remembered: the next identical block tries again.
+
+        Returns:
+            The body, and whether it was reused from an earlier block.
+        """
+        with self._lock:
+            if key in self._bodies:
+                return self._bodies[key], True
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key in self._bodies:  # rendered by another thread while we waited
+                return self._bodies[key], True
+            body = compute()
+            if not is_streamed(body):
+                self._bodies[key] = body
+            return body, False
+
+    async def render_async(self, key: str, compute: Callable[[], Awaitable[Body]]) -> tuple[Body, bool]:
+        """Async counterpart of `render`, for blocks rendered on one event loop.
+
+        Blocks waiting for a render that fails call `compute` themselves.
+        """
+        import asyncio
+
+        if key in self._bodies:
+            return self._bodies[key], True
+        task = self._tasks.get(key)
+        reused = task is not None
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(compute())
+        try:
+            body = await task
+        except Exception:
+            if not reused:
+                raise
+            failed = True
+        else:
+            failed = False
+        finally:
+            if task.done() and self._tasks.get(key) is task:
+                del self._tasks[key]
+        if failed:
+            # Failures are not shared either: this block tries again on its own
+            return await compute(), False
+        if is_streamed(body):
+            # The first block consumes the stream; the others render their own
+            return (await compute(), False) if reused else (body, False)
+        self._bodies[key] = body
+        return body, reused
+
+
+# A context variable, so runs on different threads (two sessions, say) each
+# share bodies only among their own blocks
+_RENDER_MEMO: ContextVar[RenderMemo | None] = ContextVar("sour_render_memo", default=None)
+
+
+def get_render_memo() -> RenderMemo | None:
+    """Return the memo of the current run, or None outside a run."""
+    return _RENDER_MEMO.get()
+
+
+def set_render_memo(memo: RenderMemo | None) -> Token[RenderMemo | None]:
+    """Install the memo for the current run (None stops sharing bodies).
+
+    Returns:
+        A token for `reset_render_memo`.
+    """
+    return _RENDER_MEMO.set(memo)
+
+
+def reset_render_memo(token: Token[RenderMemo | None]) -> None:
+    """Restore the memo that was current before `set_render_memo` returned `token`."""
+    _RENDER_MEMO.reset(token)
@@ -0,0 +1,222 @@
+import os
+import shutil
+import subprocess
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from sour.core import Document, parse_document
+from sour.deps import DependencyGraph, graph_key
+from sour.manifest import Manifest
+from sour.runner import block_inputs
+from sour.scan import MARKDOWN_SUFFIXES, ScanIndex
+
+
+class GitError(RuntimeError):
+    """git is missing, or one of its commands failed."""
+
+    def __init__(self, command: str, stderr: str | None = None):
+        if stderr is None:
+            message = "Could not run git: not found on PATH"
+        else:
+            message = stderr.strip() or f"git {command} failed"
+        super().__init__(message)
+
+
+def _git(*args: str, cwd: Path) -> str:
+    git = shutil.which("git")
+    if git is None:
+        raise GitError(args[0])
+    try:
+        # A resolved git binary with fixed subcommands, never a shell
+        completed = subprocess.run([git, *args], cwd=cwd, capture_output=True, text=True, check=False)  # noqa: S603
+    except OSError as e:
+        raise GitError(args[0], str(e)) from e
+    if completed.returncode != 0:
+        raise GitError(args[0], completed.stderr)
+    return completed.stdout
+
+
+def _status_entries(top: Path, base: str, staged: bool) -> list[tuple[str, str]]:
+    """The (status letter, repository path) of every changed file, untracked ones as added."""
+    if staged:
+        status = _git("diff", "--cached", "--name-status", "--no-renames", "-z", cwd=top).split("\0")
+    else:
+        status = _git("diff", "--name-status", "--no-renames", "-z", base, "--", cwd=top).split("\0")
+    # The output ends with a NUL, leaving one empty field over
+    entries = list(zip(status[0::2], status[1::2], strict=False))
+    if not staged:
+        untracked = _git("ls-files", "--others", "--exclude-standard", "--full-name", "-z", cwd=top).split("\0")
+        entries += [("A", name) for name in untracked if name]
+    return entries
+
+
+def _listing_changes(top: Path, name: str, base_dirs: set[str]) -> Iterator[Path]:
+    """The directories whose listing adding or removing `name` changed.
+
+    That is its parent, and if the parent itself was created or removed, its
+    parent's, and so on.
+    """
+    for parent in Path(name).parents:
+        yield top / parent
+        if parent == Path(".") or (parent.as_posix() in base_dirs) == (top / parent).is_dir():
+            return
+
+
+def git_changed_paths(ref: str | None = None, staged: bool = False, cwd: Path = Path(".")) -> set[Path]:
+    """Ask git which paths changed.
+
+    Args:
+        ref: Report paths that differ between `ref` and the working tree,
+            including untracked files.
+        staged: Report paths staged in the index instead.
+        cwd: Directory inside the repository.
+
+    Returns:
+        Absolute paths of added, modified and deleted files, plus the
+        directories whose listing they changed. Renames show up as a deletion
+        and an addition.
+
+    Raises:
+        GitError: If git fails, e.g. outside a repository or for an unknown ref.
+    """
+    top = Path(_git("rev-parse", "--show-toplevel", cwd=cwd).strip())
+    base = "HEAD" if staged else ref or "HEAD"
+    entries = _status_entries(top, base, staged)
+    if not entries:
+        return set()
+
+    try:
+        base_dirs = set(_git("ls-tree", "-r", "-d", "--name-only", "-z", base, cwd=top).split("\0"))
+    except GitError:
+        base_dirs = set()  # no commits yet
+    changed = set()
+    for kind, name in entries:
+        changed.add(top / name)
+        if kind != "M":
+            changed.update(_listing_changes(top, name, base_dirs))
+    return changed
+
+
+def affected_files(files: Iterable[Path], changed: Iterable[Path], manifest: Manifest | None = None) -> list[Path]:
+    """Select the markdown files a change touches.
+
+    A file is affected when it changed itself, or when one of its blocks reads
+    a changed path. Directories count as changed when their listing did, see
+    `git_changed_paths`. Block inputs come from the manifest when it has an up to date
+    record of the file, otherwise the file is parsed. Files with blocks that
+    don't declare their inputs are always selected.
+
+    Args:
+        files: The candidate markdown files.
+        changed: Paths reported as changed.
+        manifest: Manifest whose recorded inputs to reuse, if any.
+
+    Returns:
+        The affected files, sorted.
+    """
+    changed = set(changed)
+    changed_keys = {os.path.abspath(path) for path in changed}
+    graph = DependencyGraph()
+    selected = set()
+
+    for path in files:
+        if os.path.abspath(path) in changed_keys:
+            selected.add(path)
+            continue
+        try:
+            inputs = _file_inputs(path, manifest)
+        except (OSError, ValueError):
+            continue
+        if inputs is None:
+            selected.add(path)
+        else:
+            graph.update(path, [inputs])
+
+    selected.update(graph.affected(changed, listings=False))
+    return sorted(selected)
+
+
+def _file_inputs(path: Path, manifest: Manifest | None) -> list[Path] | None:
+    """The inputs of every block of `path`, recorded or read from the file.
+
+    Returns:
+        The inputs, or None if a block doesn't declare its own.
+
+    Raises:
+        OSError: If the file can't be read.
+        ValueError: If it can't be decoded or parsed.
+    """
+    inputs = manifest.inputs(path) if manifest is not None else None
+    if inputs is not None:
+        return inputs
+    per_block = block_inputs(parse_document(path.read_text()), path)
+    if any(block is None for block in per_block):
+        return None
+    return [p for block in per_block for p in block]
+
+
+def affected_documents(
+    graph: DependencyGraph, work: dict[Path, set[int] | None]
+) -> Iterator[tuple[Path, Document, set[int] | None]]:
+    """Read the files `dependent_blocks` selected, refreshing their record in `graph`.
+
+    Files that can no longer be read are forgotten. When a file's blocks or
+    their inputs changed since they were recorded, the recorded block indexes
+    may be off, so all of its blocks are selected.
+
+    Args:
+        graph: The dependency graph the blocks were selected from.
+        work: The selected blocks by file, None for all of them.
+
+    Yields:
+        Each readable file in sorted order, its parsed document and the blocks to render.
+    """
+    for path in sorted(work):
+        try:
+            document = parse_document(path.read_text())
+        except (OSError, ValueError):
+            graph.remove(path)
+            continue
+        changed = graph.update(path, block_inputs(document, path))
+        yield path, document, None if changed else work[path]
+
+
+def index_dependencies(files: Iterable[Path], graph: DependencyGraph) -> None:
+    """Read `files` and record the inputs of each of their blocks in `graph`."""
+    for path in files:
+        try:
+            document = parse_document(path.read_text())
+        except (OSError, ValueError):
+            graph.remove(path)
+            continue
+        graph.update(path, block_inputs(document, path))
+
+
+def dependent_blocks(graph: DependencyGraph, changed: Iterable[Path], index: ScanIndex) -> dict[Path, set[int] | None]:
+    """Select the blocks a change may have made stale, from the dependency graph alone.
+
+    A block is selected when it reads a changed path or lists a directory
+    that gained or lost one, and whenever its inputs are unknown. Changed
+    markdown files that discovery would process are selected whole. Nothing
+    is read but the graph, so this is cheap however large the project.
+
+    Args:
+        graph: Inputs of every block, as recorded by the last sync.
+        changed: Added, modified and deleted paths.
+        index: Scan index whose ignore rules apply to changed markdown files.
+
+    Returns:
+        The indexes of the selected blocks by file, or None to select every block.
+    """
+    changed = list(changed)
+    selected: dict[Path, set[int] | None] = {}
+    for affected in (graph.affected(changed), graph.undeclared() if changed else {}):
+        for path, blocks in affected.items():
+            selected.setdefault(path, set()).update(blocks)
+    for path in changed:
+        if path.suffix not in MARKDOWN_SUFFIXES or not path.is_file():
+            continue
+        entry = index.entry(path)
+        if entry is None or not index.is_ignored(entry):
+            selected[graph_key(path)] = None
+    return selected
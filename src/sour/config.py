@@ -0,0 +1,101 @@
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Directories never worth scanning for docs: VCS metadata, dependencies, caches
+DEFAULT_PRUNE = (
+    ".git",
+    ".hg",
+    ".svn",
+    ".sour",
+    ".venv",
+    "venv",
+    "node_modules",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".tox",
+    ".nox",
+)
+
+# The directory sour keeps its cache, manifest and other state in
+STATE_DIR = ".sour"
+
+
+@dataclass(frozen=True)
+class Config:
+    """Project settings from the `[tool.sour]` table of pyproject.toml.
+
+    Attributes:
+        prune: Directory names skipped by every filesystem scan.
+        gitignore: Whether scans honor .gitignore files.
+        extensions: Custom extensions by block name: a module name,
+            "module:function", or a path to a .py file relative to the project root.
+        timeout: Seconds any one block may take to render, or None for no limit.
+        timeouts: Budgets for the blocks of particular extensions, by block name.
+        path: The pyproject.toml the settings come from, whether or not it
+            exists; None for settings that aren't read from a file.
+    """
+
+    prune: tuple[str, ...] = DEFAULT_PRUNE
+    gitignore: bool = True
+    extensions: dict[str, str] = field(default_factory=dict)
+    timeout: float | None = None
+    timeouts: dict[str, float] = field(default_factory=dict)
+    path: Path | None = None
+
+
+def load_config(directory: Path = Path(".")) -> Config:
+    """Load the `[tool.sour]` settings from `directory/pyproject.toml`.
+
+    Missing files, tables or keys fall back to the defaults.
+
+    Args:
+        directory: The project root.
+
+    Returns:
+        The project configuration.
+    """
+    path = directory / "pyproject.toml"
+    try:
+        with path.open("rb") as f:
+            table = tomllib.load(f).get("tool", {}).get("sour", {})
+    except (OSError, tomllib.TOMLDecodeError):
+        return Config(path=path)
+
+    prune = DEFAULT_PRUNE
+    if "prune" in table:
+        prune = tuple(table["prune"])
+    if "extra_prune" in table:
+        prune += tuple(table["extra_prune"])
+    extensions = {}
+    for name, provider in table.get("extensions", {}).items():
+        module, sep, attribute = str(provider).partition(":")
+        if module.endswith(".py"):
+            module = str(directory / module)
+        extensions[name] = module + sep + attribute
+    timeout = table.get("timeout")
+    return Config(
+        prune=prune,
+        gitignore=bool(table.get("gitignore", True)),
+        extensions=extensions,
+        timeout=None if timeout is None else float(timeout),
+        timeouts={name: float(seconds) for name, seconds in table.get("timeouts", {}).items()},
+        path=path,
+    )
+
+
+def make_state_dir(directory: Path) -> None:
+    """Create `directory` and its missing parents.
+
+    A `.sour` directory created on the way gets a .gitignore ignoring all of
+    it, so sour's state never shows up as untracked files.
+
+    Raises:
+        OSError: If a directory or the .gitignore can't be written.
+    """
+    created = [p for p in (directory, *directory.parents) if p.name == STATE_DIR and not p.is_dir()]
+    directory.mkdir(parents=True, exist_ok=True)
+    for state in created:
+        (state / ".gitignore").write_text("# Created by sour automatically.\n*\n")
@@ -1,13 +1,16 @@
 import re
+from collections.abc import Awaitable, Callable, Container, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
 from pathlib import Path
-from collections.abc import Callable
+from typing import NamedTuple
+
 
 def parse_block(block: str) -> tuple[str, dict[str, str]]:
     """Parse a transform block header to extract name and options.
-    
+
     Args:
         block: The block header string, e.g. '<!-- docs TREE path="." -->'
-        
+
     Returns:
         Tuple of (transform_name, options_dict)
     """
@@ -18,63 +21,390 @@ def parse_block(block: str) -> tuple[str, dict[str, str]]:
     if content.endswith("-->"):
         content = content[:-3]
     content = content.strip()
-    
+
     # Strip 'docs' prefix
     if content.startswith("docs"):
         content = content[4:].strip()
-        
+
     parts = content.split(None, 1)
-    name = parts[0]
+    name = parts[0] if parts else ""
     options = {}
-    
+
     if len(parts) > 1:
         # Regex to match key="value", key='value', or key=value
         pattern = r'(\w+)=(?:"([^"]*)"|\'([^\']*)\'|(\S+))'
         for match in re.finditer(pattern, parts[1]):
             key = match.group(1)
             # Group 2 is double quoted, 3 is single quoted, 4 is unquoted
-            val = match.group(2) if match.group(2) is not None else \
-                  match.group(3) if match.group(3) is not None else \
-                  match.group(4)
+            val = (
+                match.group(2)
+                if match.group(2) is not None
+                else match.group(3)
+                if match.group(3) is not None
+                else match.group(4)
+            )
             options[key] = val
-            
+
     return name, options
 
+
+class Span(NamedTuple):
+    """A run of plain text in a document, as offsets into its text."""
+
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class Block:
+    """A `<!-- docs NAME ... -->` ... `<!-- /docs -->` block in a document.
+
+    Attributes:
+        name: The transform name from the header.
+        options: The options parsed from the header.
+        header: The header comment, as written.
+        body: The current content between header and footer.
+        footer: The footer comment, as written.
+        start: Offset of the header in the document text.
+        end: Offset just past the footer.
+    """
+
+    name: str
+    options: dict[str, str]
+    header: str
+    body: str
+    footer: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class Document:
+    """A markdown document split into text spans and transform blocks.
+
+    Attributes:
+        text: The original document text.
+        nodes: Text spans and blocks, in document order.
+    """
+
+    text: str
+    nodes: tuple[Span | Block, ...] = ()
+    blocks: tuple[Block, ...] = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "blocks", tuple(n for n in self.nodes if isinstance(n, Block)))
+
+    def splice(self, replacements: Mapping[int, str]) -> str:
+        """Rebuild the text with some blocks replaced.
+
+        Args:
+            replacements: New full block text (header to footer), by index into `blocks`.
+
+        Returns:
+            The new text; the original string itself if nothing is replaced.
+        """
+        if not replacements:
+            return self.text
+        parts = []
+        pos = 0
+        for i, block in enumerate(self.blocks):
+            if i in replacements:
+                parts.append(self.text[pos : block.start])
+                parts.append(replacements[i])
+                pos = block.end
+        parts.append(self.text[pos:])
+        return "".join(parts)
+
+
+def _skip_space(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _match_footer(text: str, pos: int) -> int:
+    """Return the end of a `<!-- /docs -->` footer starting at `pos`, or -1."""
+    pos = _skip_space(text, pos + 4)
+    if not text.startswith("/docs", pos):
+        return -1
+    pos = _skip_space(text, pos + 5)
+    return pos + 3 if text.startswith("-->", pos) else -1
+
+
+def _match_header(text: str, start: int, gt: int) -> tuple[int, int]:
+    """Match a `<!-- docs ... -->` header at `start`.
+
+    Args:
+        text: The document text.
+        start: Offset of a `<!--`.
+        gt: Offset of the first `>` after the previous header candidate, reused
+            while it is still ahead, since every header ends at the first `>`.
+
+    Returns:
+        The end of the header (-1 if there is none at `start`), and the new
+        `gt`, which is -1 once no `>` is left in the text.
+    """
+    q = _skip_space(text, start + 4)
+    if not text.startswith("docs", q) or q + 4 >= len(text) or not text[q + 4].isspace():
+        return -1, gt
+    q += 4
+    if gt < q:
+        gt = text.find(">", q)
+        if gt == -1:
+            return -1, -1
+    if gt - 2 - q < 2 or not text.startswith("-->", gt - 2):
+        return -1, gt
+    return gt + 1, gt
+
+
+def _find_footer(text: str, pos: int) -> tuple[int, int]:
+    """Return the start and end of the first `<!-- /docs -->` footer at or after `pos`, or (-1, -1)."""
+    while (start := text.find("<!--", pos)) != -1:
+        end = _match_footer(text, start)
+        if end != -1:
+            return start, end
+        pos = start + 4
+    return -1, -1
+
+
+def parse_document(text: str) -> Document:
+    """Tokenize markdown into text spans and transform blocks in a single pass.
+
+    A header is `<!--`, optional whitespace, `docs`, whitespace, the block
+    name and options (no `>`), then `-->`. The block runs to the first
+    following `<!-- /docs -->`; an unterminated header is left as text.
+
+    Args:
+        text: The markdown text.
+
+    Returns:
+        The parsed document.
+    """
+    nodes: list[Span | Block] = []
+    text_start = 0
+    pos = 0
+    gt = 0
+    while (start := text.find("<!--", pos)) != -1:
+        pos = start + 4
+        header_end, gt = _match_header(text, start, gt)
+        if gt == -1:
+            break
+        if header_end == -1:
+            continue
+
+        footer_start, footer_end = _find_footer(text, header_end)
+        if footer_start == -1:
+            # No footer anywhere after this header, so no later header can close either
+            break
+
+        header = text[start:header_end]
+        name, options = parse_block(header)
+        if text_start < start:
+            nodes.append(Span(text_start, start))
+        nodes.append(
+            Block(
+                name,
+                options,
+                header,
+                text[header_end:footer_start],
+                text[footer_start:footer_end],
+                start,
+                footer_end,
+            )
+        )
+        pos = text_start = footer_end
+
+    if text_start < len(text):
+        nodes.append(Span(text_start, len(text)))
+    return Document(text, tuple(nodes))
+
+
+# A block body: the whole text, or chunks of it for large generated output
+Body = str | Iterable[str]
+
+# What rendering a block produced: its new body, or the error the transform raised
+Outcome = Body | BaseException
+
+
+def is_streamed(outcome: Outcome) -> bool:
+    """Whether an outcome is a body delivered in chunks."""
+    return not isinstance(outcome, (str, BaseException))
+
+
+def strip_chunks(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield `"".join(chunks).strip()` piece by piece, holding back nothing but trailing whitespace."""
+    started = False
+    pending = ""
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        text = chunk.rstrip()
+        if not text:
+            pending += chunk
+            continue
+        if pending:
+            yield pending
+        yield text
+        pending = chunk[len(text) :]
+
+
+def block_pieces(block: Block, body: Iterable[str]) -> Iterator[str]:
+    """Yield the full text of a block with a streamed body, as `format_block` would lay it out."""
+    yield f"{block.header}\n\n"
+    yield from strip_chunks(body)
+    yield f"\n\n{block.footer}"
+
+
+def render_blocks(
+    document: Document,
+    transform_func: Callable[[str, str, dict[str, str], Path], str],
+    file_path: Path = Path("."),
+    only: Container[int] | None = None,
+) -> dict[int, Outcome]:
+    """Run a transform over the blocks of a parsed document.
+
+    Args:
+        document: The parsed document.
+        transform_func: Function to call for each block (name, current_body, options, path) -> new_content
+        file_path: Path to the file being processed (for relative path resolution)
+        only: Indexes into `document.blocks` to render; None renders every block.
+
+    Returns:
+        The outcome of each rendered block, by index into `document.blocks`.
+    """
+    outcomes: dict[int, Outcome] = {}
+    for i, block in enumerate(document.blocks):
+        if only is not None and i not in only:
+            continue
+        try:
+            outcomes[i] = transform_func(block.name, block.body, block.options, file_path)
+        except Exception as e:
+            outcomes[i] = e
+    return outcomes
+
+
+async def render_blocks_async(
+    document: Document,
+    transform_func: Callable[[str, str, dict[str, str], Path], Awaitable[str]],
+    file_path: Path = Path("."),
+    only: Container[int] | None = None,
+) -> dict[int, Outcome]:
+    """Like `render_blocks`, but render the blocks concurrently with an async transform."""
+    import asyncio
+
+    selected = [i for i in range(len(document.blocks)) if only is None or i in only]
+    results = await asyncio.gather(
+        *(
+            transform_func(document.blocks[i].name, document.blocks[i].body, document.blocks[i].options, file_path)
+            for i in selected
+        ),
+        return_exceptions=True,
+    )
+    return dict(zip(selected, results, strict=True))
+
+
+def render_document(
+    document: Document,
+    transform_func: Callable[[str, str, dict[str, str], Path], str],
+    file_path: Path = Path("."),
+    only: Container[int] | None = None,
+) -> str:
+    """Apply transforms to the blocks of a parsed document.
+
+    Only blocks whose output differs from the current text are spliced in.
+
+    Args:
+        document: The parsed document.
+        transform_func: Function to call for each block (name, current_body, options, path) -> new_content
+        file_path: Path to the file being processed (for relative path resolution)
+        only: Indexes into `document.blocks` to render; None renders every block.
+
+    Returns:
+        The new document text.
+    """
+    return splice_outcomes(document, render_blocks(document, transform_func, file_path, only))
+
+
+async def render_document_async(
+    document: Document,
+    transform_func: Callable[[str, str, dict[str, str], Path], Awaitable[str]],
+    file_path: Path = Path("."),
+    only: Container[int] | None = None,
+) -> str:
+    """Apply an async transform to the blocks of a document, rendering blocks concurrently.
+
+    Args:
+        document: The parsed document.
+        transform_func: Coroutine function called for each block (name, current_body, options, path) -> new_content
+        file_path: Path to the file being processed (for relative path resolution)
+        only: Indexes into `document.blocks` to render; None renders every block.
+
+    Returns:
+        The new document text.
+    """
+    return splice_outcomes(document, await render_blocks_async(document, transform_func, file_path, only))
+
+
+def format_block(block: Block, outcome: Outcome) -> str:
+    """The full text of a block (header to footer) with `outcome` as its body.
+
+    Errors become an inline `<!-- Error: ... -->` comment, including errors
+    raised while a streamed body is joined.
+    """
+    if is_streamed(outcome):
+        try:
+            outcome = "".join(outcome)
+        except Exception as e:
+            outcome = e
+    if isinstance(outcome, BaseException):
+        if not isinstance(outcome, Exception):
+            raise outcome
+        return f"{block.header}\n\n<!-- Error: {outcome!s} -->\n\n{block.footer}"
+    return f"{block.header}\n\n{outcome.strip()}\n\n{block.footer}"
+
+
+def splice_outcomes(document: Document, outcomes: Mapping[int, Outcome]) -> str:
+    """Splice transform results (new bodies or the errors they raised) into a document."""
+    replacements = {}
+    for i, outcome in outcomes.items():
+        block = document.blocks[i]
+        rendered = format_block(block, outcome)
+        if rendered != document.text[block.start : block.end]:
+            replacements[i] = rendered
+    return document.splice(replacements)
+
+
+def clear_document(document: Document) -> str:
+    """Clear the body of every block of a parsed document."""
+    replacements = {}
+    for i, block in enumerate(document.blocks):
+        cleared = f"{block.header}\n\n<!-- /docs -->"
+        if cleared != document.text[block.start : block.end]:
+            replacements[i] = cleared
+    return document.splice(replacements)
+
+
 def process_content(
-    content: str, 
+    content: str,
     transform_func: Callable[[str, str, dict[str, str], Path], str],
     file_path: Path = Path("."),
 ) -> str:
     """Process markdown content and apply transforms.
-    
+
     Args:
         content: The markdown content to process
         transform_func: Function to call for each block (name, current_body, options, path) -> new_content
         file_path: Path to the file being processed (for relative path resolution)
-        
+
     Returns:
         Processed content
     """
-    # Pattern to find blocks: <!-- docs NAME ... --> ... <!-- /docs -->
-    pattern = r"(<!--\s*docs\s+([^>]+)\s*-->)(.*?)(<!--\s*/docs\s*-->)"
-    
-    def replacer(match: re.Match) -> str:
-        header = match.group(1)
-        current_body = match.group(3)
-        footer = match.group(4)
-        
-        name, options = parse_block(header)
-        
-        try:
-            new_body = transform_func(name, current_body, options, file_path)
-            return f"{header}\n\n{new_body.strip()}\n\n{footer}"
-        except Exception as e:
-            return f"{header}\n\n<!-- Error: {str(e)} -->\n\n{footer}"
+    return render_document(parse_document(content), transform_func, file_path)
 
-    return re.sub(pattern, replacer, content, flags=re.DOTALL)
 
 def clear_content(content: str) -> str:
     """Clear content between transform blocks."""
-    pattern = r"(<!--\s*docs\s+[^>]+\s*-->)(.*?)(<!--\s*/docs\s*-->)"
-    return re.sub(pattern, r"\1\n\n<!-- /docs -->", content, flags=re.DOTALL)
-
+    return clear_document(parse_document(content))
@@ -0,0 +1,271 @@
+import contextlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from sour import __version__
+from sour.config import make_state_dir
+
+if TYPE_CHECKING:
+    # The client side only needs json and a socket; everything else is server side
+    import socket
+
+    from sour.main import SyncOptions
+    from sour.watch import InotifyWatcher, PollingWatcher
+
+# Relative, so it is short enough for AF_UNIX however deep the project lives
+DEFAULT_SOCKET = Path(".sour") / "daemon.sock"
+
+
+def forward(options: "SyncOptions", socket_path: Path = DEFAULT_SOCKET, out: TextIO | None = None) -> int | None:
+    """Run a sync request on the daemon serving the current directory, if any.
+
+    The daemon's output is copied to `out` as it arrives.
+
+    Args:
+        options: The sync options.
+        socket_path: The daemon's socket.
+        out: Where to write the output (default: stdout).
+
+    Returns:
+        The exit status, or None if no daemon took the request and it should
+        run in this process.
+    """
+    if not socket_path.exists():
+        return None
+    import shutil
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    out = out or sys.stdout
+    request = {
+        "version": __version__,
+        "cwd": os.getcwd(),
+        "options": options.to_json(),
+        "terminal": out.isatty(),
+        "width": shutil.get_terminal_size().columns,
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("r", encoding="utf-8") as replies:
+                for line in replies:
+                    reply = json.loads(line)
+                    if "output" in reply:
+                        out.write(reply["output"])
+                        out.flush()
+                    elif "exit" in reply:
+                        return reply["exit"]
+                    else:
+                        return None
+    except (OSError, ValueError):
+        pass
+    # No daemon listening, or it went away mid-request: syncing again is safe
+    return None
+
+
+class DaemonRunning(RuntimeError):
+    """Another daemon already serves the socket."""
+
+    def __init__(self, socket_path: Path):
+        super().__init__(f"A daemon is already listening on {socket_path}")
+        self.socket_path = socket_path
+
+
+class _Replies:
+    """File-like object that sends everything written to it as output replies."""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        self.send({"output": text})
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def send(self, reply: dict) -> None:
+        self.stream.write(json.dumps(reply) + "\n")
+
+
+class Daemon:
+    """Serves sync requests for one project, keeping its state warm between them.
+
+    Directory listings, README descriptions, parsed justfiles and imported
+    extensions survive from one request to the next. Every directory whose
+    listing is cached is watched; changes reported by the watcher invalidate
+    what depends on them before the next request runs. When pyproject.toml
+    or Python code loaded from the project changes, the daemon restarts itself.
+    """
+
+    def __init__(self, root: Path, socket_path: Path, watcher: "InotifyWatcher | PollingWatcher"):
+        self.root = root
+        self.socket_path = socket_path
+        self.watcher = watcher
+        self._code: set[str] = set()
+        self._stopped = False
+        self._restart = False
+        self._server: socket.socket | None = None
+
+    def start(self) -> None:
+        """Load the project's state, start watching it and listen on the socket.
+
+        Raises:
+            DaemonRunning: If another daemon already serves the socket.
+        """
+        import socket
+
+        from sour.config import load_config
+        from sour.extensions.tree import ReadmeIndex, set_readme_index
+        from sour.main import load_extensions
+        from sour.scan import ScanIndex, get_index, set_index
+
+        config = load_config(self.root)
+        load_extensions(config, None)
+        set_index(ScanIndex.from_config(config))
+        set_readme_index(ReadmeIndex())
+        for _ in get_index().directories(self.root):
+            pass
+        self._watch_listed()
+        for _ in get_index().directories(self.root):  # warm again, now under watch
+            pass
+        self._code = self._project_code()
+
+        if self.socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.socket_path))
+            except OSError:
+                self.socket_path.unlink()  # left behind by a daemon that died
+            else:
+                raise DaemonRunning(self.socket_path)
+            finally:
+                probe.close()
+        make_state_dir(self.socket_path.parent)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        self._server.listen()
+
+    def _project_code(self) -> set[str]:
+        root = os.path.abspath(self.root) + os.sep
+        files = (getattr(module, "__file__", None) for module in list(sys.modules.values()))
+        return {os.path.abspath(f) for f in files if f and os.path.abspath(f).startswith(root)}
+
+    def _watch_listed(self) -> None:
+        """Watch every directory with a cached listing.
+
+        A listing taken before its directory was watched may have missed a
+        change, so it is dropped.
+        """
+        from sour.extensions.tree import get_readme_index
+        from sour.scan import get_index
+
+        index = get_index()
+        for directory in self.watcher.watch(index.listed()):
+            index.invalidate(directory)
+            get_readme_index().invalidate(directory)
+
+    def refresh(self) -> bool:
+        """Apply the changes reported since the last call.
+
+        Returns:
+            False if the daemon must restart to pick them up.
+        """
+        from sour.extensions.tree import ReadmeIndex, set_readme_index
+        from sour.scan import get_index
+        from sour.watch import invalidate_paths
+
+        changed = self.watcher.poll(0, 0)
+        if changed is None:
+            # Events were lost: forget everything
+            get_index().invalidate()
+            set_readme_index(ReadmeIndex())
+            return True
+        pyproject = os.path.abspath(self.root / "pyproject.toml")
+        if any(os.path.abspath(p) in self._code or os.path.abspath(p) == pyproject for p in changed):
+            self._restart = True
+            return False
+        invalidate_paths(changed)
+        return True
+
+    def handle(self, stream: TextIO) -> None:
+        """Serve one request read from `stream`, replying on the same stream."""
+        import typer
+        from rich.console import Console
+
+        from sour import main
+
+        replies = _Replies(stream)
+        try:
+            request = json.loads(stream.readline())
+        except ValueError:
+            return
+        if request.get("version") != __version__ or request.get("cwd") != os.path.abspath(self.root):
+            replies.send({"unavailable": "the daemon serves another project or sour version"})
+            return
+        if not self.refresh():
+            replies.send({"unavailable": "restarting to reload project code or settings"})
+            return
+
+        previous = main.console, main.output
+        main.console = Console(file=replies, force_terminal=request["terminal"], width=request["width"])
+        main.output = replies
+        try:
+            main.run_sync(main.SyncOptions.from_json(request["options"]), resident=True)
+            exit_code = 0
+        except typer.Exit as e:
+            exit_code = e.exit_code
+        except Exception as e:
+            main.console.print(f"Error: {e}", markup=False)
+            exit_code = 1
+        finally:
+            main.console, main.output = previous
+            self._watch_listed()
+            self._code = self._project_code()
+        replies.send({"exit": exit_code})
+
+    def serve(self, timeout: float = 1.0) -> None:
+        """Serve requests one at a time until `stop` is called.
+
+        Changes are applied at least every `timeout` seconds, so the watcher's
+        queue doesn't overflow while the daemon is idle.
+        """
+        import select
+
+        if self._server is None:
+            message = "call start() first"
+            raise RuntimeError(message)
+        while not self._stopped and not self._restart:
+            if select.select([self._server], [], [], timeout)[0]:
+                connection, _ = self._server.accept()
+                # OSError: the client went away
+                with connection, connection.makefile("rw", encoding="utf-8") as stream, contextlib.suppress(OSError):
+                    self.handle(stream)
+            elif not self.refresh():
+                break
+
+    def stop(self) -> None:
+        """Make `serve` return."""
+        self._stopped = True
+
+    def close(self) -> None:
+        """Stop listening and remove the socket."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            with contextlib.suppress(OSError):
+                self.socket_path.unlink()
+        self.watcher.close()
+
+    @property
+    def restart_requested(self) -> bool:
+        """Whether `serve` returned because project code or settings changed."""
+        return self._restart
@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from sour import __version__
+from sour.config import make_state_dir
+
+# Which blocks read which paths, written by `sour sync` for `sour affected`
+DEFAULT_DEPENDENCIES = Path(".sour") / "deps.json"
+
+
+def graph_key(path: Path) -> Path:
+    """The name a markdown file is recorded under: relative to the current directory, as discovery names it."""
+    return Path(os.path.relpath(path)) if path.is_absolute() else path
+
+
+class DependencyGraph:
+    """Which blocks of which markdown files depend on which input paths.
+
+    Blocks whose extension doesn't declare its inputs are tracked too, as
+    depending on anything: see `undeclared`.
+    """
+
+    def __init__(self):
+        self._consumers: dict[str, set[tuple[Path, int]]] = {}
+        self._inputs: dict[Path, list[list[str] | None]] = {}
+        self._dirty = False
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self._inputs
+
+    @property
+    def files(self) -> list[Path]:
+        """The tracked markdown files."""
+        return list(self._inputs)
+
+    def update(self, path: Path, block_inputs: list[list[Path] | None]) -> bool:
+        """Record the inputs of each block of `path` (None where unknown), replacing what was known.
+
+        Returns:
+            Whether the record changed.
+        """
+        keys = [None if inputs is None else [os.path.abspath(p) for p in inputs] for inputs in block_inputs]
+        if self._inputs.get(path) == keys:
+            return False
+        self.remove(path)
+        self._add(path, keys)
+        self._dirty = True
+        return True
+
+    def _add(self, path: Path, keys: list[list[str] | None]) -> None:
+        self._inputs[path] = keys
+        for i, inputs in enumerate(keys):
+            for key in inputs or ():
+                self._consumers.setdefault(key, set()).add((path, i))
+
+    def remove(self, path: Path) -> None:
+        """Forget a markdown file."""
+        if path not in self._inputs:
+            return
+        for i, inputs in enumerate(self._inputs.pop(path)):
+            for key in inputs or ():
+                self._consumers.get(key, set()).discard((path, i))
+        self._dirty = True
+
+    def input_paths(self) -> set[Path]:
+        """Every input path of every block."""
+        return {Path(key) for key, consumers in self._consumers.items() if consumers}
+
+    def affected(self, changed: Iterable[Path], listings: bool = True) -> dict[Path, set[int]]:
+        """Map changed paths to the blocks that must be re-rendered.
+
+        A block is affected when one of its inputs changed, or when an entry
+        was added to or removed from a directory it depends on.
+
+        Args:
+            changed: The changed paths.
+            listings: Treat every changed path as a change to its parent
+                directory's listing, and to the listings above it up to the
+                first directory a block depends on, since its parents may
+                have been created or removed with it. Pass False when the
+                changed directories are already part of `changed`.
+        """
+        affected: dict[Path, set[int]] = {}
+        for path in changed:
+            key = os.path.abspath(path)
+            for candidate in self._listings(key) if listings else (key,):
+                for file_path, i in self._consumers.get(candidate, ()):
+                    affected.setdefault(file_path, set()).add(i)
+        return affected
+
+    def _listings(self, key: str) -> Iterator[str]:
+        """`key`, then its ancestors up to the first one a block depends on."""
+        yield key
+        parent = os.path.dirname(key)
+        while parent != key:
+            yield parent
+            if self._consumers.get(parent):
+                return
+            key, parent = parent, os.path.dirname(parent)
+
+    def undeclared(self) -> dict[Path, set[int]]:
+        """The blocks whose inputs are unknown, which any change may affect."""
+        undeclared: dict[Path, set[int]] = {}
+        for path, blocks in self._inputs.items():
+            for i, inputs in enumerate(blocks):
+                if inputs is None:
+                    undeclared.setdefault(path, set()).add(i)
+        return undeclared
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_DEPENDENCIES) -> "DependencyGraph":
+        """Read a graph written by `save`; missing or unreadable files give an empty one.
+
+        Markdown files are named relative to the current directory, as discovery names them.
+        """
+        graph = cls()
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return graph
+        if not isinstance(data, dict) or data.get("version") != __version__:
+            return graph
+        prefix = os.path.join(os.getcwd(), "")
+        for key, blocks in data.get("files", {}).items():
+            name = key[len(prefix) :] if key.startswith(prefix) else os.path.relpath(key)
+            graph._add(Path(name), blocks)
+        return graph
+
+    def save(self, path: Path = DEFAULT_DEPENDENCIES) -> None:
+        """Write the graph back atomically if it changed. Failures are ignored."""
+        if not self._dirty:
+            return
+        files = {os.path.abspath(file_path): blocks for file_path, blocks in self._inputs.items()}
+        try:
+            make_state_dir(path.parent)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": __version__, "files": files}, f)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._dirty = False
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from sour import __version__
+from sour.cache import DEFAULT_CACHE_DIR
+from sour.config import Config, make_state_dir
+from sour.registry import declare_extension
+
+# Packages advertise extensions as `NAME = "module"` or `NAME = "module:function"`
+ENTRY_POINT_GROUP = "sour.extensions"
+
+DEFAULT_DISCOVERY_CACHE = DEFAULT_CACHE_DIR / "extensions.json"
+
+
+def _environment_key() -> str:
+    """Digest of the import path: installing or removing a package touches its directory."""
+    stamps = []
+    for entry in sys.path:
+        try:
+            stamps.append([entry, os.stat(entry or ".").st_mtime_ns])
+        except OSError:
+            stamps.append([entry, None])
+    return hashlib.sha256(json.dumps([__version__, stamps]).encode()).hexdigest()
+
+
+def entry_point_providers(cache_path: Path | None = DEFAULT_DISCOVERY_CACHE) -> dict[str, str]:
+    """Find the extensions installed packages declare through entry points.
+
+    Scanning package metadata is slow, so the result is cached in `cache_path`
+    until the import path changes.
+
+    Args:
+        cache_path: Where to cache the result, or None to always scan.
+
+    Returns:
+        Providers by extension name.
+    """
+    key = _environment_key()
+    if cache_path is not None:
+        try:
+            cached = json.loads(cache_path.read_text())
+            if cached.get("key") == key:
+                return cached["providers"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+
+    from importlib import metadata  # slow to import, only needed on a cache miss
+
+    providers = {ep.name: ep.value for ep in metadata.entry_points(group=ENTRY_POINT_GROUP)}
+    if cache_path is not None:
+        try:
+            make_state_dir(cache_path.parent)
+            fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "providers": providers}, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return providers
+
+
+def discover_extensions(config: Config, cache_path: Path | None = DEFAULT_DISCOVERY_CACHE) -> None:
+    """Declare the extensions from installed packages and `[tool.sour.extensions]`.
+
+    Nothing is imported: each extension is loaded the first time a block uses it.
+    Project settings take precedence over installed packages.
+
+    Args:
+        config: The project configuration.
+        cache_path: Where to cache entry point discovery, or None to disable caching.
+    """
+    for name, provider in entry_point_providers(cache_path).items():
+        declare_extension(name, provider)
+    for name, provider in config.extensions.items():
+        declare_extension(name, provider)
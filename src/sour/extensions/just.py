@@ -1,7 +1,186 @@
+import hashlib
+import os
 import re
+from dataclasses import dataclass, field
 from pathlib import Path
 from textwrap import dedent
+
 from sour.registry import register_extension
+from sour.scan import get_index
+
+_RECIPE_RE = re.compile(r"^@?([A-Za-z_][\w-]*)((?:\s+[^:]*?)?)\s*:(?!=)")
+_PARAM_RE = re.compile(r"""[+*]?\$?[A-Za-z_][\w-]*(?:=(?:"[^"]*"|'[^']*'|\S+))?""")
+_ATTRIBUTE_RE = re.compile(r"""(\w+)(?:\(\s*(?:'([^']*)'|"([^"]*)")\s*\))?""")
+_IMPORT_RE = re.compile(r"""^import(\?)?\s+(?:'([^']*)'|"([^"]*)")""")
+_MOD_RE = re.compile(r"""^mod(\?)?\s+([A-Za-z_][\w-]*)(?:\s+(?:'([^']*)'|"([^"]*)"))?""")
+
+@dataclass(frozen=True)
+class Recipe:
+    """A recipe parsed from a justfile.
+
+    Attributes:
+        name: The recipe name.
+        parameters: Parameters as written, e.g. `name="World"`.
+        doc: The `[doc(...)]` attribute, if any.
+        groups: The `[group(...)]` attributes.
+        attributes: Names of all attributes, e.g. `private`.
+        code: The recipe as written: header line and body.
+        body: The dedented body (the commands the recipe runs).
+    """
+
+    name: str
+    parameters: tuple[str, ...]
+    doc: str | None
+    groups: tuple[str, ...]
+    attributes: tuple[str, ...]
+    code: str
+    body: str
+
+@dataclass(frozen=True)
+class Justfile:
+    """A parsed justfile: an index of its recipes plus its `import`s and `mod`s.
+
+    Attributes:
+        path: Path to the justfile.
+        recipes: Recipes defined in this file, by name.
+        imports: Paths of imported justfiles.
+        modules: Submodule justfile paths, by module name.
+    """
+
+    path: Path
+    recipes: dict[str, Recipe] = field(default_factory=dict)
+    imports: tuple[Path, ...] = ()
+    modules: dict[str, Path] = field(default_factory=dict)
+
+    def recipe(self, name: str) -> Recipe | None:
+        """Look up a recipe by name, following imports and `module::recipe` paths."""
+        module, sep, rest = name.partition("::")
+        if sep:
+            module_path = self.modules.get(module)
+            if module_path is None:
+                return None
+            submodule = load_justfile(module_path)
+            return submodule.recipe(rest) if submodule is not None else None
+
+        if name in self.recipes:
+            return self.recipes[name]
+        for import_path in self.imports:
+            imported = load_justfile(import_path)
+            found = imported.recipe(name) if imported is not None else None
+            if found is not None:
+                return found
+        return None
+
+    def group(self, name: str) -> list[Recipe]:
+        """Return the recipes of this file in group `name`, in file order."""
+        return [r for r in self.recipes.values() if name in r.groups]
+
+def _parse_attributes(line: str) -> list[tuple[str, str | None]]:
+    """Parse an attribute line like `[private, group('dev')]` into (name, argument) pairs."""
+    return [
+        (m.group(1), m.group(2) if m.group(2) is not None else m.group(3))
+        for m in _ATTRIBUTE_RE.finditer(line.strip()[1:-1])
+    ]
+
+def _module_path(base: Path, name: str, explicit: str | None) -> Path:
+    """Resolve the justfile of `mod name` the way just does."""
+    if explicit:
+        return base / explicit
+    for candidate in (base / f"{name}.just", base / name / "mod.just", base / name / "justfile"):
+        if candidate.exists():
+            return candidate
+    return base / f"{name}.just"
+
+def _recipe_body(lines: list[str], i: int) -> tuple[list[str], int]:
+    """Collect the indented lines of a recipe starting at line `i`, and the index after them."""
+    body_lines = []
+    while i < len(lines) and (not lines[i].strip() or lines[i][0] in " \t"):
+        body_lines.append(lines[i])
+        i += 1
+    while body_lines and not body_lines[-1].strip():
+        body_lines.pop()
+    return body_lines, i
+
+def _recipe(match: re.Match[str], body_lines: list[str], attributes: list[tuple[str, str | None]]) -> Recipe:
+    """Build a recipe from its header match, body and the attributes above it."""
+    return Recipe(
+        name=match.group(1),
+        parameters=tuple(_PARAM_RE.findall(match.group(2))),
+        doc=next((arg for key, arg in attributes if key == "doc"), None),
+        groups=tuple(arg for key, arg in attributes if key == "group" and arg is not None),
+        attributes=tuple(key for key, _ in attributes),
+        code="\n".join([match.string.rstrip(), *body_lines]),
+        body=dedent("\n".join(body_lines)).strip(),
+    )
+
+def parse_justfile(content: str, path: Path) -> Justfile:
+    """Parse justfile source into a recipe index.
+
+    Args:
+        content: The justfile source.
+        path: Path of the justfile, used to resolve imports and modules.
+
+    Returns:
+        The parsed justfile.
+    """
+    justfile = Justfile(path)
+    imports = []
+    attributes: list[tuple[str, str | None]] = []
+    lines = content.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if not line.strip() or line[0] in " \t":
+            attributes = []
+            continue
+        if line.startswith("#"):
+            continue
+        if line.startswith("["):
+            attributes.extend(_parse_attributes(line))
+            continue
+
+        if match := _IMPORT_RE.match(line):
+            imports.append(path.parent / (match.group(2) or match.group(3)))
+        elif match := _MOD_RE.match(line):
+            name = match.group(2)
+            justfile.modules[name] = _module_path(path.parent, name, match.group(3) or match.group(4))
+        elif match := _RECIPE_RE.match(line):
+            body_lines, i = _recipe_body(lines, i)
+            justfile.recipes[match.group(1)] = _recipe(match, body_lines, attributes)
+        attributes = []
+
+    return Justfile(path, justfile.recipes, tuple(imports), justfile.modules)
+
+# Parsed justfiles by absolute path, validated by (mtime_ns, size)
+_JUSTFILES: dict[str, tuple[int, int, Justfile]] = {}
+
+def load_justfile(path: Path) -> Justfile | None:
+    """Parse a justfile, reusing the cached index while the file is unchanged.
+
+    Args:
+        path: Path to the justfile.
+
+    Returns:
+        The parsed justfile, or None if it cannot be read.
+    """
+    key = os.path.abspath(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        _JUSTFILES.pop(key, None)
+        return None
+
+    cached = _JUSTFILES.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    try:
+        justfile = parse_justfile(path.read_text(), path)
+    except (OSError, ValueError):
+        return None
+    _JUSTFILES[key] = (stat.st_mtime_ns, stat.st_size, justfile)
+    return justfile
 
 def get_just_recipe(justfile_path: Path, recipe_name: str, format_str: str = "docs+command", quarto_safe: bool = False) -> str:
     """Extracts a recipe from a justfile and formats it for documentation.
@@ -17,32 +196,17 @@ def get_just_recipe(justfile_path: Path, recipe_name: str, format_str: str = "do
     Returns:
         Formatted markdown string containing the requested recipe components.
     """
-    if not justfile_path.exists():
+    justfile = load_justfile(justfile_path)
+    if justfile is None:
         return f"<!-- Error: justfile not found at {justfile_path} -->"
-        
-    content = justfile_path.read_text()
-    
-    # Regex from example.py
-    doc_pattern = rf"\[doc\('([^']+)'\)\](?:\s*\n\[group\([^\)]+\)\])?\s*\n{re.escape(recipe_name)}(?:\s|:)"
-    recipe_pattern = rf"^{re.escape(recipe_name)}(?:\s+[^:\n]*)?:.*?(?=\n\n\[|^[a-z_]|\Z)"
-    
-    doc_match = re.search(doc_pattern, content, re.MULTILINE)
-    recipe_match = re.search(recipe_pattern, content, re.MULTILINE | re.DOTALL)
-    
-    if not recipe_match:
+
+    recipe = justfile.recipe(recipe_name)
+    if recipe is None:
         return f"<!-- Error: Recipe '{recipe_name}' not found in justfile -->"
-        
-    doc_string = doc_match.group(1) if doc_match else None
-    recipe_code = recipe_match.group(0).strip()
-    
-    # Extract target_command (body)
-    lines = recipe_code.splitlines()
-    if len(lines) > 1:
-        # Join lines after the first one and dedent
-        body = "\n".join(lines[1:])
-        target_command = dedent(body).strip()
-    else:
-        target_command = ""
+
+    doc_string = recipe.doc
+    recipe_code = recipe.code
+    target_command = recipe.body
 
     # Parse formats
     # Normalize separators and split
@@ -85,7 +249,61 @@ def get_just_recipe(justfile_path: Path, recipe_name: str, format_str: str = "do
 
     return "\n\n".join(output_parts)
 
-@register_extension("JUST")
+def find_justfile(file_path: Path) -> Path:
+    """Locate the justfile for a markdown file.
+
+    Tries the file's directory, then its parent, then the current directory.
+
+    Args:
+        file_path: Path to the markdown file being processed.
+
+    Returns:
+        The first existing candidate, or the file's own directory if none exist
+        (so error messages point somewhere sensible).
+    """
+    candidates = [
+        file_path.parent / "justfile",
+        file_path.parent.parent / "justfile",
+        Path("justfile")
+    ]
+
+    # Existence checks are answered from the run's cached directory listings
+    index = get_index()
+    for p in candidates:
+        if index.entry(p) is not None:
+            return p
+
+    return file_path.parent / "justfile"
+
+def just_fingerprint(options: dict[str, str], file_path: Path) -> str:
+    """Fingerprint the inputs of a JUST block: the resolved justfile and the referenced recipe.
+
+    Edits to other recipes in the same justfile leave the fingerprint unchanged.
+    """
+    justfile_path = find_justfile(file_path)
+    justfile = load_justfile(justfile_path)
+    recipe = justfile.recipe(options.get("recipe", "")) if justfile is not None else "missing"
+    return hashlib.sha256(f"{justfile_path}:{recipe!r}".encode()).hexdigest()
+
+def just_inputs(options: dict[str, str], file_path: Path) -> list[Path]:
+    """List the inputs of a JUST block: the resolved justfile and the files it imports, transitively.
+
+    Recipes are looked up through imports of imports and nested modules, so
+    each of those files is an input too.
+    """
+    inputs = [find_justfile(file_path)]
+    seen = set(inputs)
+    for path in inputs:
+        justfile = load_justfile(path)
+        if justfile is None:
+            continue
+        for included in (*justfile.imports, *justfile.modules.values()):
+            if included not in seen:
+                seen.add(included)
+                inputs.append(included)
+    return inputs
+
+@register_extension("JUST", version="1", fingerprint=just_fingerprint, inputs=just_inputs, pure=True)
 def just_extension(content: str, options: dict[str, str], file_path: Path) -> str:
     """Sour extension to include recipes from a justfile.
 
@@ -106,25 +324,5 @@ def just_extension(content: str, options: dict[str, str], file_path: Path) -> st
     
     output_format = options.get("format", "docs+command")
     quarto_safe = options.get("quarto_safe", "false").lower() == "true"
-        
-    # Find justfile
-    # Try same dir, then parent, then root
-    candidates = [
-        file_path.parent / "justfile",
-        file_path.parent.parent / "justfile",
-        Path("justfile")
-    ]
-    
-    justfile_path = None
-    for p in candidates:
-        if p.exists():
-            justfile_path = p
-            break
-            
-    if not justfile_path:
-        # For testing purposes, if we can't find it, we might want to pass the path directly?
-        # The test `test_justfile_not_found` expects a specific error.
-        # Let's default to one of them for the error message
-        justfile_path = file_path.parent / "justfile"
-
-    return get_just_recipe(justfile_path, recipe, output_format, quarto_safe)
+
+    return get_just_recipe(find_justfile(file_path), recipe, output_format, quarto_safe)
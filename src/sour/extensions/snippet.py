@@ -0,0 +1,222 @@
+import hashlib
+import os
+import re
+from bisect import bisect_right
+from pathlib import Path
+from textwrap import dedent
+
+from sour.registry import register_extension
+
+# `sour:start name` / `sour:end name`, behind whatever comment syntax the file uses
+_MARKER_RE = re.compile(rb"sour:(start|end)[ \t]+([\w.-]+)")
+
+
+class SourceIndex:
+    """A source file read into memory, with the offsets of its lines and markers.
+
+    Built with one pass over the file; after that, any line range or marked
+    region is a single slice of its bytes.
+
+    Attributes:
+        path: Path to the file.
+        markers: Regions by marker name: the 0-based lines of the start and end
+            markers, the end being None when the region is never closed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data = path.read_bytes()
+        size = len(self._data)
+
+        # _offsets[i] is where line i starts; the last item is the end of the file
+        self._offsets = [0]
+        pos = self._data.find(b"\n")
+        while pos != -1:
+            self._offsets.append(pos + 1)
+            pos = self._data.find(b"\n", pos + 1)
+        if self._offsets[-1] != size:
+            self._offsets.append(size)
+
+        self.markers: dict[str, tuple[int, int | None]] = {}
+        self._marker_lines: set[int] = set()
+        for match in _MARKER_RE.finditer(self._data):
+            line = bisect_right(self._offsets, match.start()) - 1
+            kind, name = match.group(1), match.group(2).decode()
+            self._marker_lines.add(line)
+            if kind == b"start":
+                self.markers.setdefault(name, (line, None))
+            elif name in self.markers and self.markers[name][1] is None:
+                self.markers[name] = (self.markers[name][0], line)
+
+    @property
+    def line_count(self) -> int:
+        """The number of lines in the file."""
+        return len(self._offsets) - 1
+
+    def lines(self, start: int, end: int) -> str:
+        """Return lines `start` to `end` (1-based, inclusive), clamped to the file."""
+        start, end = max(start, 1), min(end, self.line_count)
+        if start > end:
+            return ""
+        return self._data[self._offsets[start - 1] : self._offsets[end]].decode()
+
+    def region(self, name: str) -> str | None:
+        """Return the lines between the markers of region `name`, or None if it isn't closed.
+
+        Marker lines of other regions nested inside it are left out.
+        """
+        start, end = self.markers.get(name, (0, None))
+        if end is None:
+            return None
+        nested = sorted(line for line in self._marker_lines if start < line < end)
+        parts = []
+        for line in [*nested, end]:
+            parts.append(self.lines(start + 2, line))  # from the line after `start` to `line`, 1-based
+            start = line
+        return "".join(parts)
+
+
+# Indexed source files by absolute path, validated by (mtime_ns, size), oldest first
+_SOURCES: dict[str, tuple[int, int, SourceIndex]] = {}
+# Total size of the files `_SOURCES` may hold; the oldest are dropped beyond it
+MAX_CACHED_SOURCES = 64 * 1024 * 1024
+
+
+def load_source(path: Path) -> SourceIndex | None:
+    """Index a source file, reusing the cached index while the file is unchanged.
+
+    Args:
+        path: Path to the source file.
+
+    Returns:
+        The index, or None if the file cannot be read.
+    """
+    key = os.path.abspath(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        _SOURCES.pop(key, None)
+        return None
+
+    cached = _SOURCES.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    try:
+        source = SourceIndex(path)
+    except (OSError, ValueError):
+        return None
+    _SOURCES.pop(key, None)
+    _SOURCES[key] = (stat.st_mtime_ns, stat.st_size, source)
+    total = sum(size for _, size, _ in _SOURCES.values())
+    while total > MAX_CACHED_SOURCES and len(_SOURCES) > 1:
+        _, size, _ = _SOURCES.pop(next(iter(_SOURCES)))
+        total -= size
+    return source
+
+
+def _parse_range(spec: str) -> tuple[int, int]:
+    """Parse a `lines` option: "10-20", "10-" (to the end) or "10".
+
+    Raises:
+        ValueError: If the range is malformed.
+    """
+    first, sep, last = spec.partition("-")
+    start = int(first)
+    end = (int(last) if last.strip() else 2**63) if sep else start
+    if start < 1 or end < start:
+        message = f"invalid line range '{spec}'"
+        raise ValueError(message)
+    return start, end
+
+
+def _extract(path: Path, lines: str | None, marker: str | None) -> str:
+    """Extract a line range or a marked region from a source file, see `get_snippet`.
+
+    Raises:
+        ValueError: If the file, the marker or the line range is missing or invalid.
+    """
+    source = load_source(path)
+    if source is None:
+        message = f"file not found at {path}"
+        raise ValueError(message)
+    if marker is not None:
+        text = source.region(marker)
+        if text is None:
+            message = f"Marker '{marker}' not found in {path}"
+            raise ValueError(message)
+        return text
+    if lines is not None:
+        try:
+            start, end = _parse_range(lines)
+        except ValueError as e:
+            message = f"invalid line range '{lines}'"
+            raise ValueError(message) from e
+        return source.lines(start, end)
+    return source.lines(1, source.line_count)
+
+
+def get_snippet(path: Path, lines: str | None = None, marker: str | None = None) -> str:
+    """Extract a line range or a marked region from a source file.
+
+    Args:
+        path: Path to the source file.
+        lines: Line range, e.g. "10-20" (1-based, inclusive).
+        marker: Name of a region between `sour:start name` and `sour:end name`.
+
+    Returns:
+        The extracted text, or an error comment.
+    """
+    try:
+        return _extract(path, lines, marker)
+    except ValueError as e:
+        return f"<!-- Error: {e} -->"
+
+
+def snippet_fingerprint(options: dict[str, str], file_path: Path) -> str:
+    """Fingerprint the inputs of a SNIPPET block: the source file and the extracted text.
+
+    Edits outside the extracted lines or region leave the fingerprint unchanged.
+    """
+    source_path = file_path.parent / options.get("path", "")
+    snippet = get_snippet(source_path, options.get("lines"), options.get("marker"))
+    return hashlib.sha256(f"{source_path}:{snippet}".encode()).hexdigest()
+
+
+def snippet_inputs(options: dict[str, str], file_path: Path) -> list[Path]:
+    """List the inputs of a SNIPPET block: the source file, if the block names one."""
+    if not options.get("path"):
+        return []
+    return [file_path.parent / options["path"]]
+
+
+@register_extension("SNIPPET", version="1", fingerprint=snippet_fingerprint, inputs=snippet_inputs, pure=True)
+def snippet_extension(content: str, options: dict[str, str], file_path: Path) -> str:
+    """Sour extension to embed part of a source file.
+
+    Args:
+        content: The existing content within the block (ignored).
+        options: Dictionary of options from the block header.
+            - path: Source file, relative to the markdown file (required).
+            - lines: Line range, e.g. "10-20", "10-" or "10" (default: the whole file).
+            - marker: Region between `sour:start <marker>` and `sour:end <marker>`.
+            - lang: Code fence language (default: the file's suffix).
+            - dedent: "true" or "false" (default: "true").
+        file_path: Path to the markdown file being processed.
+
+    Returns:
+        The snippet in a code fence.
+    """
+    path = options.get("path")
+    if not path:
+        return "<!-- Error: 'path' option required -->"
+    source_path = file_path.parent / path
+
+    try:
+        snippet = _extract(source_path, options.get("lines"), options.get("marker"))
+    except ValueError as e:
+        return f"<!-- Error: {e} -->"
+    if options.get("dedent", "true").lower() == "true":
+        snippet = dedent(snippet)
+    lang = options.get("lang", source_path.suffix.lstrip("."))
+    return f"```{lang}\n{snippet.rstrip()}\n```"
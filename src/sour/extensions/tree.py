@@ -1,6 +1,19 @@
-from pathlib import Path
-import yaml
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections.abc import Iterator
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+
 from sour.registry import register_extension
+from sour.scan import Entry, get_index, glob_to_regex
+
+# Frontmatter larger than this is not worth scanning for a one-line description
+MAX_FRONTMATTER_BYTES = 64 * 1024
 
 def find_readme_descriptions(root: Path) -> dict[str, str]:
     """Find all README.md files and extract directory descriptions from YAML frontmatter.
@@ -12,20 +25,315 @@ def find_readme_descriptions(root: Path) -> dict[str, str]:
         A dictionary mapping relative directory paths to their descriptions.
     """
     descriptions = {}
-    for readme in root.rglob("README.md"):
-        try:
-            content = readme.read_text()
-            if content.startswith("---\n"):
-                parts = content.split("---\n", 2)
-                if len(parts) >= 3:
-                    frontmatter = yaml.safe_load(parts[1]) or {}
-                    if "description" in frontmatter:
-                        rel_path = readme.parent.relative_to(root)
-                        descriptions[str(rel_path)] = frontmatter["description"]
-        except Exception:
-            pass
+    readmes = get_readme_index()
+    for readme in get_index().find(root, "README.md"):
+        description = readmes.description(readme.parent)
+        if description is not None:
+            descriptions[str(readme.parent.relative_to(root))] = description
     return descriptions
 
+def read_frontmatter(readme: Path) -> str | None:
+    """Return the raw YAML frontmatter of a markdown file, or None if it has none.
+
+    Only the leading lines up to the closing `---` are read.
+
+    Args:
+        readme: Path to the markdown file.
+
+    Returns:
+        The text between the opening and closing `---` lines.
+    """
+    with readme.open() as f:
+        if f.readline() != "---\n":
+            return None
+        lines = []
+        size = 0
+        for line in f:
+            if line == "---\n":
+                return "".join(lines)
+            size += len(line)
+            if size > MAX_FRONTMATTER_BYTES:
+                return None
+            lines.append(line)
+    return None
+
+def parse_description(readme: Path) -> str | None:
+    """Extract the `description` key from a README's frontmatter, if any."""
+    try:
+        raw = read_frontmatter(readme)
+        if raw is None:
+            return None
+        import yaml  # only needed once a README has frontmatter
+
+        frontmatter = yaml.safe_load(raw) or {}
+    except Exception:
+        return None
+    if isinstance(frontmatter, dict) and "description" in frontmatter:
+        return str(frontmatter["description"])
+    return None
+
+class ReadmeIndex:
+    """Memoized README.md descriptions, looked up only for directories a tree displays.
+
+    With a `store` path, descriptions are also persisted between runs and
+    revalidated against each README's mtime and size.
+    """
+
+    def __init__(self, store: Path | None = None):
+        self.store = store
+        self._memo: dict[str, str | None] = {}
+        self._persisted: dict[str, list] = {}
+        self._dirty = False
+        if store is not None:
+            with contextlib.suppress(OSError, ValueError):
+                self._persisted = json.loads(store.read_text())
+
+    def invalidate(self, directory: Path | None = None) -> None:
+        """Forget the memoized description of `directory`, or of every directory if None."""
+        if directory is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(os.path.abspath(directory), None)
+
+    def description(self, directory: Path) -> str | None:
+        """Return the description from `directory/README.md`, or None.
+
+        Args:
+            directory: The directory whose README to consult.
+
+        Returns:
+            The frontmatter description, if present.
+        """
+        key = os.path.abspath(directory)
+        if key in self._memo:
+            return self._memo[key]
+
+        description = None
+        readme = directory / "README.md"
+        entry = get_index().entry(readme)
+        if entry is not None and not entry.is_dir:
+            description = self._lookup(key, readme)
+        self._memo[key] = description
+        return description
+
+    def _lookup(self, key: str, readme: Path) -> str | None:
+        if self.store is None:
+            return parse_description(readme)
+        try:
+            stat = readme.stat()
+        except OSError:
+            return None
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        record = self._persisted.get(key)
+        if record is not None and record[:2] == stamp:
+            return record[2]
+        description = parse_description(readme)
+        self._persisted[key] = [*stamp, description]
+        self._dirty = True
+        return description
+
+    def save(self) -> None:
+        """Persist looked-up descriptions to `store`, if configured and changed."""
+        if self.store is None or not self._dirty:
+            return
+        try:
+            self.store.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.store.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._persisted, f)
+            os.replace(tmp, self.store)
+        except OSError:
+            return
+        self._dirty = False
+
+_readme_index: ReadmeIndex | None = None
+
+def get_readme_index() -> ReadmeIndex:
+    """Return the README index of the current run, creating an in-memory one if needed."""
+    global _readme_index
+    if _readme_index is None:
+        _readme_index = ReadmeIndex()
+    return _readme_index
+
+def set_readme_index(index: ReadmeIndex | None) -> None:
+    """Install the README index for the current run (None resets to a fresh in-memory one)."""
+    global _readme_index
+    _readme_index = index
+
+@lru_cache(maxsize=256)
+def exclude_matcher(patterns: tuple[str, ...]) -> re.Pattern[str] | None:
+    """Compile TREE exclude patterns into one regex over entry paths.
+
+    An entry is excluded when its path matches a pattern the way
+    `PurePath.match` does (relative patterns match from the right, one
+    component at a time), or when its name equals a pattern.
+
+    Args:
+        patterns: The exclude patterns.
+
+    Returns:
+        The compiled matcher, or None if there are no patterns.
+    """
+    alternatives = []
+    for pattern in patterns:
+        pure = PurePosixPath(pattern)
+        components = [glob_to_regex(part) for part in pure.parts if part != "/"]
+        anchor = "^/" if pure.is_absolute() else "(?:^|/)"
+        alternatives.append(anchor + "/".join(components) + r"\Z")
+        if "/" not in pattern:
+            alternatives.append("(?:^|/)" + re.escape(pattern) + r"\Z")
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives))
+
+def _children(directory: Path, exclude_patterns: list[str], include_hidden: bool, dirs_only: bool) -> list[Entry]:
+    """List the entries of `directory` a tree displays, directories first."""
+    excluded = exclude_matcher(tuple(exclude_patterns))
+    items = [
+        entry
+        for entry in get_index().visible(directory)
+        if (include_hidden or not entry.name.startswith("."))
+        and (entry.is_dir or not dirs_only)
+        and (excluded is None or excluded.search(entry.path.as_posix()) is None)
+    ]
+    items.sort(key=lambda e: not e.is_dir)  # stable: names stay sorted within each group
+    return items
+
+class TreeLine(NamedTuple):
+    """One line of a tree.
+
+    Attributes:
+        text: The formatted line.
+        entry: The entry it displays, or None for a line summarizing entries left out.
+        depth: Depth of the line, 1 for the children of the root.
+    """
+
+    text: str
+    entry: Entry | None
+    depth: int
+
+def _summary(entries: list[Entry]) -> str:
+    """Describe entries a tree leaves out, e.g. "… 2 more directories and 4,812 more files"."""
+    dirs = sum(entry.is_dir for entry in entries)
+    files = len(entries) - dirs
+    parts = []
+    if dirs:
+        parts.append(f"{dirs:,} more {'directory' if dirs == 1 else 'directories'}")
+    if files:
+        parts.append(f"{files:,} more {'file' if files == 1 else 'files'}")
+    return "… " + " and ".join(parts)
+
+class _Frame:
+    """The entries of one directory `walk_tree` is displaying, and how far it got.
+
+    Attributes:
+        items: The directory's entries.
+        shown: How many of them to display, at most `max_per_dir`.
+        truncated: Whether entries left out by `max_per_dir` get a summary line.
+        prefix: The prefix of their lines.
+        depth: Their depth.
+    """
+
+    def __init__(self, items: list[Entry], max_per_dir: int | None, summary: bool, prefix: str, depth: int):
+        self.items = items
+        self.shown = len(items) if max_per_dir is None else min(len(items), max_per_dir)
+        self.truncated = summary and self.shown < len(items)
+        self.prefix = prefix
+        self.depth = depth
+        self._next = 0
+
+    @property
+    def done(self) -> bool:
+        """Whether every entry to display was displayed."""
+        return self._next == self.shown
+
+    def take(self) -> tuple[TreeLine, str]:
+        """Display the next entry.
+
+        Returns:
+            Its line and the prefix of its children's lines.
+        """
+        entry = self.items[self._next]
+        self._next += 1
+        is_last = self.done and not self.truncated
+        line = TreeLine(f"{self.prefix}{'└── ' if is_last else '├── '}{entry.name}", entry, self.depth)
+        return line, self.prefix + ("    " if is_last else "│   ")
+
+    def rest(self) -> TreeLine | None:
+        """A line counting the entries not displayed yet, or None if there are none."""
+        if self._next == len(self.items):
+            return None
+        return TreeLine(f"{self.prefix}└── {_summary(self.items[self._next :])}", None, self.depth)
+
+def _unwind(stack: list[_Frame], summary: bool) -> Iterator[TreeLine]:
+    """Close every open directory with what it still holds, innermost first."""
+    if not summary:
+        return
+    for frame in reversed(stack):
+        line = frame.rest()
+        if line is not None:
+            yield line
+
+def walk_tree(
+    directory: Path,
+    max_depth: int = 1,
+    exclude_patterns: list[str] | None = None,
+    include_hidden: bool = False,
+    dirs_only: bool = False,
+    prefix: str = "",
+    max_entries: int | None = None,
+    max_per_dir: int | None = None,
+    summary: bool = True,
+) -> Iterator[TreeLine]:
+    """Yield the lines of a directory tree, depth first.
+
+    Iterative, so deep trees don't hit the recursion limit. Every displayed
+    directory is listed once through the scan index, whose entries already
+    know their type. Once `max_entries` lines are out, the walk stops without
+    listing any further directory.
+
+    Args:
+        directory: The directory to traverse.
+        max_depth: Maximum depth to traverse.
+        exclude_patterns: List of glob patterns to exclude.
+        include_hidden: Whether to include hidden files/directories.
+        dirs_only: Whether to list only directories.
+        prefix: The prefix string for every line (used for indentation).
+        max_entries: Maximum number of entries to display in total, or None for no limit.
+        max_per_dir: Maximum number of entries to display per directory, or None for no limit.
+        summary: Whether to end each directory with entries left out by a
+            limit with a line counting them.
+
+    Yields:
+        The tree lines.
+    """
+    if max_depth <= 0:
+        return
+    exclude_patterns = exclude_patterns or []
+
+    def frame(path: Path, prefix: str, depth: int) -> _Frame:
+        items = _children(path, exclude_patterns, include_hidden, dirs_only)
+        return _Frame(items, max_per_dir, summary, prefix, depth)
+
+    stack = [frame(directory, prefix, 1)]
+    remaining = max_entries
+    while stack:
+        top = stack[-1]
+        if top.done:
+            stack.pop()
+            if top.truncated:
+                yield top.rest()
+            continue
+        if remaining == 0:
+            yield from _unwind(stack, summary)
+            return
+        line, child_prefix = top.take()
+        yield line
+        if remaining is not None:
+            remaining -= 1
+        if line.entry.is_dir and top.depth < max_depth:
+            stack.append(frame(line.entry.path, child_prefix, top.depth + 1))
+
 def generate_tree(
     directory: Path,
     prefix: str = "",
@@ -35,7 +343,7 @@ def generate_tree(
     include_hidden: bool = False,
     dirs_only: bool = False,
 ) -> list[tuple[str, Path]]:
-    """Recursively generates a directory tree structure.
+    """Generates a directory tree structure.
 
     Args:
         directory: The directory to traverse.
@@ -51,54 +359,53 @@ def generate_tree(
         - The formatted tree line string.
         - The absolute Path object corresponding to that line.
     """
-    if exclude_patterns is None:
-        exclude_patterns = []
+    lines = walk_tree(directory, max_depth - current_depth, exclude_patterns, include_hidden, dirs_only, prefix)
+    return [(line.text, line.entry.path) for line in lines]
 
-    if current_depth >= max_depth:
-        return []
+class TreeOptions(NamedTuple):
+    """Parsed TREE block options, see `generate_tree_content`."""
 
-    lines = []
-    try:
-        items = sorted(directory.iterdir(), key=lambda p: (not p.is_dir(), p.name))
-        filtered_items = []
-        for item in items:
-            if not include_hidden and item.name.startswith("."):
-                continue
-            if dirs_only and not item.is_dir():
-                continue
-            
-            should_exclude = False
-            for pattern in exclude_patterns:
-                if item.match(pattern) or item.name == pattern:
-                    should_exclude = True
-                    break
-            if not should_exclude:
-                filtered_items.append(item)
-        
-        items = filtered_items
-
-        for i, item in enumerate(items):
-            is_last = i == len(items) - 1
-            connector = "└── " if is_last else "├── "
-            extension = "    " if is_last else "│   "
-            
-            lines.append((f"{prefix}{connector}{item.name}", item))
-            
-            if item.is_dir() and current_depth + 1 < max_depth:
-                lines.extend(
-                    generate_tree(
-                        item,
-                        prefix + extension,
-                        max_depth,
-                        current_depth + 1,
-                        exclude_patterns,
-                        include_hidden,
-                        dirs_only,
-                    )
-                )
-    except PermissionError:
-        pass
-    return lines
+    path: str
+    depth: int
+    dirs_only: bool
+    add_docs: bool
+    exclude: list[str]
+    max_entries: int | None
+    max_per_dir: int | None
+    summary: bool
+
+def _limit(options: dict[str, str], key: str) -> int | None:
+    if key not in options:
+        return None
+    value = int(options[key])
+    if value < 0:
+        message = f"{key} must not be negative"
+        raise ValueError(message)
+    return value
+
+def parse_tree_options(options: dict[str, str]) -> TreeOptions:
+    """Parse TREE block options.
+
+    Args:
+        options: Dictionary of options from the block header.
+
+    Returns:
+        The parsed options.
+
+    Raises:
+        ValueError: If a number is malformed or a limit is negative.
+    """
+    exclude = options.get("exclude", "").split(",") if options.get("exclude") else []
+    return TreeOptions(
+        path=options.get("path", "."),
+        depth=int(options.get("depth", "1")),
+        dirs_only=options.get("dirs_only", "false").lower() == "true",
+        add_docs=options.get("add_docs", "true").lower() == "true",
+        exclude=[p.strip() for p in exclude if p.strip()],
+        max_entries=_limit(options, "max_entries"),
+        max_per_dir=_limit(options, "max_per_dir"),
+        summary=options.get("summary", "true").lower() == "true",
+    )
 
 def generate_tree_content(directory: Path, options: dict[str, str]) -> str:
     """Generate the tree content string based on options.
@@ -111,48 +418,104 @@ def generate_tree_content(directory: Path, options: dict[str, str]) -> str:
             - dirs_only: "true" or "false" (default: "false").
             - add_docs: "true" or "false" (default: "true").
             - exclude: Comma-separated list of patterns to exclude.
+            - max_entries: Max entries to display in total (default: no limit).
+            - max_per_dir: Max entries to display per directory (default: no limit).
+            - summary: "true" or "false": count the entries a limit leaves out,
+              e.g. "… 4,812 more files" (default: "true").
 
     Returns:
         The generated tree string, optionally annotated with descriptions.
     """
-    path_str = options.get("path", ".")
-    depth = int(options.get("depth", "1"))
-    dirs_only = options.get("dirs_only", "false").lower() == "true"
-    add_docs = options.get("add_docs", "true").lower() == "true"
-    exclude = options.get("exclude", "").split(",") if options.get("exclude") else []
-    exclude = [p.strip() for p in exclude if p.strip()]
-    
-    target_dir = directory / path_str
+    parsed = parse_tree_options(options)
+    target_dir = directory / parsed.path
     if not target_dir.exists():
         return f"Error: Directory not found: {target_dir}"
-        
-    tree_items = [(path_str, target_dir)]
-    tree_items.extend(
-        generate_tree(target_dir, "", depth, 0, exclude, False, dirs_only)
+
+    # Annotate tree with descriptions from the README.md of each displayed directory
+    return "\n".join(
+        line if description is None else f"{line} # {description}"
+        for line, description in _tree_lines(target_dir, directory, parsed)
     )
-    
-    # Load descriptions from README.md files
-    descriptions = find_readme_descriptions(directory) if add_docs else {}
 
-    # Annotate tree with descriptions
-    annotated_lines = []
+def _walk_options(target_dir: Path, options: TreeOptions) -> Iterator[TreeLine]:
+    return walk_tree(
+        target_dir, options.depth, options.exclude, False, options.dirs_only,
+        max_entries=options.max_entries, max_per_dir=options.max_per_dir, summary=options.summary,
+    )
 
-    for line, item_path in tree_items:
-        try:
-            rel_path = item_path.relative_to(directory)
-            lookup_path = str(rel_path)
-            
-            if add_docs and lookup_path in descriptions:
-                annotated_lines.append(f"{line} # {descriptions[lookup_path]}")
-            else:
-                annotated_lines.append(line)
-        except ValueError:
-            annotated_lines.append(line)
-
-    return "\n".join(annotated_lines)
+def _tree_lines(target_dir: Path, directory: Path, options: TreeOptions) -> Iterator[tuple[str, str | None]]:
+    """Yield each line of a tree with its directory's description, if any.
+
+    Only directories inside `directory` are described.
+    """
+    root_described = options.add_docs and target_dir.is_relative_to(directory) and get_index().is_dir(target_dir)
+    yield options.path, get_readme_index().description(target_dir) if root_described else None
+    for line in _walk_options(target_dir, options):
+        entry = line.entry
+        described = options.add_docs and entry is not None and entry.is_dir and entry.path.is_relative_to(directory)
+        yield line.text, get_readme_index().description(entry.path) if described else None
+
+def tree_fingerprint(options: dict[str, str], file_path: Path) -> str:
+    """Fingerprint the inputs of a TREE block.
+
+    Covers the directory listing the tree displays, the README description
+    of every displayed directory and the project's ignore settings.
+
+    Args:
+        options: Dictionary of options from the block header.
+        file_path: Path to the markdown file being processed.
+
+    Returns:
+        A hex digest of the block's inputs.
+    """
+    parsed = parse_tree_options(options)
+    target_dir = file_path.parent / parsed.path
+    index = get_index()
+    digest = hashlib.sha256(repr((str(target_dir), sorted(index.prune), index.gitignore)).encode())
+    if not target_dir.is_dir():
+        return digest.hexdigest()
+
+    for line, description in _tree_lines(target_dir, file_path.parent, parsed):
+        digest.update(f"{line}\n{description}\n".encode())
+    return digest.hexdigest()
+
+def tree_inputs(options: dict[str, str], file_path: Path) -> list[Path]:
+    """List the inputs of a TREE block.
+
+    These are the directories whose listings the tree displays, the
+    .gitignore files that filter them, the file the project's ignore settings
+    come from and, with add_docs, the README.md of every displayed directory.
+
+    Args:
+        options: Dictionary of options from the block header.
+        file_path: Path to the markdown file being processed.
+
+    Returns:
+        The paths the block depends on.
+    """
+    parsed = parse_tree_options(options)
+    target_dir = file_path.parent / parsed.path
+    index = get_index()
+    inputs = [target_dir, *index.ignore_files(target_dir)]
+    if index.settings is not None:
+        inputs.append(index.settings)
+    if parsed.add_docs:
+        inputs.append(target_dir / "README.md")
+
+    for line in _walk_options(target_dir, parsed):
+        entry = line.entry
+        if entry is None or not entry.is_dir:
+            continue
+        if parsed.add_docs:
+            inputs.append(entry.path / "README.md")
+        if line.depth < parsed.depth:
+            inputs.append(entry.path)
+            if index.gitignore:
+                inputs.append(entry.path / ".gitignore")
+    return inputs
 
 # This function matches the signature expected by the registry
-@register_extension("TREE")
+@register_extension("TREE", version="1", fingerprint=tree_fingerprint, inputs=tree_inputs, pure=True)
 def tree_extension(content: str, options: dict[str, str], file_path: Path) -> str:
     """Sour extension to generate a directory tree.
 
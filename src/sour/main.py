@@ -1,22 +1,51 @@
 import typer
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-from typing import Annotated
-from rich.console import Console
+from typing import Annotated, NoReturn, TextIO
 
 from sour import __version__
-from sour.core import process_content, clear_content
-from sour.registry import get_extension
-# Importing these modules registers the extensions via decorators
-import sour.extensions.tree
-import sour.extensions.just
+from sour.cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE, BlockCache
+from sour.config import Config, load_config
+from sour.deps import DEFAULT_DEPENDENCIES, DependencyGraph
+from sour.manifest import DEFAULT_MANIFEST, Manifest
+from sour.profile import DEFAULT_PROFILE_OUTPUT, Profiler, Span, profiled, summarize, write_trace
+from sour.report import OutputFormat, Reporter
+from sour.runner import Executor, FileResult, SyncSettings, clear_worker, run_files, stream_sync
+from sour.scan import ScanIndex, get_index, set_index
+from sour.shard import DEFAULT_COSTS
+# Extensions, git and watch support are imported on first use to keep startup fast
 
 app = typer.Typer(help="Sour: Auto-sync dynamic content in markdown files")
-console = Console()
 
-def load_extensions():
-    # Built-ins are registered on import
-    # TODO: Load custom extensions from pyproject.toml
-    pass
+
+class _LazyConsole:
+    """Stand-in for the rich console that imports rich on first use."""
+
+    def __getattr__(self, name: str):
+        global console
+        from rich.console import Console
+
+        console = Console()
+        return getattr(console, name)
+
+
+console = _LazyConsole()
+
+# Where --quiet and --format jsonl records go (None: stdout); the daemon points it at its client
+output: TextIO | None = None
+
+_EXCLUSIVE_CHANGES = "--changed-since and --staged are mutually exclusive"
+
+
+def load_extensions(config: Config, cache_dir: Path | None) -> None:
+    """Declare custom extensions from installed packages and `[tool.sour.extensions]`.
+
+    Built-ins are always declared. Extensions are imported only when a block uses them.
+    """
+    from sour.discovery import discover_extensions
+
+    discover_extensions(config, None if cache_dir is None else cache_dir / "extensions.json")
 
 
 @app.callback()
@@ -24,7 +53,6 @@ def callback():
     """
     Sour: A tool for maintaining dynamic markdown documentation.
     """
-    load_extensions()
 
 
 @app.command()
@@ -33,122 +61,751 @@ def version():
     console.print(f"Sour version: {__version__}")
 
 
+JobsOption = Annotated[int, typer.Option("--jobs", "-j", help="Number of parallel workers (0 = one per CPU)", min=0)]
+ExecutorOption = Annotated[
+    Executor, typer.Option("--executor", help="Worker pool for --jobs ('thread' suits I/O-bound extensions)")
+]
+ConcurrencyOption = Annotated[
+    int,
+    typer.Option(
+        "--concurrency", "-c", envvar="SOUR_CONCURRENCY", help="Maximum number of blocks rendered at once", min=1
+    ),
+]
+TimeoutOption = Annotated[
+    float | None,
+    typer.Option(
+        "--timeout",
+        envvar="SOUR_TIMEOUT",
+        help="Seconds any one block may render; slower blocks keep their body",
+    ),
+]
+QuietOption = Annotated[bool, typer.Option("--quiet", "-q", help="Only report changed files and a one-line summary")]
+FormatOption = Annotated[
+    OutputFormat, typer.Option("--format", help="Report format; 'jsonl' prints one JSON record per changed file")
+]
+
+
+def _reporter(command: str, quiet: bool, output_format: OutputFormat) -> Reporter | None:
+    """The terse reporter for --quiet and --format jsonl, or None for the default rich output."""
+    if quiet or output_format is OutputFormat.JSONL:
+        return Reporter(command, output_format, output)
+    return None
+
+
+def _error(message: str, reporter: Reporter | None) -> None:
+    if reporter is not None:
+        reporter.error(message)
+    else:
+        console.print(f"[red]Error: {message}[/red]")
+
+
+def _fail(message: str, reporter: Reporter | None) -> NoReturn:
+    """Report an error that ends the run.
+
+    Raises:
+        typer.Exit: Always, with status 1.
+    """
+    _error(message, reporter)
+    if reporter is not None:
+        reporter.flush()
+    raise typer.Exit(1)
+
+
+def _report_file(path: Path, action: str, warnings: list[str], reporter: Reporter | None) -> None:
+    """Report a file that was updated or would be, and its warnings; see `_action`."""
+    if reporter is not None:
+        if action in ("updated", "would-update") or warnings:
+            reporter.file(path, action, warnings)
+        return
+    for warning in warnings:
+        console.print(f"[yellow]Warning: {warning}[/yellow]")
+    if action == "would-update":
+        console.print(f"[yellow]Would modify: {path}[/yellow]")
+    elif action == "updated":
+        console.print(f"[green]✓ Updated {path}[/green]")
+
+
+def _finish(counts: dict[str, int], check: bool, reporter: Reporter | None, **extra: int | str) -> None:
+    """Report the totals of a sync run.
+
+    Raises:
+        typer.Exit: With status 1 when a --check run found files to update.
+    """
+    if reporter is None:
+        _print_results(counts.get("processed", 0), counts.get("modified", 0), check)
+        return
+    reporter.summary(**counts, **extra)
+    if check and counts.get("modified"):
+        raise typer.Exit(1)
+
+
+def _action(result: FileResult, check: bool) -> str:
+    """How a sync report names what happened to a file."""
+    if result.skipped:
+        return "skipped"
+    if not result.changed:
+        return "unchanged"
+    return "would-update" if check else "updated"
+
+
+def _print_results(processed: int, modified: int, check: bool) -> None:
+    """Print the closing summary of a sync run.
+
+    Raises:
+        typer.Exit: With status 1 when a --check run found files to update.
+    """
+    console.print()
+    console.print("[bold]Results:[/bold]")
+    console.print(f"  Files processed: {processed}")
+    console.print(f"  Files modified: {modified}")
+
+    if check and modified:
+        console.print()
+        console.print("[yellow]Run without --check to apply changes[/yellow]")
+        raise typer.Exit(1)
+
+    if not check and modified:
+        console.print()
+        console.print("[green]✓ All transforms applied successfully[/green]")
+
+
+def _dependencies_path(manifest_path: Path) -> Path:
+    """Where the dependency graph lives: next to the manifest."""
+    return manifest_path.with_name(DEFAULT_DEPENDENCIES.name)
+
+
+def discover_files(
+    target_paths: list[Path],
+    config: Config | None = None,
+    index: ScanIndex | None = None,
+    reporter: Reporter | None = None,
+) -> Iterator[Path]:
+    """Lazily discover the markdown files to process from files and directories.
+
+    Files come in a deterministic order: target by target, and in sorted path
+    order under each directory. Missing targets are reported right away;
+    directories are walked as the files are consumed, through the scan
+    index, so later README lookups and tree renders reuse the listings.
+
+    Args:
+        target_paths: Markdown files and directories.
+        config: The project configuration, loaded if None.
+        index: Scan index to reuse; if None, a fresh one is installed for the run.
+        reporter: Where to report missing paths, if not the console.
+    """
+    if index is None:
+        config = config or load_config()
+        index = ScanIndex.from_config(config)
+        set_index(index)
+    targets = []
+    for path in target_paths:
+        if not path.exists():
+            _error(f"Path not found: {path}", reporter)
+        elif path.is_file() or path.is_dir():
+            targets.append(path)
+    return index.markdown_targets(targets)
+
+
+def collect_files(
+    target_paths: list[Path],
+    config: Config | None = None,
+    index: ScanIndex | None = None,
+    reporter: Reporter | None = None,
+) -> set[Path]:
+    """Collect the markdown files to process from files and directories, see `discover_files`."""
+    return set(discover_files(target_paths, config, index, reporter))
+
+
+@dataclass(frozen=True)
+class SyncOptions:
+    """Options of `sour sync`, in a form that can be forwarded to the daemon."""
+
+    files: list[Path]
+    check: bool = False
+    verbose: bool = False
+    no_cache: bool = False
+    cache_dir: Path = DEFAULT_CACHE_DIR
+    manifest_path: Path = DEFAULT_MANIFEST
+    cache_max_size: int = DEFAULT_MAX_SIZE
+    jobs: int = 1
+    executor: Executor = Executor.PROCESS
+    concurrency: int = 1
+    changed_since: str | None = None
+    staged: bool = False
+    profile: bool = False
+    profile_output: Path = DEFAULT_PROFILE_OUTPUT
+    profile_top: int = 10
+    quiet: bool = False
+    output_format: OutputFormat = OutputFormat.TEXT
+    timeout: float | None = None
+    shard: str | None = None
+    report_path: Path | None = None
+    costs_path: Path = DEFAULT_COSTS
+
+    def to_json(self) -> dict:
+        """Convert to JSON-compatible values."""
+        data = {}
+        for key, value in asdict(self).items():
+            if isinstance(value, Path):
+                value = str(value)
+            elif key == "files":
+                value = [str(path) for path in value]
+            data[key] = value
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> "SyncOptions":
+        """Inverse of `to_json`."""
+        options = cls(**data)
+        return replace(
+            options,
+            files=[Path(path) for path in options.files],
+            cache_dir=Path(options.cache_dir),
+            manifest_path=Path(options.manifest_path),
+            executor=Executor(options.executor),
+            profile_output=Path(options.profile_output),
+            output_format=OutputFormat(options.output_format),
+            report_path=None if options.report_path is None else Path(options.report_path),
+            costs_path=Path(options.costs_path),
+        )
+
+
 @app.command()
 def sync(
     files: Annotated[list[Path] | None, typer.Argument(help="Markdown files or directories to process")] = None,
     check: Annotated[bool, typer.Option("--check", help="Dry-run: check if files would be modified")] = False,
     verbose: Annotated[bool, typer.Option("--verbose", "-v", help="Show detailed output")] = False,
+    no_cache: Annotated[
+        bool, typer.Option("--no-cache", help="Always re-run extensions (ignore the block cache and manifest)")
+    ] = False,
+    cache_dir: Annotated[
+        Path,
+        typer.Option("--cache-dir", envvar="SOUR_CACHE_DIR", help="Block cache directory (shareable between runs)"),
+    ] = DEFAULT_CACHE_DIR,
+    manifest_path: Annotated[
+        Path, typer.Option("--manifest", envvar="SOUR_MANIFEST", help="Manifest of files in sync after the last run")
+    ] = DEFAULT_MANIFEST,
+    cache_max_size: Annotated[
+        int, typer.Option("--cache-max-size", envvar="SOUR_CACHE_MAX_SIZE", help="Block cache size limit in bytes")
+    ] = DEFAULT_MAX_SIZE,
+    jobs: JobsOption = 1,
+    executor: ExecutorOption = Executor.PROCESS,
+    concurrency: ConcurrencyOption = 1,
+    changed_since: Annotated[
+        str | None,
+        typer.Option("--changed-since", metavar="REF", help="Only sync files affected by changes since a git ref"),
+    ] = None,
+    staged: Annotated[bool, typer.Option("--staged", help="Only sync files affected by staged changes")] = False,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Time discovery, parsing, extension calls and writes")
+    ] = False,
+    profile_output: Annotated[
+        Path, typer.Option("--profile-output", help="Chrome trace file written by --profile")
+    ] = DEFAULT_PROFILE_OUTPUT,
+    profile_top: Annotated[
+        int, typer.Option("--profile-top", help="Slowest files and blocks listed by --profile")
+    ] = 10,
+    no_daemon: Annotated[
+        bool,
+        typer.Option("--no-daemon", envvar="SOUR_NO_DAEMON", help="Run in this process even if a daemon is running"),
+    ] = False,
+    quiet: QuietOption = False,
+    output_format: FormatOption = OutputFormat.TEXT,
+    timeout: TimeoutOption = None,
+    shard: Annotated[
+        str | None,
+        typer.Option("--shard", metavar="I/N", envvar="SOUR_SHARD", help="Only sync shard I of N of the files"),
+    ] = None,
+    report_path: Annotated[
+        Path | None, typer.Option("--report", help="Write a report for `sour merge-reports` to this file")
+    ] = None,
+    costs_path: Annotated[
+        Path, typer.Option("--costs", envvar="SOUR_COSTS", help="Per-file costs balancing --shard, if the file exists")
+    ] = DEFAULT_COSTS,
 ):
     """Auto-sync dynamic content in markdown files."""
-    target_paths = files if files else [Path(".")]
-    files_to_process = set()
+    if changed_since is not None and staged:
+        raise typer.BadParameter(_EXCLUSIVE_CHANGES)
+    if shard is not None:
+        from sour.shard import Shard
 
-    for path in target_paths:
-        if not path.exists():
-            console.print(f"[red]Error: Path not found: {path}[/red]")
-            continue
-        
-        if path.is_file():
-            files_to_process.add(path)
-        elif path.is_dir():
-            files_to_process.update(path.rglob("*.md"))
-            files_to_process.update(path.rglob("*.qmd"))
+        try:
+            Shard.parse(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--shard") from e
 
-    if not files_to_process:
-        console.print("[yellow]No files found to process.[/yellow]")
-        raise typer.Exit(0)
+    options = SyncOptions(
+        files=files if files else [Path(".")],
+        check=check,
+        verbose=verbose,
+        no_cache=no_cache,
+        cache_dir=cache_dir,
+        manifest_path=manifest_path,
+        cache_max_size=cache_max_size,
+        jobs=jobs,
+        executor=executor,
+        concurrency=concurrency,
+        changed_since=changed_since,
+        staged=staged,
+        profile=profile,
+        profile_output=profile_output,
+        profile_top=profile_top,
+        quiet=quiet,
+        output_format=output_format,
+        timeout=timeout,
+        shard=shard,
+        report_path=report_path,
+        costs_path=costs_path,
+    )
+    if not no_daemon:
+        from sour.daemon import forward
+
+        exit_code = forward(options)
+        if exit_code is not None:
+            raise typer.Exit(exit_code)
+    run_sync(options)
+
+
+def run_sync(options: SyncOptions, resident: bool = False) -> None:
+    """Run `sour sync` in this process.
+
+    Args:
+        options: The command's options.
+        resident: Reuse the installed scan and README indexes, as the daemon
+            does, instead of starting from scratch.
+
+    Raises:
+        typer.Exit: With status 1 when --check finds files to update.
+    """
+    from sour.extensions.tree import ReadmeIndex, get_readme_index, set_readme_index
+
+    no_cache, cache_dir = options.no_cache, options.cache_dir
+    reporter = _reporter("sync", options.quiet, options.output_format)
+    config = load_config()
+    load_extensions(config, None if no_cache else cache_dir)
+    profiler = Profiler() if options.profile else None
+    # Directories are listed as the files are consumed, so that is what gets timed
+    files = profiled(
+        discover_files(options.files, config, get_index() if resident else None, reporter),
+        profiler,
+        "discover",
+        "discovery",
+    )
+
+    manifest = None if no_cache else Manifest(options.manifest_path)
+    dependencies = None if no_cache else DependencyGraph.load(_dependencies_path(options.manifest_path))
+    files, digests = _select_files(options, files, manifest, reporter)
+    settings = SyncSettings(
+        options.check,
+        None if no_cache else cache_dir,
+        options.cache_max_size,
+        concurrency=options.concurrency,
+        profile=options.profile,
+        timeout=options.timeout if options.timeout is not None else config.timeout,
+        timeouts=config.timeouts,
+    )
+    if resident:
+        readmes = get_readme_index()
+    else:
+        readmes = ReadmeIndex(None if no_cache else cache_dir / "readmes.json")
+        set_readme_index(readmes)
+
+    run = _SyncRun(options, reporter, digests)
+    for result in stream_sync(files, settings, options.jobs, options.executor, manifest, dependencies=dependencies):
+        run.add(result)
+
+    readmes.save()
+    if manifest is not None:
+        manifest.save()
+    if dependencies is not None:
+        dependencies.save(_dependencies_path(options.manifest_path))
+    if not run.counts["processed"]:
+        _nothing_to_do(options, reporter, "No files found to process.", digests)
+    if settings.cache_dir is not None:
+        BlockCache(settings.cache_dir, settings.cache_max_size).prune()
+    run.finish(profiler)
 
-    modified_files = []
 
-    def transform_resolver(name: str, body: str, options: dict[str, str], path: Path) -> str:
+def _select_files(
+    options: SyncOptions, files: Iterable[Path], manifest: Manifest | None, reporter: Reporter | None
+) -> tuple[Iterable[Path], dict[str, str]]:
+    """Narrow the discovered files down to those changed since --changed-since or --staged, and to --shard.
+
+    Returns:
+        The files, and with --shard the `split_digests` they were split by.
+    """
+    if options.changed_since is not None or options.staged:
+        from sour.changes import affected_files, git_changed_paths
+
         try:
-            func = get_extension(name)
-            return func(body, options, path)
-        except KeyError:
-             console.print(f"[yellow]Warning: Unknown extension '{name}' in {path}[/yellow]")
-             raise
-
-    for file_path in sorted(files_to_process):
-        if verbose:
-            console.print(f"[cyan]Processing {file_path}...[/cyan]")
-
-        original_content = file_path.read_text()
-        new_content = process_content(original_content, transform_resolver, file_path)
-
-        if new_content != original_content:
-            modified_files.append(file_path)
-            if check:
-                console.print(f"[yellow]Would modify: {file_path}[/yellow]")
-            else:
-                file_path.write_text(new_content)
-                console.print(f"[green]✓ Updated {file_path}[/green]")
-        else:
-            if verbose:
-                console.print(f"[dim]  No changes needed for {file_path}[/dim]")
+            changed = git_changed_paths(options.changed_since, options.staged)
+        except RuntimeError as e:
+            _fail(str(e), reporter)
+        # Finding the files affected by a change takes all of them at once
+        discovered = set(files)
+        if not discovered:
+            _nothing_to_do(options, reporter, "No files found to process.")
+        files = sorted(affected_files(discovered, changed, manifest))
+        if not files:
+            _nothing_to_do(options, reporter, "No files affected by the changes.")
+    if options.shard is None:
+        return files, {}
+    from sour.shard import Shard, load_costs, partition, split_digests
 
-    # Summary
-    console.print()
-    console.print("[bold]Results:[/bold]")
-    console.print(f"  Files processed: {len(files_to_process)}")
-    console.print(f"  Files modified: {len(modified_files)}")
+    # Every shard discovers the same files and splits them the same way;
+    # the report records what they were split by for merge-reports to compare
+    files, costs = list(files), load_costs(options.costs_path)
+    return partition(files, Shard.parse(options.shard), costs), split_digests(files, costs)
 
-    if check and modified_files:
-        console.print()
-        console.print("[yellow]Run without --check to apply changes[/yellow]")
-        raise typer.Exit(1)
 
-    if not check and modified_files:
-        console.print()
-        console.print("[green]✓ All transforms applied successfully[/green]")
+class _SyncRun:
+    """Reports the results of a sync run as they stream in, keeping only totals.
+
+    Attributes:
+        counts: The run's totals, as in the `--format jsonl` summary.
+        spans: The spans recorded while syncing each file, with --profile.
+        records: The report records of each file, with --report.
+        digests: What the files were split by, with --shard.
+    """
+
+    def __init__(self, options: SyncOptions, reporter: Reporter | None, digests: dict[str, str]):
+        self.options = options
+        self.reporter = reporter
+        self.digests = digests
+        self.counts = dict.fromkeys(("processed", "modified", "skipped", "cache_hits", "cache_misses", "reused"), 0)
+        self.spans: list[Span] = []
+        self.records: list[dict] = []
+
+    def add(self, result: FileResult) -> None:
+        """Count and report one file."""
+        check, verbose = self.options.check, self.options.verbose and self.reporter is None
+        self.counts["processed"] += 1
+        self.counts["modified"] += result.changed
+        self.counts["skipped"] += result.skipped
+        self.counts["cache_hits"] += result.cache_hits
+        self.counts["cache_misses"] += result.cache_misses
+        self.counts["reused"] += result.reused
+        self.spans.extend(result.spans)
+        if self.options.report_path is not None:
+            self.records.append(_report_record(result, check))
+
+        if verbose and result.skipped:
+            console.print(f"[dim]  Unchanged since last sync: {result.path}[/dim]")
+        elif verbose:
+            console.print(f"[cyan]Processing {result.path}...[/cyan]")
+        _report_file(result.path, _action(result, check), result.warnings, self.reporter)
+        if verbose and not result.skipped and not result.changed:
+            console.print(f"[dim]  No changes needed for {result.path}[/dim]")
+
+    def finish(self, profiler: Profiler | None) -> None:
+        """Report the profile and the totals, and save the --report.
+
+        Raises:
+            typer.Exit: With status 1 when --check found files to update.
+        """
+        options, counts = self.options, self.counts
+        if options.verbose and self.reporter is None:
+            if not options.no_cache:
+                console.print(f"[dim]  Block cache: {counts['cache_hits']} hits, {counts['cache_misses']} misses[/dim]")
+            console.print(f"[dim]  Identical blocks reused: {counts['reused']}[/dim]")
+
+        extra = {}
+        if profiler is not None:
+            spans = [*profiler.spans, *self.spans]
+            write_trace(spans, options.profile_output)
+            extra["trace"] = str(options.profile_output)
+            if self.reporter is None:
+                console.print()
+                console.print("[bold]Profile:[/bold]")
+                for line in summarize(spans, options.profile_top):
+                    console.print(line, markup=False, highlight=False, soft_wrap=True)
+                console.print(f"[dim]  Trace written to {options.profile_output}[/dim]")
+
+        _save_report(options, self.records, counts, self.digests)
+        _finish(counts, options.check, self.reporter, **extra)
+
+
+def _nothing_to_do(
+    options: SyncOptions, reporter: Reporter | None, message: str, digests: dict[str, str] | None = None
+) -> None:
+    """End a sync run that has no files to process.
+
+    Raises:
+        typer.Exit: Always, with status 0.
+    """
+    _save_report(options, [], {"processed": 0, "modified": 0}, digests or {})
+    if reporter is not None:
+        reporter.summary(processed=0, modified=0)
+    else:
+        console.print(f"[yellow]{message}[/yellow]")
+    raise typer.Exit(0)
+
+
+def _report_record(result: FileResult, check: bool) -> dict:
+    """A file's record in the report of `sync --report`."""
+    from sour.shard import shard_key
+
+    return {
+        "path": shard_key(result.path),
+        "action": _action(result, check),
+        "warnings": result.warnings,
+        "seconds": result.seconds,
+    }
+
+
+def _save_report(options: SyncOptions, records: list[dict], counts: dict[str, int], digests: dict[str, str]) -> None:
+    """Write the run's report for `sour merge-reports`, if --report asked for one."""
+    if options.report_path is None:
+        return
+    from sour.shard import Shard, ShardReport
+
+    shard = None if options.shard is None else Shard.parse(options.shard)
+    ShardReport(shard, options.check, records, counts, digests).save(options.report_path)
+
+
+@app.command("merge-reports")
+def merge_reports(
+    reports: Annotated[list[Path], typer.Argument(help="Reports written by `sync --report`, one per shard")],
+    costs_path: Annotated[
+        Path | None,
+        typer.Option("--write-costs", metavar="PATH", help="Record per-file costs for balancing later --shard runs"),
+    ] = None,
+    quiet: QuietOption = False,
+    output_format: FormatOption = OutputFormat.TEXT,
+):
+    """Combine the reports of a sharded `sync` into its overall result."""
+    from sour.shard import ShardReport, load_costs, report_costs, save_costs
+    from sour.shard import merge_reports as merge
+
+    reporter = _reporter("merge-reports", quiet, output_format)
+    try:
+        merged = merge([ShardReport.load(path) for path in reports])
+    except ValueError as e:
+        _fail(str(e), reporter)
+    if costs_path is not None:
+        save_costs(report_costs(merged, load_costs(costs_path)), costs_path)
+
+    for record in merged.files:
+        _report_file(Path(record["path"]), record["action"], record["warnings"], reporter)
+    _finish(merged.counts, merged.check, reporter, shards=len(reports))
+
+
+@app.command()
+def affected(
+    paths: Annotated[list[Path], typer.Argument(help="Changed files and directories, e.g. as passed by pre-commit")],
+    check: Annotated[bool, typer.Option("--check", help="Dry-run: check if files would be modified")] = False,
+    verbose: Annotated[bool, typer.Option("--verbose", "-v", help="Show detailed output")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always re-run extensions")] = False,
+    cache_dir: Annotated[
+        Path,
+        typer.Option("--cache-dir", envvar="SOUR_CACHE_DIR", help="Block cache directory (shareable between runs)"),
+    ] = DEFAULT_CACHE_DIR,
+    manifest_path: Annotated[
+        Path,
+        typer.Option(
+            "--manifest",
+            envvar="SOUR_MANIFEST",
+            help="Manifest of the last sync, beside which the dependency graph is kept",
+        ),
+    ] = DEFAULT_MANIFEST,
+    quiet: QuietOption = False,
+    output_format: FormatOption = OutputFormat.TEXT,
+    timeout: TimeoutOption = None,
+):
+    """Re-render only the blocks that depend on changed paths.
+
+    Dependents are looked up in the dependency graph `sour sync` keeps, so
+    nothing else is read. Without one, every markdown file is read once to
+    build it.
+    """
+    from sour.changes import affected_documents, dependent_blocks, index_dependencies
+    from sour.extensions.tree import ReadmeIndex, set_readme_index
+    from sour.runner import sync_document
+
+    reporter = _reporter("affected", quiet, output_format)
+    config = load_config()
+    load_extensions(config, None if no_cache else cache_dir)
+    index = ScanIndex.from_config(config)
+    set_index(index)
+    readmes = ReadmeIndex(None if no_cache else cache_dir / "readmes.json")
+    set_readme_index(readmes)
+
+    dependencies_path = _dependencies_path(manifest_path)
+    graph = DependencyGraph.load(dependencies_path)
+    if not graph.files:
+        index_dependencies(discover_files([Path(".")], config, index, reporter), graph)
+    work = dependent_blocks(graph, paths, index)
+
+    settings = SyncSettings(
+        check,
+        None if no_cache else cache_dir,
+        timeout=timeout if timeout is not None else config.timeout,
+        timeouts=config.timeouts,
+    )
+    counts = {"processed": 0, "modified": 0}
+    for path, document, only in affected_documents(graph, work):
+        result = sync_document(path, document, settings, only)
+        counts["processed"] += 1
+        counts["modified"] += result.changed
+        if verbose and reporter is None:
+            blocks = "all blocks" if only is None else f"{len(only)} of {len(document.blocks)} blocks"
+            console.print(f"[cyan]Processing {path} ({blocks})...[/cyan]")
+        _report_file(path, _action(result, check), result.warnings, reporter)
+
+    readmes.save()
+    graph.save(dependencies_path)
+    if not counts["processed"] and reporter is None:
+        console.print("[dim]No blocks depend on the changed paths.[/dim]")
+        return
+    _finish(counts, check, reporter)
+
 
 @app.command()
 def clear(
     files: Annotated[list[Path] | None, typer.Argument(help="Markdown files or directories to clear")] = None,
     check: Annotated[bool, typer.Option("--check", help="Dry-run: check what would be cleared")] = False,
+    jobs: JobsOption = 1,
+    executor: ExecutorOption = Executor.PROCESS,
+    quiet: QuietOption = False,
+    output_format: FormatOption = OutputFormat.TEXT,
 ):
     """Clear all content between transform comment blocks."""
+    reporter = _reporter("clear", quiet, output_format)
     target_paths = files if files else [Path(".")]
-    files_to_process = set()
-
-    for path in target_paths:
-        if not path.exists():
-            console.print(f"[red]Error: Path not found: {path}[/red]")
-            continue
-        
-        if path.is_file():
-            files_to_process.add(path)
-        elif path.is_dir():
-            files_to_process.update(path.rglob("*.md"))
-            files_to_process.update(path.rglob("*.qmd"))
+    files_to_process = collect_files(target_paths, reporter=reporter)
 
     if not files_to_process:
-        console.print("[yellow]No files found to process.[/yellow]")
+        if reporter is not None:
+            reporter.summary(processed=0, modified=0)
+        else:
+            console.print("[yellow]No files found to process.[/yellow]")
         raise typer.Exit(0)
 
-    modified_files = []
+    modified = 0
+    for result in run_files(clear_worker(check), sorted(files_to_process), jobs, executor):
+        modified += result.changed
+        _report_cleared(result, check, reporter)
+    _clear_summary(len(files_to_process), modified, check, reporter)
 
-    for file_path in sorted(files_to_process):
-        content = file_path.read_text()
-        new_content = clear_content(content)
 
-        if new_content != content:
-            modified_files.append(file_path)
-            if check:
-                console.print(f"[yellow]Would clear: {file_path}[/yellow]")
-            else:
-                file_path.write_text(new_content)
-                console.print(f"[green]✓ Cleared {file_path}[/green]")
-        else:
-            console.print(f"[dim]No transform blocks found in {file_path}[/dim]")
+def _report_cleared(result: FileResult, check: bool, reporter: Reporter | None) -> None:
+    """Report what clearing did to one file."""
+    if reporter is not None:
+        if result.changed:
+            reporter.file(result.path, "would-clear" if check else "cleared")
+    elif not result.changed:
+        console.print(f"[dim]No transform blocks found in {result.path}[/dim]")
+    elif check:
+        console.print(f"[yellow]Would clear: {result.path}[/yellow]")
+    else:
+        console.print(f"[green]✓ Cleared {result.path}[/green]")
+
 
-    # Summary
+def _clear_summary(processed: int, modified: int, check: bool, reporter: Reporter | None) -> None:
+    """Report the closing summary of a clear run."""
+    if reporter is not None:
+        reporter.summary(processed=processed, modified=modified)
+        return
     console.print()
-    if check and modified_files:
+    if check and modified:
         console.print("[yellow]Run without --check to apply changes[/yellow]")
-    elif not check and modified_files:
+    elif not check and modified:
         console.print("[green]✓ All blocks cleared successfully[/green]")
     else:
         console.print("[dim]No changes needed[/dim]")
 
+
+@app.command()
+def watch(
+    files: Annotated[list[Path] | None, typer.Argument(help="Markdown files or directories to keep in sync")] = None,
+    poll: Annotated[bool, typer.Option("--poll", help="Poll for changes instead of using inotify")] = False,
+    debounce_ms: Annotated[
+        int, typer.Option("--debounce-ms", help="Collect changes for this long before re-rendering")
+    ] = 20,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always re-run extensions")] = False,
+    cache_dir: Annotated[
+        Path,
+        typer.Option("--cache-dir", envvar="SOUR_CACHE_DIR", help="Block cache directory (shareable between runs)"),
+    ] = DEFAULT_CACHE_DIR,
+    concurrency: ConcurrencyOption = 1,
+    timeout: TimeoutOption = None,
+):
+    """Watch markdown files and their inputs, re-rendering affected blocks on change."""
+    from sour.extensions.tree import ReadmeIndex, set_readme_index
+    from sour.watch import PollingWatcher, WatchSession, create_watcher
+
+    target_paths = files if files else [Path(".")]
+    for path in target_paths:
+        if not path.exists():
+            console.print(f"[red]Error: Path not found: {path}[/red]")
+            raise typer.Exit(1)
+
+    config = load_config()
+    load_extensions(config, None if no_cache else cache_dir)
+    set_index(ScanIndex.from_config(config))
+    set_readme_index(ReadmeIndex())
+
+    def report(result: FileResult) -> None:
+        for warning in result.warnings:
+            console.print(f"[yellow]Warning: {warning}[/yellow]")
+        if result.changed:
+            console.print(f"[green]✓ Updated {result.path}[/green]")
+
+    watcher = create_watcher(poll)
+    settings = SyncSettings(
+        cache_dir=None if no_cache else cache_dir,
+        concurrency=concurrency,
+        timeout=timeout if timeout is not None else config.timeout,
+        timeouts=config.timeouts,
+    )
+    session = WatchSession(target_paths, settings, watcher, report)
+    for result in session.start():
+        report(result)
+    mode = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    console.print(f"[cyan]Watching {len(session.graph.files)} files ({mode}). Press Ctrl+C to stop.[/cyan]")
+    try:
+        session.run(debounce=debounce_ms / 1000)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+@app.command()
+def daemon(
+    poll: Annotated[bool, typer.Option("--poll", help="Poll for changes instead of using inotify")] = False,
+):
+    """Serve sync requests from this directory, keeping scans and extensions warm.
+
+    `sour sync` run from the same directory hands its work to the daemon and
+    falls back to running in-process when none is listening.
+    """
+    import os
+    import signal
+    import sys
+
+    from sour.daemon import DEFAULT_SOCKET, Daemon
+    from sour.watch import create_watcher
+
+    server = Daemon(Path("."), DEFAULT_SOCKET, create_watcher(poll))
+    try:
+        server.start()
+    except (OSError, RuntimeError) as e:
+        server.close()
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1) from None
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    console.print(f"[cyan]Serving sync requests on {DEFAULT_SOCKET}. Press Ctrl+C to stop.[/cyan]")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    if server.restart_requested:
+        console.print("[cyan]Project code or settings changed, restarting...[/cyan]")
+        os.execv(sys.executable, sys.orig_argv)  # noqa: S606 - the same interpreter and arguments
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sour import __version__
+from sour.config import make_state_dir
+from sour.registry import get_extension_info
+
+DEFAULT_MANIFEST = Path(".sour") / "manifest.json"
+
+# Files modified this close to when they were recorded may be edited again
+# without their mtime changing (coarse filesystem timestamps), so their
+# content hash is verified instead of trusting the stat.
+RACY_WINDOW_NS = 2_000_000_000
+
+Stamp = list[int] | None
+
+
+@dataclass
+class FileState:
+    """What the manifest records about a synced file.
+
+    Attributes:
+        stat: The file's stamp after the sync.
+        sha256: Hash of the file's content after the sync.
+        extensions: Versions of the extensions its blocks use, by name.
+        inputs: Stamps of every block input, taken before rendering.
+        blocks: The inputs of each block, in document order.
+    """
+
+    stat: list[int]
+    sha256: str
+    extensions: dict[str, str]
+    inputs: dict[str, Stamp]
+    blocks: list[list[str]] = field(default_factory=list)
+
+
+def stamp(path: Path | str) -> Stamp:
+    """Return the (mtime_ns, size) stamp of a path, or None if it does not exist.
+
+    For directories the mtime changes whenever an entry is added, removed or renamed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def digest(content: str) -> str:
+    """Content hash recorded for each synced file."""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _extensions_current(versions: dict[str, str]) -> bool:
+    """Whether every extension is still registered at the recorded version."""
+    try:
+        return all(get_extension_info(name).version == version for name, version in versions.items())
+    except KeyError:
+        return False
+
+
+class Manifest:
+    """Stat-based record of files that were up to date after the last sync.
+
+    For each file it stores its stat, content hash, the extension versions its
+    blocks use and the stamps of every block input. A file whose stat and
+    recorded input stamps are unchanged is skipped without being read.
+    """
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self._dirty = False
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == __version__:
+            self.entries = data.get("files", {})
+
+    def is_fresh(self, path: Path) -> bool:
+        """Whether `path` is known to be in sync without reading or rendering it.
+
+        Args:
+            path: The markdown file.
+
+        Returns:
+            True if the file and all of its blocks' inputs are unchanged since it was recorded.
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        current = stamp(path)
+        if current is None or current != entry["stat"]:
+            return False
+
+        if not _extensions_current(entry["extensions"]):
+            return False
+        if any(stamp(input_path) != recorded for input_path, recorded in entry["inputs"].items()):
+            return False
+        return not entry["racy"] or self._verify_racy(path, entry, current)
+
+    def _verify_racy(self, path: Path, entry: dict, current: list[int]) -> bool:
+        """Compare a file recorded too soon after it was written against its recorded digest."""
+        try:
+            if digest(path.read_text()) != entry["sha256"]:
+                return False
+        except (OSError, ValueError):
+            return False
+        if current[0] + RACY_WINDOW_NS < time.time_ns():
+            # Old enough now that any further edit will change the mtime
+            entry["racy"] = False
+            self._dirty = True
+        return True
+
+    def inputs(self, path: Path) -> list[Path] | None:
+        """The recorded inputs of `path`, or None if the record is missing or out of date."""
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None or stamp(path) != entry["stat"]:
+            return None
+        return [Path(key) for key in entry["inputs"]]
+
+    def block_inputs(self, path: Path) -> list[list[Path]] | None:
+        """The recorded inputs of each block of `path`, or None if the record is missing."""
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None or "blocks" not in entry:
+            return None
+        return [[Path(key) for key in block] for block in entry["blocks"]]
+
+    def record(self, path: Path, state: FileState) -> None:
+        """Record that `path` is in sync.
+
+        Files whose inputs were modified too recently to be trusted are not recorded.
+
+        Args:
+            path: The markdown file.
+            state: The file's state after the sync.
+        """
+        now = time.time_ns()
+        if any(s is not None and s[0] + RACY_WINDOW_NS >= now for s in state.inputs.values()):
+            self.forget(path)
+            return
+        self.entries[os.path.abspath(path)] = {
+            "stat": state.stat,
+            "sha256": state.sha256,
+            "extensions": state.extensions,
+            "inputs": state.inputs,
+            "blocks": state.blocks,
+            "racy": state.stat[0] + RACY_WINDOW_NS >= now,
+        }
+        self._dirty = True
+
+    def forget(self, path: Path) -> None:
+        """Drop the record of `path`."""
+        if self.entries.pop(os.path.abspath(path), None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the manifest back if it changed. Failures are ignored."""
+        if not self._dirty:
+            return
+        try:
+            make_state_dir(self.path.parent)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": __version__, "files": self.entries}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            return
+        self._dirty = False
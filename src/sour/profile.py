@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sour.config import make_state_dir
+from sour.registry import ExtensionInfo, add_extension_hook
+
+DEFAULT_PROFILE_OUTPUT = Path(".sour") / "profile.json"
+
+
+@dataclass
+class Span:
+    """One timed step of a run.
+
+    Attributes:
+        name: What ran, e.g. the extension name or "parse".
+        category: The kind of step: "discovery", "file", "read", "parse", "import",
+            "fingerprint", "extension" or "write".
+        start_ns: Monotonic start time, comparable across worker processes.
+        wall_ns: Wall time.
+        cpu_ns: CPU time of the thread that ran the step.
+        bytes_read: Bytes read by the process during the step.
+        bytes_written: Bytes written by the process during the step.
+        pid: Process that ran the step.
+        tid: Thread that ran the step.
+        args: Details such as the file being processed.
+    """
+
+    name: str
+    category: str
+    start_ns: int
+    wall_ns: int
+    cpu_ns: int
+    bytes_read: int
+    bytes_written: int
+    pid: int
+    tid: int
+    args: dict[str, str] = field(default_factory=dict)
+
+
+def _io_counters() -> tuple[int, int]:
+    """Bytes read and written by this process so far (Linux only; zeros elsewhere).
+
+    The counters are per process, so steps running concurrently in other
+    threads are counted too.
+    """
+    try:
+        with open("/proc/self/io", "rb") as f:
+            counters = dict(line.split(b":", 1) for line in f.read().splitlines())
+        return int(counters[b"rchar"]), int(counters[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+class Profiler:
+    """Collects spans. Safe to share between threads."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str, category: str, args: dict[str, str] | None = None) -> Iterator[None]:
+        """Time the body of the `with` statement as one span."""
+        read, written = _io_counters()
+        cpu = time.thread_time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter_ns() - start
+            cpu = time.thread_time_ns() - cpu
+            read_after, written_after = _io_counters()
+            self.spans.append(
+                Span(
+                    name,
+                    category,
+                    start,
+                    wall,
+                    cpu,
+                    read_after - read,
+                    written_after - written,
+                    os.getpid(),
+                    threading.get_native_id(),
+                    args or {},
+                )
+            )
+
+
+_CURRENT: ContextVar[Profiler | None] = ContextVar("sour_profiler", default=None)
+
+
+def span(name: str, category: str, args: dict[str, str] | None = None) -> AbstractContextManager:
+    """Record a span on the current profiler, or do nothing when not profiling."""
+    profiler = _CURRENT.get()
+    if profiler is None:
+        return nullcontext()
+    return profiler.span(name, category, args)
+
+
+def profiled[T](items: Iterable[T], profiler: Profiler | None, name: str, category: str) -> Iterable[T]:
+    """Time the production of each item of a lazy iterable as a span of `profiler`.
+
+    Lazy work such as discovery happens wherever the items are consumed, often
+    on another thread, so the spans go to `profiler` rather than the current one.
+    """
+    if profiler is None:
+        return items
+    return _profiled(iter(items), profiler, name, category)
+
+
+def _profiled[T](items: Iterator[T], profiler: Profiler, name: str, category: str) -> Iterator[T]:
+    while True:
+        with profiler.span(name, category):
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def profiling(enabled: bool = True) -> Iterator[Profiler | None]:
+    """Make a new profiler current for the body of the `with` statement.
+
+    The profiler follows the context into threads started with
+    `asyncio.to_thread` and into asyncio tasks.
+
+    Args:
+        enabled: If False, yield None and record nothing.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = Profiler()
+    token = _CURRENT.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _CURRENT.reset(token)
+
+
+def _extension_span(info: ExtensionInfo, options: dict[str, str], file_path: Path) -> AbstractContextManager:
+    rendered = " ".join(f'{key}="{value}"' for key, value in options.items())
+    return span(info.name, "extension", {"file": str(file_path), "options": rendered})
+
+
+# Every extension call goes through the registry, so built-in and custom
+# extensions alike show up in profiles
+add_extension_hook(_extension_span)
+
+
+def summarize(spans: list[Span], top: int = 10) -> list[str]:
+    """Describe where the time went.
+
+    Args:
+        spans: The recorded spans.
+        top: Number of slowest files and blocks to list.
+
+    Returns:
+        Report lines: totals per step (per extension for extension calls),
+        then the slowest files and blocks.
+    """
+    totals: dict[str, list[int]] = {}
+    for s in spans:
+        label = f"{s.category} {s.name}" if s.category == "extension" else s.category
+        total = totals.setdefault(label, [0, 0, 0, 0, 0])
+        for i, value in enumerate((1, s.wall_ns, s.cpu_ns, s.bytes_read, s.bytes_written)):
+            total[i] += value
+
+    lines = [f"{'step':<32}{'count':>7}{'wall ms':>11}{'cpu ms':>10}{'read KiB':>11}{'written KiB':>13}"]
+    for label, (count, wall, cpu, read, written) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(
+            f"{label:<32}{count:>7}{wall / 1e6:>11.1f}{cpu / 1e6:>10.1f}{read / 1024:>11.1f}{written / 1024:>13.1f}"
+        )
+
+    for title, category in (("files", "file"), ("blocks", "extension")):
+        slowest = sorted((s for s in spans if s.category == category), key=lambda s: -s.wall_ns)[:top]
+        if not slowest:
+            continue
+        lines += ["", f"Slowest {title}:"]
+        for s in slowest:
+            what = s.name if category == "file" else f"{s.name} {s.args.get('options', '')} in {s.args.get('file', '')}"
+            lines.append(f"  {s.wall_ns / 1e6:>9.1f} ms  {what}")
+    return lines
+
+
+def write_trace(spans: list[Span], path: Path) -> None:
+    """Export spans in the Chrome trace event format (chrome://tracing, Perfetto).
+
+    CPU time and byte counts are attached to each event's args.
+    """
+    origin = min((s.start_ns for s in spans), default=0)
+    events = [
+        {
+            "name": s.name,
+            "cat": s.category,
+            "ph": "X",
+            "ts": (s.start_ns - origin) / 1000,
+            "dur": s.wall_ns / 1000,
+            "pid": s.pid,
+            "tid": s.tid,
+            "args": {**s.args, "cpu_ms": s.cpu_ns / 1e6, "bytes_read": s.bytes_read, "bytes_written": s.bytes_written},
+        }
+        for s in spans
+    ]
+    make_state_dir(path.parent)
+    path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
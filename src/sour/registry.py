@@ -1,24 +1,295 @@
-from collections.abc import Callable
+import contextvars
+import importlib
+import importlib.util
+import inspect
+import sys
+import threading
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import AbstractContextManager, ExitStack
+from dataclasses import dataclass
 from pathlib import Path
 
-# Type alias for extension functions
-ExtensionFunc = Callable[[str, dict[str, str], Path], str]
+from sour.core import Body
 
-_EXTENSIONS: dict[str, ExtensionFunc] = {}
+# Type alias for extension functions. Large outputs may be returned as an iterable
+# of chunks, which is streamed to the file; `async def` extensions return an awaitable.
+ExtensionFunc = Callable[[str, dict[str, str], Path], str | Iterable[str] | Awaitable[str]]
+
+# Type alias for fingerprint functions: (options, file_path) -> digest of the extension's inputs
+FingerprintFunc = Callable[[dict[str, str], Path], str]
+
+# Type alias for inputs functions: (options, file_path) -> files and directories the extension reads
+InputsFunc = Callable[[dict[str, str], Path], list[Path]]
+
+
+@dataclass(frozen=True)
+class ExtensionInfo:
+    """A registered extension and the metadata sour needs to cache its output.
+
+    Attributes:
+        func: The extension function.
+        version: Version string, bumped whenever the extension's output format changes.
+        fingerprint: Optional function returning a digest of everything the extension reads.
+            Only extensions with a fingerprint are cached.
+        inputs: Optional function listing the paths the extension reads. A directory
+            input means the block depends on that directory's listing.
+        name: The block name the extension is registered under.
+        pure: Whether the output depends only on the options and the contents of
+            the declared inputs, not on the block's current body or anything else.
+            Identical invocations of a pure extension are computed once per run.
+    """
+
+    func: ExtensionFunc
+    version: str = "0"
+    fingerprint: FingerprintFunc | None = None
+    inputs: InputsFunc | None = None
+    name: str = ""
+    pure: bool = False
+
+    @property
+    def is_async(self) -> bool:
+        """Whether the extension is an `async def` function."""
+        return inspect.iscoroutinefunction(self.func)
+
+
+# Hooks wrapping every extension call: (info, options, file_path) -> context manager
+ExtensionHook = Callable[[ExtensionInfo, dict[str, str], Path], AbstractContextManager]
+
+_HOOKS: list[ExtensionHook] = []
+
+
+def add_extension_hook(hook: ExtensionHook) -> None:
+    """Wrap every extension call, built-in or custom, in the context manager `hook` returns.
+
+    Hooks are entered in the order they were added, e.g. to time or trace extensions.
+    """
+    _HOOKS.append(hook)
+
+
+def remove_extension_hook(hook: ExtensionHook) -> None:
+    """Stop calling a hook added with `add_extension_hook`."""
+    _HOOKS.remove(hook)
+
+
+def _hooked(info: ExtensionInfo, options: dict[str, str], file_path: Path) -> ExitStack:
+    stack = ExitStack()
+    for hook in _HOOKS:
+        stack.enter_context(hook(info, options, file_path))
+    return stack
+
+
+class ExtensionTimeout(TimeoutError):
+    """An extension ran past its time budget."""
+
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"Extension '{name}' timed out after {timeout:g}s")
+        self.name = name
+        self.timeout = timeout
+
+
+class ExtensionLoadError(KeyError):
+    """A declared extension's provider failed to import."""
+
+    def __init__(self, name: str, provider: str, error: BaseException):
+        super().__init__(f"Extension '{name}' could not be loaded from {provider}: {error}")
+        self.name = name
+        self.provider = provider
+
+
+def _call_in_thread(
+    info: ExtensionInfo, content: str, options: dict[str, str], file_path: Path, timeout: float
+) -> Body:
+    """Run a sync extension on a daemon thread, giving up on it after `timeout` seconds.
+
+    Python can't stop a thread, so one that times out is abandoned: it may
+    finish in the background, but nothing waits for it, not even interpreter exit.
+    """
+    outcome: dict[str, object] = {}
+
+    def target() -> None:
+        try:
+            outcome["body"] = info.func(content, options, file_path)
+        except BaseException as e:
+            outcome["error"] = e
+
+    context = contextvars.copy_context()  # keep the profiler and other context in the worker
+    worker = threading.Thread(target=context.run, args=(target,), name=f"sour-{info.name}", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise ExtensionTimeout(info.name, timeout)
+    if "error" in outcome:
+        raise outcome["error"]  # type: ignore[misc]
+    return outcome["body"]  # type: ignore[return-value]
+
+
+async def _await_with_timeout(
+    info: ExtensionInfo, content: str, options: dict[str, str], file_path: Path, timeout: float | None
+) -> str:
+    """Await an async extension, cancelling it after `timeout` seconds."""
+    import asyncio
+
+    if timeout is None:
+        return await info.func(content, options, file_path)
+    budget = asyncio.timeout(timeout)
+    try:
+        async with budget:
+            return await info.func(content, options, file_path)
+    except TimeoutError:
+        if budget.expired():
+            raise ExtensionTimeout(info.name, timeout) from None
+        raise
+
+
+def call_extension(
+    info: ExtensionInfo, content: str, options: dict[str, str], file_path: Path, timeout: float | None = None
+) -> Body:
+    """Call an extension from synchronous code, running async extensions to completion.
+
+    Args:
+        info: The extension.
+        content: The current block body.
+        options: The options parsed from the block header.
+        file_path: Path to the markdown file being processed.
+        timeout: Seconds the extension may run, or None for no limit. Chunks
+            of a streamed body are produced later, outside the budget.
+
+    Returns:
+        The new body, or an iterable of its chunks.
+
+    Raises:
+        ExtensionTimeout: If the extension ran out of time.
+    """
+    with _hooked(info, options, file_path):
+        if info.is_async:
+            import asyncio
+
+            return asyncio.run(_await_with_timeout(info, content, options, file_path, timeout))
+        if timeout is None:
+            return info.func(content, options, file_path)
+        return _call_in_thread(info, content, options, file_path, timeout)
+
+
+async def call_extension_async(
+    info: ExtensionInfo, content: str, options: dict[str, str], file_path: Path, timeout: float | None = None
+) -> Body:
+    """Call an extension from a running event loop.
+
+    Async extensions are awaited directly and cancelled if they run out of
+    time; sync extensions run on the loop's thread pool so they don't block
+    other blocks. See `call_extension` for the arguments.
+    """
+    import asyncio
+
+    if info.is_async:
+        with _hooked(info, options, file_path):
+            return await _await_with_timeout(info, content, options, file_path, timeout)
+    return await asyncio.to_thread(call_extension, info, content, options, file_path, timeout)
+
+
+_EXTENSIONS: dict[str, ExtensionInfo] = {}
+
+# Extensions shipped with sour, by name: the module that registers each one
+BUILTIN_PROVIDERS = {
+    "TREE": "sour.extensions.tree",
+    "JUST": "sour.extensions.just",
+    "SNIPPET": "sour.extensions.snippet",
+}
+
+# Declared but not necessarily imported extensions: name -> provider.
+# A provider is a module name, "module:function", or a path to a .py file.
+_PROVIDERS: dict[str, str] = dict(BUILTIN_PROVIDERS)
+
+
+def declare_extension(name: str, provider: str) -> None:
+    """Declare where an extension comes from without importing it.
+
+    The provider is imported the first time a block uses the extension. It
+    should register the extension with `register_extension`; a
+    "module:function" provider may instead name a plain extension function.
+
+    Args:
+        name: The block name the extension handles.
+        provider: A module name, "module:function", or a path to a .py file.
+    """
+    _PROVIDERS[name] = provider
+
+
+def declared_extensions() -> dict[str, str]:
+    """All declared extensions and their providers, by name."""
+    return dict(_PROVIDERS)
+
+
+def _load_provider(name: str, provider: str) -> None:
+    module_name, _, attribute = provider.partition(":")
+    if module_name.endswith(".py"):
+        path = Path(module_name)
+        spec = importlib.util.spec_from_file_location(f"sour_extension_{path.stem}", path)
+        if spec is None or spec.loader is None:
+            message = f"Cannot load extension module {path}"
+            raise ImportError(message)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    if attribute and name not in _EXTENSIONS:
+        register_extension(name)(getattr(module, attribute))
+
+
+def register_extension(
+    name: str,
+    *,
+    version: str = "0",
+    fingerprint: FingerprintFunc | None = None,
+    inputs: InputsFunc | None = None,
+    pure: bool = False,
+) -> Callable[[ExtensionFunc], ExtensionFunc]:
+    """Decorator to register a function as a sour extension.
+
+    Args:
+        name: The block name the extension handles, e.g. "TREE".
+        version: Version of the extension's output, part of the cache key.
+        fingerprint: Optional function returning a digest of the extension's inputs.
+        inputs: Optional function listing the paths the extension reads.
+        pure: Whether the output depends only on the options and `inputs`;
+            see `ExtensionInfo.pure`.
+
+    Returns:
+        The decorator.
+    """
 
-def register_extension(name: str) -> Callable[[ExtensionFunc], ExtensionFunc]:
-    """Decorator to register a function as a sour extension."""
     def decorator(func: ExtensionFunc) -> ExtensionFunc:
-        _EXTENSIONS[name] = func
+        _EXTENSIONS[name] = ExtensionInfo(func, version, fingerprint, inputs, name, pure)
         return func
+
     return decorator
 
-def get_extension(name: str) -> ExtensionFunc:
-    """Retrieve a registered extension by name."""
+
+def get_extension_info(name: str) -> ExtensionInfo:
+    """Retrieve a registered extension and its metadata by name.
+
+    Declared extensions are imported on first use.
+    """
+    if name not in _EXTENSIONS and name in _PROVIDERS:
+        from sour.profile import span
+
+        try:
+            with span(name, "import", {"provider": _PROVIDERS[name]}):
+                _load_provider(name, _PROVIDERS[name])
+        except Exception as e:
+            raise ExtensionLoadError(name, _PROVIDERS[name], e) from e
     if name not in _EXTENSIONS:
         raise KeyError(f"Extension '{name}' not found")
     return _EXTENSIONS[name]
 
+
+def get_extension(name: str) -> ExtensionFunc:
+    """Retrieve a registered extension by name."""
+    return get_extension_info(name).func
+
+
 def clear_registry() -> None:
-    """Clear all registered extensions (useful for testing)."""
+    """Clear all registered and declared extensions (useful for testing)."""
     _EXTENSIONS.clear()
+    _PROVIDERS.clear()
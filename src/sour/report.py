@@ -0,0 +1,69 @@
+import json
+import sys
+import time
+from collections.abc import Iterable
+from enum import StrEnum
+from pathlib import Path
+from typing import TextIO
+
+
+class OutputFormat(StrEnum):
+    """How `sync` and `clear` report on the files they process."""
+
+    TEXT = "text"
+    JSONL = "jsonl"
+
+
+class Reporter:
+    """Terse report of a bulk run: one record per changed file and a final summary.
+
+    Records are formatted without rich, as `action path` lines or JSON
+    objects, and written `batch_size` at a time. Files that didn't change are
+    only reported when they produced warnings.
+    """
+
+    def __init__(self, command: str, output_format: OutputFormat, stream: TextIO | None = None, batch_size: int = 1000):
+        self.command = command
+        self.format = output_format
+        self.stream = stream
+        self.batch_size = batch_size
+        self._lines: list[str] = []
+        self._start = time.perf_counter()
+
+    def _add(self, record: dict, text: str) -> None:
+        self._lines.append(json.dumps(record) if self.format is OutputFormat.JSONL else text)
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def file(self, path: Path, action: str, warnings: Iterable[str] = ()) -> None:
+        """Report one file.
+
+        Args:
+            path: The file.
+            action: What happened, e.g. "updated", "would-update", "cleared" or "unchanged".
+            warnings: Messages collected while processing the file.
+        """
+        warnings = list(warnings)
+        text = "\n".join([f"{action} {path}", *(f"warning: {warning}" for warning in warnings)])
+        self._add({"type": "file", "path": str(path), "action": action, "warnings": warnings}, text)
+
+    def error(self, message: str) -> None:
+        """Report an error that concerns the whole run."""
+        self._add({"type": "error", "message": message}, f"error: {message}")
+
+    def summary(self, **counts: int | str) -> None:
+        """Report the run's totals and wall time, then flush."""
+        seconds = round(time.perf_counter() - self._start, 3)
+        fields = {**counts, "seconds": seconds}
+        text = f"{self.command}: " + " ".join(f"{key}={value}" for key, value in fields.items())
+        self._add({"type": "summary", "command": self.command, **fields}, text)
+        self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records."""
+        if not self._lines:
+            return
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(self._lines) + "\n")
+        stream.flush()
+        self._lines.clear()
@@ -0,0 +1,1071 @@
+import contextvars
+import hashlib
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Container, Iterable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field, replace
+from enum import StrEnum
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from sour.cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_MAX_SIZE,
+    BlockCache,
+    RenderMemo,
+    get_render_memo,
+    reset_render_memo,
+    set_render_memo,
+)
+from sour.core import (
+    Block,
+    Body,
+    Document,
+    Outcome,
+    block_pieces,
+    clear_document,
+    format_block,
+    is_streamed,
+    parse_document,
+    render_blocks,
+    render_blocks_async,
+    splice_outcomes,
+)
+from sour.deps import DependencyGraph, graph_key
+from sour.manifest import FileState, Manifest, Stamp, digest, stamp
+from sour.profile import Span, profiling, span
+from sour.registry import (
+    ExtensionTimeout,
+    call_extension,
+    call_extension_async,
+    declare_extension,
+    declared_extensions,
+    get_extension_info,
+)
+from sour.scan import ScanIndex, get_index, set_index
+
+if TYPE_CHECKING:
+    # asyncio and the tree extension are imported only when needed
+    import asyncio
+    from concurrent import futures
+
+    from sour.extensions.tree import ReadmeIndex
+
+# Transform function passed to sour.core: (name, current_body, options, path) -> new_content
+TransformFunc = Callable[[str, str, dict[str, str], Path], Body]
+
+# Async variant used when blocks are rendered concurrently
+AsyncTransformFunc = Callable[[str, str, dict[str, str], Path], Awaitable[Body]]
+
+# Files that may wait between two stages of `stream_sync`
+DEFAULT_DEPTH = 32
+
+
+class Executor(StrEnum):
+    """Worker pool used to spread files across workers."""
+
+    PROCESS = "process"
+    THREAD = "thread"
+
+
+@dataclass(frozen=True)
+class BlockResult:
+    """Outcome of one block of a file.
+
+    Attributes:
+        name: The extension name from the header.
+        options: The options from the header.
+        status: "updated" or "unchanged" when the block rendered; "error" when
+            it got an inline error; "timeout" when it ran out of time and kept
+            its body; "skipped" when it wasn't rendered this run.
+        error: What went wrong, for "error" and "timeout".
+    """
+
+    name: str
+    options: dict[str, str]
+    status: str
+    error: str | None = None
+
+
+@dataclass
+class FileResult:
+    """Outcome of processing a single file.
+
+    Attributes:
+        path: The processed file.
+        changed: Whether the file was (or, with --check, would be) modified.
+        warnings: Messages collected while processing, in block order.
+        cache_hits: Number of blocks served from the block cache.
+        cache_misses: Number of cacheable blocks that had to be rendered.
+        state: What the manifest should record, if the file ended up in sync and
+            every block declared its inputs.
+        skipped: The manifest showed the file was already in sync, so it was not read.
+        spans: Profile of the file's processing, when profiling.
+        reused: Number of blocks whose body was reused from an identical block
+            rendered earlier in the run.
+        seconds: Wall time spent on the file.
+        blocks: The outcome of each block, in document order, when tracked.
+        inputs: The paths each block reads (None where unknown), when inputs are tracked.
+    """
+
+    path: Path
+    changed: bool
+    warnings: list[str] = field(default_factory=list)
+    cache_hits: int = 0
+    cache_misses: int = 0
+    state: FileState | None = None
+    skipped: bool = False
+    spans: list[Span] = field(default_factory=list)
+    reused: int = 0
+    seconds: float = 0.0
+    blocks: list[BlockResult] = field(default_factory=list)
+    inputs: list[list[Path] | None] | None = None
+
+
+@dataclass(frozen=True)
+class SyncSettings:
+    """Per-run settings for `sync_file`. Must stay picklable for the process pool.
+
+    Attributes:
+        check: Dry-run: don't write modified files.
+        cache_dir: Block cache directory, or None to disable the cache.
+        cache_max_size: Block cache size limit in bytes.
+        track_inputs: Collect the state the manifest needs and the inputs of
+            every block for each file.
+        concurrency: Maximum number of blocks rendered at once on an asyncio loop;
+            1 renders blocks one after another.
+        profile: Record spans for every step into `FileResult.spans`.
+        timeout: Seconds any one block may take, or None for no limit.
+        timeouts: Budgets for the blocks of particular extensions, by name,
+            overriding `timeout`. A block's own `timeout` option overrides both.
+        track_blocks: Record the outcome of every block into `FileResult.blocks`.
+    """
+
+    check: bool = False
+    cache_dir: Path | None = DEFAULT_CACHE_DIR
+    cache_max_size: int = DEFAULT_MAX_SIZE
+    track_inputs: bool = False
+    concurrency: int = 1
+    profile: bool = False
+    timeout: float | None = None
+    timeouts: dict[str, float] = field(default_factory=dict)
+    track_blocks: bool = False
+
+    def budget(self, name: str, options: dict[str, str]) -> float | None:
+        """The time budget of one block, in seconds.
+
+        Raises:
+            ValueError: If the block's `timeout` option is not a positive number.
+        """
+        if "timeout" in options:
+            timeout = float(options["timeout"])
+            if timeout <= 0:
+                message = "timeout must be positive"
+                raise ValueError(message)
+            return timeout
+        return self.timeouts.get(name, self.timeout)
+
+
+DEFAULT_SETTINGS = SyncSettings()
+
+
+def block_inputs(document: Document, path: Path) -> list[list[Path] | None]:
+    """Ask each block's extension which paths it reads.
+
+    Args:
+        document: The parsed file.
+        path: The file the document was read from.
+
+    Returns:
+        The inputs of each block, or None for blocks whose inputs are unknown.
+    """
+    memo = get_render_memo()
+    inputs: list[list[Path] | None] = []
+    for block in document.blocks:
+        try:
+            info = get_extension_info(block.name)
+            if memo is not None:
+                inputs.append(memo.inputs(info, block.options, path))
+            else:
+                inputs.append(info.inputs(block.options, path) if info.inputs is not None else None)
+        except Exception:
+            inputs.append(None)
+    return inputs
+
+
+def _input_stamps(inputs: list[list[Path] | None]) -> dict[str, Stamp] | None:
+    """Stamp the inputs of every block, or return None if any block's inputs are unknown."""
+    stamps = {}
+    for block in inputs:
+        if block is None:
+            return None
+        for input_path in block:
+            key = os.path.abspath(input_path)
+            if key not in stamps:
+                stamps[key] = stamp(key)
+    return stamps
+
+
+def _track_inputs(job: "_Job") -> None:
+    """Record the inputs of every block of a job, and stamp them for the manifest."""
+    job.result.inputs = block_inputs(job.document, job.path)
+    job.stamps = _input_stamps(job.result.inputs)
+
+
+class _KeptBody(str):
+    """A block's current body, returned in place of a render that timed out."""
+
+    error: str
+
+
+def _kept(body: str, error: ExtensionTimeout) -> _KeptBody:
+    kept = _KeptBody(body)
+    kept.error = str(error)
+    return kept
+
+
+def make_resolver(
+    result: FileResult, cache: BlockCache | None, settings: SyncSettings = DEFAULT_SETTINGS
+) -> TransformFunc:
+    """Build the transform function that dispatches blocks to registered extensions.
+
+    Unknown extensions are recorded as warnings on `result` and re-raised so the
+    block gets an inline error. Blocks that run out of time keep their current
+    body and are recorded as warnings too. Blocks identical to one already
+    rendered in this run reuse its body, see `RenderMemo`.
+    """
+    memo = get_render_memo()
+
+    def transform_resolver(name: str, body: str, options: dict[str, str], file_path: Path) -> str:
+        try:
+            info = get_extension_info(name)
+        except KeyError:
+            result.warnings.append(f"Unknown extension '{name}' in {file_path}")
+            raise
+        timeout = settings.budget(name, options)
+
+        def render() -> str:
+            if cache is None:
+                return call_extension(info, body, options, file_path, timeout)
+            return cache.render(name, info, body, options, file_path, timeout)
+
+        try:
+            key = memo.key(info, options, file_path) if memo is not None else None
+            if key is None:
+                return render()
+            new_body, reused = memo.render(key, render)
+        except ExtensionTimeout as e:
+            result.warnings.append(f"{e} in {file_path}; kept the previous body")
+            return _kept(body, e)
+        result.reused += reused
+        return new_body
+
+    return transform_resolver
+
+
+def make_async_resolver(
+    result: FileResult,
+    cache: BlockCache | None,
+    limiter: "asyncio.Semaphore",
+    settings: SyncSettings = DEFAULT_SETTINGS,
+) -> AsyncTransformFunc:
+    """Build the async counterpart of `make_resolver`.
+
+    At most as many blocks as `limiter` allows are rendered at once. Sync
+    extensions run on the loop's thread pool.
+    """
+    import asyncio
+
+    memo = get_render_memo()
+
+    async def transform_resolver(name: str, body: str, options: dict[str, str], file_path: Path) -> str:
+        # Look the extension up before the first await so warnings keep block order
+        try:
+            info = get_extension_info(name)
+        except KeyError:
+            result.warnings.append(f"Unknown extension '{name}' in {file_path}")
+            raise
+        timeout = settings.budget(name, options)
+
+        async def render() -> str:
+            async with limiter:
+                if cache is None:
+                    return await call_extension_async(info, body, options, file_path, timeout)
+                return await cache.render_async(name, info, body, options, file_path, timeout)
+
+        try:
+            key = await asyncio.to_thread(memo.key, info, options, file_path) if memo is not None else None
+            if key is None:
+                return await render()
+            new_body, reused = await memo.render_async(key, render)
+        except ExtensionTimeout as e:
+            result.warnings.append(f"{e} in {file_path}; kept the previous body")
+            return _kept(body, e)
+        result.reused += reused
+        return new_body
+
+    return transform_resolver
+
+
+@dataclass
+class _Job:
+    """A file on its way from being read to being written.
+
+    Attributes:
+        path: The markdown file.
+        result: The file's result, filled in as the job moves along.
+        document: The parsed file.
+        content: The rendered file, or None while some block bodies are still
+            to be streamed from `outcomes`.
+        outcomes: What rendering each block produced.
+        stamps: Stamps of the block inputs, taken before rendering.
+    """
+
+    path: Path
+    result: FileResult
+    document: Document
+    content: str | None = ""
+    outcomes: dict[int, Outcome] = field(default_factory=dict)
+    stamps: dict[str, Stamp] | None = None
+
+
+def _render(job: _Job, settings: SyncSettings, only: Container[int] | None = None) -> _Job:
+    """Render the blocks of a parsed file into `job.content`."""
+    cache = None if settings.cache_dir is None else BlockCache(settings.cache_dir, settings.cache_max_size)
+    if settings.track_inputs:
+        _track_inputs(job)
+    outcomes = render_blocks(job.document, make_resolver(job.result, cache, settings), job.path, only)
+    return _rendered(job, outcomes, cache, settings)
+
+
+async def _render_async(
+    job: _Job, settings: SyncSettings, only: Container[int] | None, limiter: "asyncio.Semaphore"
+) -> _Job:
+    """Like `_render`, but render the blocks concurrently on the running loop."""
+    import asyncio
+
+    cache = None if settings.cache_dir is None else BlockCache(settings.cache_dir, settings.cache_max_size)
+    if settings.track_inputs:
+        await asyncio.to_thread(_track_inputs, job)
+    resolver = make_async_resolver(job.result, cache, limiter, settings)
+    outcomes = await render_blocks_async(job.document, resolver, job.path, only)
+    return _rendered(job, outcomes, cache, settings)
+
+
+def _rendered(job: _Job, outcomes: dict[int, Outcome], cache: BlockCache | None, settings: SyncSettings) -> _Job:
+    if any(is_streamed(outcome) for outcome in outcomes.values()):
+        # Streamed bodies are consumed as the file is written, see `_write_streamed`
+        job.content, job.outcomes = None, outcomes
+    else:
+        job.content = splice_outcomes(job.document, outcomes)
+        job.result.changed = job.content != job.document.text
+        if settings.track_blocks:
+            job.result.blocks = [
+                _block_result(job.document, block, outcomes.get(i)) for i, block in enumerate(job.document.blocks)
+            ]
+    if cache is not None:
+        job.result.cache_hits, job.result.cache_misses = cache.hits, cache.misses
+    return job
+
+
+def _block_result(document: Document, block: Block, outcome: Outcome | None) -> BlockResult:
+    if outcome is None:
+        return BlockResult(block.name, block.options, "skipped")
+    if isinstance(outcome, BaseException):
+        return BlockResult(block.name, block.options, "error", str(outcome))
+    if isinstance(outcome, _KeptBody):
+        return BlockResult(block.name, block.options, "timeout", outcome.error)
+    changed = format_block(block, outcome) != document.text[block.start : block.end]
+    return BlockResult(block.name, block.options, "updated" if changed else "unchanged")
+
+
+class _Comparison:
+    """Compares text arriving piece by piece with `text[start:end]`, without copying either."""
+
+    def __init__(self, text: str, start: int, end: int):
+        self.text = text
+        self.pos = start
+        self.end = end
+        self.equal = True
+
+    def feed(self, piece: str) -> None:
+        if self.equal:
+            self.equal = self.pos + len(piece) <= self.end and self.text.startswith(piece, self.pos)
+        self.pos += len(piece)
+
+    @property
+    def matched(self) -> bool:
+        """Whether everything fed so far is exactly the expected text."""
+        return self.equal and self.pos == self.end
+
+
+class _StreamedFile:
+    """The new text of a file, written piece by piece into a temporary file beside it.
+
+    The text is hashed on the way if the manifest needs its digest. With
+    `check`, nothing is written.
+    """
+
+    def __init__(self, path: Path, check: bool, hashed: bool):
+        self.path = path
+        self._target = Path(os.path.realpath(path))
+        self._out: TextIO | None = None
+        self._tmp = ""
+        if not check:
+            fd, self._tmp = tempfile.mkstemp(dir=self._target.parent, prefix=".tmp-")
+            self._out = os.fdopen(fd, "w")
+        self._hasher = hashlib.sha256() if hashed else None
+        self._mark: tuple[int, object] = (0, None)
+
+    def emit(self, piece: str, comparison: _Comparison | None = None) -> None:
+        """Append a piece of the new text, feeding it to `comparison` too."""
+        if comparison is not None:
+            comparison.feed(piece)
+        if self._out is not None:
+            self._out.write(piece)
+        if self._hasher is not None:
+            self._hasher.update(piece.encode())
+
+    def checkpoint(self) -> None:
+        """Remember the current end of the text, for `rewind`."""
+        self._mark = (self._out.tell() if self._out is not None else 0, self._hasher and self._hasher.copy())
+
+    def rewind(self) -> None:
+        """Drop everything emitted since the last `checkpoint`."""
+        position, self._hasher = self._mark  # type: ignore[assignment]
+        if self._out is not None:
+            self._out.seek(position)
+            self._out.truncate()
+
+    def digest(self) -> str | None:
+        """The digest of the new text, if it is hashed."""
+        return None if self._hasher is None else self._hasher.hexdigest()
+
+    def close(self, replace: bool) -> None:
+        """Replace the file with the new text if `replace`, else throw the new text away."""
+        if self._out is None:
+            return
+        self._out.close()
+        if not replace:
+            os.unlink(self._tmp)
+            return
+        with span("write", "write", {"file": str(self.path)}):
+            os.chmod(self._tmp, stat.S_IMODE(os.stat(self._target).st_mode))
+            os.replace(self._tmp, self._target)
+
+
+def _write_block(out: _StreamedFile, document: Document, block: Block, outcome: Outcome) -> tuple[bool, BlockResult]:
+    """Write one rendered block, streaming its body if it is streamed.
+
+    A streamed body that fails halfway is rewound and replaced by an inline error.
+
+    Returns:
+        Whether the block changed, and its status.
+    """
+    if not is_streamed(outcome):
+        rendered = format_block(block, outcome)
+        out.emit(rendered)
+        return rendered != document.text[block.start : block.end], _block_result(document, block, outcome)
+    out.checkpoint()
+    comparison = _Comparison(document.text, block.start, block.end)
+    try:
+        for piece in block_pieces(block, outcome):
+            out.emit(piece, comparison)
+    except Exception as e:
+        out.rewind()
+        comparison = _Comparison(document.text, block.start, block.end)
+        out.emit(format_block(block, e), comparison)
+        return not comparison.matched, _block_result(document, block, e)
+    status = "unchanged" if comparison.matched else "updated"
+    return not comparison.matched, BlockResult(block.name, block.options, status)
+
+
+def _write_streamed(job: _Job, check: bool, track_blocks: bool) -> str | None:
+    """Write a file whose new blocks include streamed bodies, without ever joining them.
+
+    The new text goes piece by piece into a temporary file beside the file,
+    which replaces it only if some block changed; each block is compared
+    with its current text as it goes by. With `check` nothing is written. A
+    streamed body that fails halfway is rewound and replaced by an inline
+    error, like any other failing block.
+
+    Returns:
+        The digest of the new text, when the manifest needs it.
+    """
+    document, text = job.document, job.document.text
+    out = _StreamedFile(job.path, check, hashed=job.stamps is not None)
+    statuses: list[BlockResult] = []
+    changed = False
+    try:
+        pos = 0
+        for i, block in enumerate(document.blocks):
+            outcome = job.outcomes.get(i)
+            if outcome is None:
+                statuses.append(_block_result(document, block, None))
+                continue
+            out.emit(text[pos : block.start])
+            pos = block.end
+            block_changed, status = _write_block(out, document, block, outcome)
+            changed = changed or block_changed
+            statuses.append(status)
+        out.emit(text[pos:])
+    except BaseException:
+        out.close(replace=False)
+        raise
+
+    job.result.changed = changed
+    if track_blocks:
+        job.result.blocks = statuses
+    out.close(replace=changed)
+    return out.digest()
+
+
+def _write(job: _Job, check: bool, track_blocks: bool = False) -> FileResult:
+    """Write a rendered file back if it changed and record what the manifest needs."""
+    path, result = job.path, job.result
+    if job.content is None:
+        sha256 = _write_streamed(job, check, track_blocks)
+    else:
+        sha256 = None
+        if result.changed and not check:
+            with span("write", "write", {"file": str(path)}):
+                path.write_text(job.content)
+
+    # Files with warnings, or left stale by --check, must be looked at again next time
+    if job.stamps is not None and not result.warnings and (not result.changed or not check):
+        result.state = _file_state(job, sha256)
+    return result
+
+
+def _file_state(job: _Job, sha256: str | None) -> FileState | None:
+    """What the manifest records about a file just written, or None if it is gone.
+
+    Args:
+        job: The file's job, with the stamps of its inputs.
+        sha256: Hash of the content written, if known.
+    """
+    file_stamp = stamp(job.path)
+    if file_stamp is None:
+        return None
+    document, inputs = job.document, job.result.inputs
+    extensions = {block.name: get_extension_info(block.name).version for block in document.blocks}
+    blocks = [[os.path.abspath(p) for p in block or ()] for block in inputs or ()]
+    sha256 = sha256 or digest(job.content if job.content is not None else document.text)
+    return FileState(file_stamp, sha256, extensions, job.stamps, blocks)
+
+
+def sync_document(
+    path: Path,
+    document: Document,
+    settings: SyncSettings,
+    only: Container[int] | None = None,
+) -> FileResult:
+    """Render the blocks of an already parsed file and write it back if it changed.
+
+    Args:
+        path: The markdown file the document was read from.
+        document: The parsed file content.
+        settings: The run settings.
+        only: Indexes of the blocks to render; None renders every block.
+
+    Returns:
+        The file's result.
+    """
+    if settings.concurrency > 1:
+        import asyncio
+
+        return asyncio.run(sync_document_async(path, document, settings, only))
+
+    job = _render(_Job(path, FileResult(path, changed=False), document), settings, only)
+    return _write(job, settings.check, settings.track_blocks)
+
+
+async def sync_document_async(
+    path: Path,
+    document: Document,
+    settings: SyncSettings,
+    only: Container[int] | None = None,
+    limiter: "asyncio.Semaphore | None" = None,
+) -> FileResult:
+    """Like `sync_document`, but render the blocks concurrently on the running loop.
+
+    Args:
+        path: The markdown file the document was read from.
+        document: The parsed file content.
+        settings: The run settings.
+        only: Indexes of the blocks to render; None renders every block.
+        limiter: Semaphore bounding the blocks rendered at once, shared across
+            files; defaults to a new one sized by `settings.concurrency`.
+
+    Returns:
+        The file's result.
+    """
+    import asyncio
+
+    limiter = limiter or asyncio.Semaphore(max(1, settings.concurrency))
+    job = await _render_async(_Job(path, FileResult(path, changed=False), document), settings, only, limiter)
+    return await asyncio.to_thread(_write, job, settings.check, settings.track_blocks)
+
+
+def sync_file(path: Path, settings: SyncSettings) -> FileResult:
+    """Render all blocks in one file and write it back if it changed.
+
+    Args:
+        path: The markdown file to process.
+        settings: The run settings.
+
+    Returns:
+        The file's result.
+    """
+    start = time.perf_counter()
+    with profiling(settings.profile) as profiler, span(str(path), "file"):
+        with span("read", "read", {"file": str(path)}):
+            content = path.read_text()
+        with span("parse", "parse", {"file": str(path)}):
+            document = parse_document(content)
+        result = sync_document(path, document, settings)
+    result.seconds = time.perf_counter() - start
+    if profiler is not None:
+        result.spans = profiler.spans
+    return result
+
+
+def clear_file(path: Path, check: bool) -> FileResult:
+    """Clear all blocks in one file and write it back if it changed.
+
+    Args:
+        path: The markdown file to process.
+        check: Dry-run: don't write modified files.
+
+    Returns:
+        The file's result.
+    """
+    content = path.read_text()
+    new_content = clear_document(parse_document(content))
+    changed = new_content != content
+    if changed and not check:
+        path.write_text(new_content)
+    return FileResult(path, changed)
+
+
+def _init_worker(index: ScanIndex, readmes: "ReadmeIndex", providers: dict[str, str]) -> None:
+    """Prepare a worker process: declare the run's extensions, share its indexes and start a memo."""
+    from sour.extensions.tree import set_readme_index
+
+    for name, provider in providers.items():
+        declare_extension(name, provider)
+    set_index(index)
+    set_readme_index(readmes)
+    set_render_memo(RenderMemo())
+
+
+def run_files(
+    func: Callable[[Path], FileResult],
+    files: list[Path],
+    jobs: int = 1,
+    executor: Executor | str = Executor.PROCESS,
+) -> list[FileResult]:
+    """Apply `func` to every file, optionally in parallel.
+
+    Results are returned in the order of `files` regardless of completion order,
+    so callers can report them deterministically.
+
+    Args:
+        func: The per-file worker. Must be picklable for the process executor.
+        files: The files to process.
+        jobs: Number of workers; 0 uses one per CPU, 1 runs in-process.
+        executor: "process" for a process pool, "thread" for a thread pool
+            (better when extensions are I/O bound).
+
+    Returns:
+        One result per file, in input order.
+    """
+    executor = Executor(executor)
+
+    jobs = jobs or os.cpu_count() or 1
+    jobs = min(jobs, len(files))
+    if jobs <= 1:
+        return [func(path) for path in files]
+
+    chunksize = max(1, len(files) // (jobs * 4)) if executor is Executor.PROCESS else 1
+    with _pool(executor, jobs) as pool:
+        return list(pool.map(func, files, chunksize=chunksize))
+
+
+def _pool(executor: Executor, jobs: int) -> "futures.Executor":
+    """Start a worker pool; process workers get the run's indexes and declared extensions."""
+    from concurrent import futures
+
+    from sour.extensions.tree import get_readme_index
+
+    if executor is Executor.PROCESS:
+        return futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(get_index(), get_readme_index(), declared_extensions()),
+        )
+    return futures.ThreadPoolExecutor(max_workers=jobs)
+
+
+def sync_worker(settings: SyncSettings) -> Callable[[Path], FileResult]:
+    """Bind `sync_file` to the run settings as a picklable worker."""
+    return partial(sync_file, settings=settings)
+
+
+def clear_worker(check: bool) -> Callable[[Path], FileResult]:
+    """Bind `clear_file` to the run settings as a picklable worker."""
+    return partial(clear_file, check=check)
+
+
+class _Closed(Exception):
+    """The consumer of a pipeline stage stopped reading."""
+
+
+class _Handover[T]:
+    """The producing side of `_background`: hands items over to the consumer in batches."""
+
+    def __init__(self, depth: int, batch: int):
+        self.batches: queue.Queue[tuple[str, object]] = queue.Queue(max(1, depth // batch))
+        self.closed = threading.Event()
+        self._batch = batch
+        self._pending: list[T] = []
+
+    def put(self, item: tuple[str, object]) -> None:
+        """Queue a message for the consumer, waiting while the queue is full.
+
+        Raises:
+            _Closed: If the consumer stopped reading.
+        """
+        while not self.closed.is_set():
+            with suppress(queue.Full):
+                self.batches.put(item, timeout=0.05)
+                return
+        raise _Closed
+
+    def emit(self, item: T) -> None:
+        """Hand over one item, sending the batch once full or when the consumer is waiting."""
+        self._pending.append(item)
+        if len(self._pending) >= self._batch or self.batches.empty():
+            self.put(("items", self._pending[:]))
+            self._pending.clear()
+
+    def run(self, produce: Callable[[Callable[[T], None]], None]) -> None:
+        """Run `produce`, then hand over what is left and the end, or the exception it raised."""
+        try:
+            produce(self.emit)
+            self.put(("items", self._pending[:]))
+            self.put(("end", None))
+        except _Closed:
+            pass
+        except BaseException as e:
+            with suppress(_Closed):
+                self.put(("error", e))
+
+
+def _background[T](produce: Callable[[Callable[[T], None]], None], depth: int, batch: int = 8) -> Iterator[T]:
+    """Run `produce` on a thread, yielding the items it emits.
+
+    Items are handed over `batch` at a time (sooner when the consumer is
+    waiting), and at most about `depth` items wait between the thread and the
+    consumer; `emit` blocks while the queue is full. Exceptions raised by
+    `produce` are raised in the consumer. If the consumer stops early, the
+    thread's next hand-over raises `_Closed` so it winds down, and the
+    generator waits for it.
+    """
+    handover: _Handover[T] = _Handover(depth, batch)
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(handover.run, produce), daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, items = handover.batches.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise items  # type: ignore[misc]
+            yield from items  # type: ignore[misc]
+    finally:
+        handover.closed.set()
+        thread.join()
+
+
+def _stage[T, U](source: Iterable[T], func: Callable[[T], U], depth: int) -> Iterator[U]:
+    """Apply `func` to every item of `source` on a thread of its own, see `_background`."""
+
+    def produce(emit: Callable[[U], None]) -> None:
+        for item in source:
+            emit(func(item))
+
+    return _background(produce, depth)
+
+
+@contextmanager
+def _timed(result: FileResult, profile: bool) -> Iterator[None]:
+    """Add the time spent in the body to `result`, and its spans when profiling."""
+    start = time.perf_counter()
+    with profiling(profile) as profiler:
+        yield
+    result.seconds += time.perf_counter() - start
+    if profiler is not None:
+        result.spans.extend(profiler.spans)
+
+
+def _file_span(path: Path, spans: list[Span]) -> Span:
+    """Summarize the spans a file's stages recorded on different threads as one "file" span."""
+    start = min(s.start_ns for s in spans)
+    return Span(
+        str(path),
+        "file",
+        start,
+        max(s.start_ns + s.wall_ns for s in spans) - start,
+        sum(s.cpu_ns for s in spans),
+        sum(s.bytes_read for s in spans),
+        sum(s.bytes_written for s in spans),
+        spans[0].pid,
+        spans[0].tid,
+    )
+
+
+def _stream_stages(
+    files: Iterable[Path], settings: SyncSettings, fresh: Callable[[Path], bool], depth: int
+) -> Iterator[FileResult]:
+    """Sync files in one process through three threads: discover and read, render, write."""
+
+    def read(path: Path) -> _Job | FileResult:
+        if fresh(path):
+            return FileResult(path, changed=False, skipped=True)
+        result = FileResult(path, changed=False)
+        with _timed(result, settings.profile):
+            with span("read", "read", {"file": str(path)}):
+                content = path.read_text()
+            with span("parse", "parse", {"file": str(path)}):
+                document = parse_document(content)
+        return _Job(path, result, document)
+
+    def render(job: _Job | FileResult) -> _Job | FileResult:
+        if isinstance(job, _Job):
+            with _timed(job.result, settings.profile):
+                _render(job, settings)
+        return job
+
+    def write(job: _Job | FileResult) -> FileResult:
+        if isinstance(job, FileResult):
+            return job
+        with _timed(job.result, settings.profile):
+            result = _write(job, settings.check, settings.track_blocks)
+        if result.spans:
+            result.spans.append(_file_span(job.path, result.spans))
+        return result
+
+    return _stage(_stage(_stage(files, read, depth), render, depth), write, depth)
+
+
+async def _sync_path_async(path: Path, settings: SyncSettings, limiter: "asyncio.Semaphore") -> FileResult:
+    """Read, parse and sync one file on the event loop."""
+    import asyncio
+
+    start = time.perf_counter()
+    with profiling(settings.profile) as profiler, span(str(path), "file"):
+        with span("read", "read", {"file": str(path)}):
+            content = await asyncio.to_thread(path.read_text)
+        with span("parse", "parse", {"file": str(path)}):
+            document = parse_document(content)
+        result = await sync_document_async(path, document, settings, limiter=limiter)
+    result.seconds = time.perf_counter() - start
+    if profiler is not None:
+        result.spans = profiler.spans
+    return result
+
+
+def _stream_async(
+    files: Iterable[Path], settings: SyncSettings, fresh: Callable[[Path], bool], depth: int
+) -> Iterator[FileResult]:
+    """Sync files on one event loop, rendering blocks of up to `depth` files concurrently.
+
+    The number of blocks being rendered at once is bounded by `settings.concurrency`.
+    """
+    import asyncio
+
+    async def produce(emit: Callable[[FileResult], None]) -> None:
+        blocks = asyncio.Semaphore(settings.concurrency)
+
+        async def emit_first() -> None:
+            item = pending.popleft()
+            # Only blocks the loop while the consumer is `depth` files behind
+            emit(item if isinstance(item, FileResult) else await item)
+
+        pending: deque[FileResult | asyncio.Task[FileResult]] = deque()
+        for path in files:
+            if fresh(path):
+                pending.append(FileResult(path, changed=False, skipped=True))
+            else:
+                pending.append(asyncio.ensure_future(_sync_path_async(path, settings, blocks)))
+            if len(pending) >= depth:
+                await emit_first()
+        while pending:
+            await emit_first()
+
+    return _background(lambda emit: asyncio.run(produce(emit)), depth)
+
+
+class _Chunk:
+    """Files handed to a pool worker together."""
+
+    def __init__(self):
+        self.paths: list[Path] = []
+        self.future: futures.Future[list[FileResult]] | None = None
+
+
+def _stream_pool(
+    files: Iterable[Path],
+    settings: SyncSettings,
+    fresh: Callable[[Path], bool],
+    jobs: int,
+    executor: Executor,
+    depth: int,
+) -> Iterator[FileResult]:
+    """Sync files in a worker pool, keeping at most `depth` chunks of files in flight."""
+    # Process workers get files in chunks, so pickling results doesn't dominate
+    chunksize = 64 if executor is Executor.PROCESS else 1
+    worker = sync_worker(settings)
+    with _pool(executor, jobs) as pool:
+        # A skipped file's result, or a file's chunk and its index in the chunk
+        slots: deque[FileResult | tuple[_Chunk, int]] = deque()
+        chunk = _Chunk()
+
+        def take() -> FileResult:
+            nonlocal chunk
+            slot = slots.popleft()
+            if isinstance(slot, FileResult):
+                return slot
+            owner, i = slot
+            if owner.future is None:  # the chunk being filled: send it off early
+                owner.future = _submit(pool, executor, worker, owner.paths)
+                chunk = _Chunk()
+            return owner.future.result()[i]
+
+        for path in files:
+            if fresh(path):
+                slots.append(FileResult(path, changed=False, skipped=True))
+            else:
+                slots.append((chunk, len(chunk.paths)))
+                chunk.paths.append(path)
+                if len(chunk.paths) == chunksize:
+                    chunk.future = _submit(pool, executor, worker, chunk.paths)
+                    chunk = _Chunk()
+            while len(slots) > depth * chunksize:
+                yield take()
+        while slots:
+            yield take()
+
+
+def _submit(
+    pool: "futures.Executor", executor: Executor, func: Callable[[Path], FileResult], paths: list[Path]
+) -> "futures.Future[list[FileResult]]":
+    """Send a chunk to the pool; thread workers run it in a copy of the run's context (memo, profiler)."""
+    if executor is Executor.THREAD:
+        return pool.submit(contextvars.copy_context().run, _map_chunk, func, paths)
+    return pool.submit(_map_chunk, func, paths)
+
+
+def _map_chunk(func: Callable[[Path], FileResult], paths: list[Path]) -> list[FileResult]:
+    return [func(path) for path in paths]
+
+
+def stream_sync(
+    files: Iterable[Path],
+    settings: SyncSettings,
+    jobs: int = 1,
+    executor: Executor | str = Executor.PROCESS,
+    manifest: Manifest | None = None,
+    depth: int = DEFAULT_DEPTH,
+    dependencies: DependencyGraph | None = None,
+) -> Iterator[FileResult]:
+    """Sync files as they are discovered, yielding each result once its file is done.
+
+    Files flow through stages joined by bounded queues, so reading overlaps
+    with rendering and memory use doesn't grow with the number of files. With
+    one job, discovery and reading, rendering and writing each run on a thread;
+    with `settings.concurrency` above 1, blocks of several files render on one
+    asyncio loop instead; with several jobs, files are rendered in a worker
+    pool. Files the manifest shows are already in sync are skipped. Identical
+    blocks are rendered once per run (once per worker process).
+
+    Args:
+        files: The files to process, in report order; may be a lazy iterator.
+        settings: The run settings.
+        jobs: Number of workers, see `run_files`.
+        executor: Worker pool, see `run_files`.
+        manifest: Manifest to consult and update, or None to process every file.
+        depth: Files (chunks of files, for a worker pool) allowed to wait between two stages.
+        dependencies: Graph to update with the inputs of every rendered block, if any.
+
+    Returns:
+        One result per file, in input order.
+    """
+    executor = Executor(executor)
+    jobs = jobs or os.cpu_count() or 1
+    if manifest is not None or dependencies is not None:
+        settings = replace(settings, track_inputs=True)
+
+    def fresh(path: Path) -> bool:
+        return manifest is not None and manifest.is_fresh(path)
+
+    if jobs > 1:
+        results = _stream_pool(files, settings, fresh, jobs, executor, depth)
+    elif settings.concurrency > 1:
+        results = _stream_async(files, settings, fresh, depth)
+    else:
+        results = _stream_stages(files, settings, fresh, depth)
+
+    memo = set_render_memo(RenderMemo())
+    try:
+        for result in results:
+            if manifest is not None and not result.skipped:
+                _record_state(manifest, result)
+            if dependencies is not None:
+                _record_dependencies(dependencies, result, manifest)
+            yield result
+    finally:
+        results.close()
+        reset_render_memo(memo)
+
+
+def _record_state(manifest: Manifest, result: FileResult) -> None:
+    """Record a synced file in the manifest, or forget it if it can't be trusted to stay in sync."""
+    if result.state is not None:
+        manifest.record(result.path, result.state)
+    else:
+        manifest.forget(result.path)
+
+
+def _record_dependencies(dependencies: DependencyGraph, result: FileResult, manifest: Manifest | None) -> None:
+    """Record the block inputs of a synced file; those of skipped files come from the manifest."""
+    path = graph_key(result.path)
+    if result.inputs is not None:
+        dependencies.update(path, result.inputs)
+    elif result.skipped and manifest is not None and path not in dependencies:
+        inputs = manifest.block_inputs(result.path)
+        if inputs is not None:
+            dependencies.update(path, inputs)
+
+
+def sync_files(
+    files: list[Path],
+    settings: SyncSettings,
+    jobs: int = 1,
+    executor: Executor | str = Executor.PROCESS,
+    manifest: Manifest | None = None,
+) -> list[FileResult]:
+    """Sync files, skipping those the manifest shows are already in sync; see `stream_sync`.
+
+    Returns:
+        One result per file, in input order.
+    """
+    return list(stream_sync(files, settings, jobs, executor, manifest))
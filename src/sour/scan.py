@@ -0,0 +1,289 @@
+import os
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from sour.config import DEFAULT_PRUNE, Config
+
+MARKDOWN_SUFFIXES = (".md", ".qmd")
+
+
+class Entry(NamedTuple):
+    """A directory entry with the type information `os.scandir` already provides."""
+
+    name: str
+    path: Path
+    is_dir: bool
+    is_symlink: bool
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob into a regex over `/`-separated relative paths."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+            end = pattern.index("]", i + 1)
+            out.append(pattern[i : end + 1].replace("[!", "[^"))
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule(NamedTuple):
+    """One compiled .gitignore line."""
+
+    base: str
+    regex: re.Pattern[str]
+    negate: bool
+    dir_only: bool
+    anchored: bool
+
+    @classmethod
+    def parse(cls, line: str, base: str) -> "IgnoreRule | None":
+        """Compile a .gitignore line, or return None for blanks and comments."""
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        line = line.removeprefix("\\")
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        anchored = "/" in line
+        line = line.lstrip("/")
+        return cls(base, re.compile(glob_to_regex(line) + r"\Z"), negate, dir_only, anchored)
+
+    def match(self, path: str, is_dir: bool) -> bool:
+        """Whether this rule applies to the absolute `path`."""
+        if self.dir_only and not is_dir:
+            return False
+        rel = os.path.relpath(path, self.base)
+        if rel.startswith(".."):
+            return False
+        rel = rel.replace(os.sep, "/")
+        subject = rel if self.anchored else rel.rsplit("/", 1)[-1]
+        return self.regex.match(subject) is not None
+
+
+class ScanIndex:
+    """A memoized view of the filesystem shared by everything in one run.
+
+    Each directory is read at most once with `os.scandir`. Directory names in
+    `prune` and paths matched by .gitignore files are skipped by `walk` and
+    reported by `is_ignored`. `settings` is the file `prune` and `gitignore`
+    were read from, if any.
+    """
+
+    def __init__(self, prune: tuple[str, ...] = DEFAULT_PRUNE, gitignore: bool = True, settings: Path | None = None):
+        self.prune = frozenset(prune)
+        self.gitignore = gitignore
+        self.settings = settings
+        self._entries: dict[str, list[Entry]] = {}
+        self._by_name: dict[str, dict[str, Entry]] = {}
+        self._rules: dict[str, tuple[IgnoreRule, ...]] = {}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "ScanIndex":
+        """Create an index with the project's prune and gitignore settings."""
+        return cls(config.prune, config.gitignore, config.path)
+
+    def entries(self, directory: Path) -> list[Entry]:
+        """List a directory, sorted by name. Unreadable directories are empty.
+
+        Args:
+            directory: The directory to list.
+
+        Returns:
+            The directory's entries, including ignored ones.
+        """
+        key = os.path.abspath(directory)
+        cached = self._entries.get(key)
+        if cached is not None:
+            return cached
+
+        entries = []
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    try:
+                        is_dir = item.is_dir()
+                    except OSError:
+                        is_dir = False
+                    entries.append(Entry(item.name, directory / item.name, is_dir, item.is_symlink()))
+        except OSError:
+            pass
+        entries.sort(key=lambda e: e.name)
+        self._entries[key] = entries
+        return entries
+
+    def entry(self, path: Path) -> Entry | None:
+        """Look up a single path in its parent's cached listing.
+
+        Args:
+            path: The path to look up. Must not end in "." or "..".
+
+        Returns:
+            The entry, or None if the path does not exist.
+        """
+        parent = os.path.abspath(path.parent)
+        by_name = self._by_name.get(parent)
+        if by_name is None:
+            by_name = {e.name: e for e in self.entries(path.parent)}
+            self._by_name[parent] = by_name
+        return by_name.get(path.name)
+
+    def is_dir(self, path: Path) -> bool:
+        """Whether `path` is a directory, answered from the cached listings where possible."""
+        if path.name in ("", ".."):
+            return os.path.isdir(path)
+        entry = self.entry(path)
+        return entry is not None and entry.is_dir
+
+    def invalidate(self, directory: Path | None = None) -> None:
+        """Forget the cached listing of `directory`, or of everything if None."""
+        if directory is None:
+            self._entries.clear()
+            self._by_name.clear()
+            self._rules.clear()
+        else:
+            key = os.path.abspath(directory)
+            self._entries.pop(key, None)
+            self._by_name.pop(key, None)
+            self._rules.pop(key, None)
+
+    def listed(self) -> list[Path]:
+        """The directories whose listing is cached."""
+        return [Path(key) for key in self._entries]
+
+    def _rules_for(self, directory: str) -> tuple[IgnoreRule, ...]:
+        """Collect the .gitignore rules that apply inside `directory`, outermost first."""
+        cached = self._rules.get(directory)
+        if cached is not None:
+            return cached
+
+        parent = os.path.dirname(directory)
+        is_top = parent == directory or os.path.exists(os.path.join(directory, ".git"))
+        rules = () if is_top else self._rules_for(parent)
+        try:
+            with open(os.path.join(directory, ".gitignore")) as f:
+                own = tuple(r for r in (IgnoreRule.parse(line, directory) for line in f) if r is not None)
+            rules += own
+        except (OSError, ValueError):
+            pass
+        self._rules[directory] = rules
+        return rules
+
+    def ignore_files(self, directory: Path) -> list[Path]:
+        """The .gitignore files whose rules apply inside `directory`, outermost first.
+
+        Every candidate is listed, whether or not it exists, so that creating
+        one counts as a change too. Empty when .gitignore files aren't honored.
+        """
+        if not self.gitignore:
+            return []
+        files = []
+        current = os.path.abspath(directory)
+        while True:
+            files.append(Path(current, ".gitignore"))
+            parent = os.path.dirname(current)
+            if parent == current or os.path.exists(os.path.join(current, ".git")):
+                break
+            current = parent
+        return files[::-1]
+
+    def is_ignored(self, entry: Entry) -> bool:
+        """Whether an entry is pruned by name or excluded by .gitignore."""
+        path = os.path.abspath(entry.path)
+        rules = self._rules_for(os.path.dirname(path)) if self.gitignore else ()
+        return self._ignored(entry, path, rules)
+
+    def _ignored(self, entry: Entry, path: str, rules: tuple[IgnoreRule, ...]) -> bool:
+        if entry.is_dir and entry.name in self.prune:
+            return True
+        ignored = False
+        for rule in rules:
+            if rule.negate == ignored and rule.match(path, entry.is_dir):
+                ignored = not rule.negate
+        return ignored
+
+    def visible(self, directory: Path) -> list[Entry]:
+        """List a directory without its ignored entries."""
+        # Resolve the directory once rather than every entry's path
+        key = os.path.abspath(directory)
+        rules = self._rules_for(key) if self.gitignore else ()
+        return [e for e in self.entries(directory) if not self._ignored(e, os.path.join(key, e.name), rules)]
+
+    def walk(self, root: Path) -> Iterator[Path]:
+        """Yield every non-ignored file under `root` in sorted path order.
+
+        Symlinked directories are listed but not descended into.
+        """
+        for entry in self.visible(root):
+            if entry.is_dir:
+                if not entry.is_symlink:
+                    yield from self.walk(entry.path)
+            else:
+                yield entry.path
+
+    def directories(self, root: Path) -> Iterator[Path]:
+        """Yield `root` and every non-ignored directory under it."""
+        yield root
+        for entry in self.visible(root):
+            if entry.is_dir and not entry.is_symlink:
+                yield from self.directories(entry.path)
+
+    def markdown_files(self, root: Path) -> Iterator[Path]:
+        """Yield the markdown files under `root`."""
+        return (p for p in self.walk(root) if p.suffix in MARKDOWN_SUFFIXES)
+
+    def markdown_targets(self, targets: list[Path]) -> Iterator[Path]:
+        """Yield the markdown files of `targets`: files as given, directories walked, each file once."""
+        # Only overlapping targets can repeat a file, so a single one needs no memory of what was seen
+        seen: set[Path] | None = set() if len(targets) > 1 else None
+        for target in targets:
+            for path in [target] if target.is_file() else self.markdown_files(target):
+                if seen is not None:
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                yield path
+
+    def find(self, root: Path, name: str) -> Iterator[Path]:
+        """Yield the files called `name` under `root`."""
+        return (p for p in self.walk(root) if p.name == name)
+
+
+_current: ScanIndex | None = None
+
+
+def get_index() -> ScanIndex:
+    """Return the scan index of the current run, creating a default one if needed."""
+    global _current
+    if _current is None:
+        _current = ScanIndex()
+    return _current
+
+
+def set_index(index: ScanIndex | None) -> None:
+    """Install the scan index for the current run (None resets to a fresh default)."""
+    global _current
+    _current = index
@@ -0,0 +1,261 @@
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sour.cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE, BlockCache
+from sour.config import load_config
+from sour.deps import DEFAULT_DEPENDENCIES, DependencyGraph
+from sour.discovery import discover_extensions
+from sour.manifest import DEFAULT_MANIFEST, Manifest
+from sour.registry import call_extension, get_extension_info
+from sour.runner import BlockResult, Executor, FileResult, SyncSettings, stream_sync
+from sour.scan import ScanIndex, set_index
+
+if TYPE_CHECKING:
+    from sour.watch import InotifyWatcher, PollingWatcher
+
+# A run installs its session's indexes as the process-wide ones, so runs never overlap
+_RUN_LOCK = threading.Lock()
+
+
+@dataclass
+class SyncResult:
+    """Outcome of `Session.sync` or `Session.check`.
+
+    Attributes:
+        files: One result per file, in discovery order. Files that rendered
+            carry the outcome of each of their blocks in `FileResult.blocks`;
+            files the manifest showed were in sync are `skipped` and have none.
+        errors: Problems with the run itself, such as paths that don't exist.
+        check: Whether the run left the files untouched.
+    """
+
+    files: list[FileResult] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    check: bool = False
+
+    @property
+    def changed(self) -> list[Path]:
+        """The files that were (or, for a check, would be) modified."""
+        return [result.path for result in self.files if result.changed]
+
+    @property
+    def failed(self) -> list[tuple[Path, BlockResult]]:
+        """The blocks that got an inline error or ran out of time, with their files."""
+        return [
+            (result.path, block)
+            for result in self.files
+            for block in result.blocks
+            if block.status in ("error", "timeout")
+        ]
+
+    @property
+    def ok(self) -> bool:
+        """Whether every block rendered and, for a check, every file was up to date."""
+        return not self.errors and not self.failed and not (self.check and self.changed)
+
+
+class Session:
+    """Sync markdown files in-process, keeping state warm from one run to the next.
+
+    The project's configuration is loaded and its extensions declared once.
+    Imported extensions, the block cache, the manifest and README descriptions
+    then carry over between runs, so a host process can sync over and over
+    without paying for a new process each time. Every run lists directories
+    afresh, unless the session watches the project: then only the directories
+    that changed are listed again.
+
+    Create a new session to pick up changes to pyproject.toml or to the code
+    of the project's own extensions.
+
+    Example:
+        with Session("docs-project") as session:
+            result = session.check()
+            for path, block in result.failed:
+                print(f"{path}: {block.name}: {block.error}")
+    """
+
+    def __init__(
+        self,
+        root: Path | str = ".",
+        *,
+        cache: bool = True,
+        jobs: int = 1,
+        executor: Executor | str = Executor.PROCESS,
+        concurrency: int = 1,
+        timeout: float | None = None,
+        cache_max_size: int = DEFAULT_MAX_SIZE,
+        watch: bool = False,
+    ):
+        """Load the project at `root`.
+
+        Args:
+            root: The project root: where pyproject.toml and `.sour` are, and
+                what relative paths are resolved against.
+            cache: Use the block cache, the manifest and the dependency graph under `root/.sour`.
+            jobs: Number of workers, as `sour sync --jobs`.
+            executor: Worker pool for `jobs`, as `sour sync --executor`.
+            concurrency: Blocks rendered at once, as `sour sync --concurrency`.
+            timeout: Seconds any one block may take; defaults to the project's `timeout`.
+            cache_max_size: Block cache size limit in bytes.
+            watch: Watch the directories runs list, and keep the listings of
+                those that don't change.
+        """
+        from sour.extensions.tree import ReadmeIndex
+
+        self.root = Path(root)
+        self.config = load_config(self.root)
+        cache_dir = self.root / DEFAULT_CACHE_DIR if cache else None
+        discover_extensions(self.config, None if cache_dir is None else cache_dir / "extensions.json")
+
+        self.settings = SyncSettings(
+            cache_dir=cache_dir,
+            cache_max_size=cache_max_size,
+            concurrency=concurrency,
+            timeout=timeout if timeout is not None else self.config.timeout,
+            timeouts=self.config.timeouts,
+            track_blocks=True,
+        )
+        self.jobs = jobs
+        self.executor = Executor(executor)
+        self.index = ScanIndex.from_config(self.config)
+        self.readmes = ReadmeIndex(None if cache_dir is None else cache_dir / "readmes.json")
+        self.manifest = Manifest(self.root / DEFAULT_MANIFEST) if cache else None
+        self.dependencies = DependencyGraph.load(self.root / DEFAULT_DEPENDENCIES) if cache else None
+        self._watcher: InotifyWatcher | PollingWatcher | None = None
+        if watch:
+            from sour.watch import create_watcher
+
+            self._watcher = create_watcher()
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop watching the project, if the session does."""
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def sync(self, paths: Iterable[Path | str] | None = None) -> SyncResult:
+        """Update the blocks of the markdown files in `paths`.
+
+        Args:
+            paths: Markdown files and directories; relative ones are resolved
+                against the root. Defaults to the whole project.
+
+        Returns:
+            What the run did to each file and block.
+        """
+        return self._run(paths, check=False)
+
+    def check(self, paths: Iterable[Path | str] | None = None) -> SyncResult:
+        """Render the blocks like `sync`, but leave the files untouched.
+
+        `SyncResult.changed` then lists the files that are out of date. See
+        `sync` for the arguments.
+        """
+        return self._run(paths, check=True)
+
+    def render_block(
+        self,
+        name: str,
+        options: dict[str, str] | None = None,
+        body: str = "",
+        file_path: Path | str = "README.md",
+    ) -> str:
+        """Render one block without reading or writing any markdown file.
+
+        Args:
+            name: The extension name, e.g. "TREE".
+            options: The options of the block header.
+            body: The block's current body.
+            file_path: The markdown file the block belongs to, which relative
+                paths in the options are resolved against; relative to the root.
+
+        Returns:
+            The new body, as `sync` would write it.
+
+        Raises:
+            KeyError: If no extension is registered under `name`.
+            ExtensionTimeout: If the extension ran out of time.
+        """
+        options = options or {}
+        path = self._resolve(file_path)
+        with _RUN_LOCK:
+            self._begin()
+            try:
+                info = get_extension_info(name)
+                timeout = self.settings.budget(name, options)
+                if self.settings.cache_dir is None:
+                    new_body = call_extension(info, body, options, path, timeout)
+                else:
+                    cache = BlockCache(self.settings.cache_dir, self.settings.cache_max_size)
+                    new_body = cache.render(name, info, body, options, path, timeout)
+                return (new_body if isinstance(new_body, str) else "".join(new_body)).strip()
+            finally:
+                self._end()
+
+    def _resolve(self, path: Path | str) -> Path:
+        return self.root / path
+
+    def _run(self, paths: Iterable[Path | str] | None, check: bool) -> SyncResult:
+        targets = [self.root] if paths is None else [self._resolve(path) for path in paths]
+        result = SyncResult(check=check)
+        with _RUN_LOCK:
+            self._begin()
+            try:
+                existing = []
+                for target in targets:
+                    if target.exists():
+                        existing.append(target)
+                    else:
+                        result.errors.append(f"Path not found: {target}")
+                settings = replace(self.settings, check=check)
+                files = self.index.markdown_targets(existing)
+                result.files.extend(
+                    stream_sync(
+                        files, settings, self.jobs, self.executor, self.manifest, dependencies=self.dependencies
+                    )
+                )
+                if self.manifest is not None:
+                    self.manifest.save()
+                if self.dependencies is not None:
+                    self.dependencies.save(self.root / DEFAULT_DEPENDENCIES)
+                if settings.cache_dir is not None:
+                    BlockCache(settings.cache_dir, settings.cache_max_size).prune()
+            finally:
+                self._end()
+        return result
+
+    def _begin(self) -> None:
+        """Install the session's indexes, forgetting whatever may have changed since the last run."""
+        from sour.extensions.tree import set_readme_index
+        from sour.watch import invalidate_paths
+
+        set_index(self.index)
+        set_readme_index(self.readmes)
+        changed = None if self._watcher is None else self._watcher.poll(0, 0)
+        if changed is None:
+            # Not watching, or events were lost
+            self.index.invalidate()
+            self.readmes.invalidate()
+        else:
+            invalidate_paths(changed)
+
+    def _end(self) -> None:
+        """Persist what the run learned and watch the directories it listed.
+
+        A listing taken before its directory was watched may have missed a
+        change, so it is dropped.
+        """
+        self.readmes.save()
+        if self._watcher is not None:
+            for directory in self._watcher.watch(self.index.listed()):
+                self.index.invalidate(directory)
+                self.readmes.invalidate(directory)
@@ -0,0 +1,266 @@
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple
+
+from sour import __version__
+from sour.config import make_state_dir
+
+# Seconds each file took to sync in earlier runs, written by `sour merge-reports`
+DEFAULT_COSTS = Path(".sour") / "costs.json"
+
+
+class Shard(NamedTuple):
+    """One of `count` slices of a run; `index` counts from 1."""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Shard":
+        """Parse a shard written as "i/N", e.g. "2/4".
+
+        Raises:
+            ValueError: If `spec` is malformed or out of range.
+        """
+        index, sep, count = spec.partition("/")
+        try:
+            shard = cls(int(index), int(count))
+        except ValueError:
+            shard = None
+        if not sep or shard is None or not 1 <= shard.index <= shard.count:
+            message = f"invalid shard '{spec}': expected i/N with 1 <= i <= N"
+            raise ValueError(message)
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def shard_key(path: Path) -> str:
+    """The name a file is sharded and reported by: its POSIX path relative to the current directory.
+
+    The same on every CI runner, wherever the checkout lives.
+    """
+    return Path(os.path.relpath(path)).as_posix()
+
+
+def _stable_hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+
+def partition(files: Iterable[Path], shard: Shard, costs: dict[str, float] | None = None) -> list[Path]:
+    """Select the files of one shard.
+
+    Without costs, files are assigned by a hash of their path, so a file stays
+    on the same shard as others are added or removed. With costs, files are
+    balanced by their cost instead: the most expensive first, each onto the
+    least loaded shard. Files without a recorded cost count as the average one.
+    Either way the split only depends on the files and the costs, so every
+    shard computes the same one.
+
+    Args:
+        files: Every file of the run.
+        shard: The shard to select.
+        costs: Seconds each file took in an earlier run, by `shard_key`.
+
+    Returns:
+        The shard's files, sorted.
+    """
+    keyed = sorted((shard_key(path), path) for path in files)
+    if not costs:
+        return sorted(path for key, path in keyed if _stable_hash(key) % shard.count == shard.index - 1)
+
+    known = [costs[key] for key, _ in keyed if key in costs]
+    default = sum(known) / len(known) if known else 1.0
+    weighted = sorted(keyed, key=lambda item: (-costs.get(item[0], default), _stable_hash(item[0]), item[0]))
+    loads = [(0.0, i) for i in range(shard.count)]
+    selected = []
+    for key, path in weighted:
+        load, i = heapq.heappop(loads)
+        heapq.heappush(loads, (load + costs.get(key, default), i))
+        if i == shard.index - 1:
+            selected.append(path)
+    return sorted(selected)
+
+
+def split_digests(files: Iterable[Path], costs: dict[str, float] | None = None) -> dict[str, str]:
+    """Digests of what `partition` splits a run by: the files and the costs.
+
+    Shards only split a run the same way when they agree on both, e.g. when
+    every runner restored the same costs file.
+
+    Returns:
+        The digests of the files and of the costs, by name.
+    """
+    keys = sorted(shard_key(path) for path in files)
+    return {
+        "files": hashlib.sha256(json.dumps(keys).encode()).hexdigest(),
+        "costs": hashlib.sha256(json.dumps(costs or {}, sort_keys=True).encode()).hexdigest(),
+    }
+
+
+def load_costs(path: Path = DEFAULT_COSTS) -> dict[str, float]:
+    """Read per-file costs written by `save_costs`; missing or unreadable files give none."""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != __version__:
+        return {}
+    return {key: float(seconds) for key, seconds in data.get("files", {}).items()}
+
+
+def save_costs(costs: dict[str, float], path: Path = DEFAULT_COSTS) -> None:
+    """Write per-file costs atomically."""
+    make_state_dir(path.parent)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"version": __version__, "files": costs}, f, sort_keys=True)
+    os.replace(tmp, path)
+
+
+@dataclass
+class ShardReport:
+    """What one shard of `sour sync` did, for `sour merge-reports` to combine.
+
+    Attributes:
+        shard: The shard, or None for a run that processed every file.
+        check: Whether the run was a `--check` run.
+        files: One record per file: its `path`, `action` ("updated",
+            "would-update", "unchanged" or "skipped"), `warnings` and `seconds`.
+        counts: The run's totals, as in the `--format jsonl` summary.
+        digests: The `split_digests` the shard split the run by.
+    """
+
+    shard: Shard | None
+    check: bool
+    files: list[dict] = field(default_factory=list)
+    counts: dict[str, int] = field(default_factory=dict)
+    digests: dict[str, str] = field(default_factory=dict)
+
+    def save(self, path: Path) -> None:
+        """Write the report atomically."""
+        make_state_dir(path.parent)
+        data = {
+            "version": __version__,
+            "shard": None if self.shard is None else str(self.shard),
+            "check": self.check,
+            "files": self.files,
+            "counts": self.counts,
+            "digests": self.digests,
+        }
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ShardReport":
+        """Read a report written by `save`.
+
+        Raises:
+            ValueError: If the report is missing, malformed or from another sour version.
+        """
+        try:
+            data = json.loads(path.read_text())
+        except OSError as e:
+            message = f"Cannot read report {path}: {e.strerror}"
+            raise ValueError(message) from e
+        except ValueError as e:
+            message = f"Malformed report {path}"
+            raise ValueError(message) from e
+        if not isinstance(data, dict) or data.get("version") != __version__:
+            message = f"Report {path} was written by another sour version"
+            raise ValueError(message)
+        shard = None if data.get("shard") is None else Shard.parse(data["shard"])
+        return cls(
+            shard, bool(data.get("check")), data.get("files", []), data.get("counts", {}), data.get("digests", {})
+        )
+
+
+def _shard_count(reports: list[ShardReport]) -> int:
+    """The number of shards reports of the same sharded run split it into.
+
+    Raises:
+        ValueError: If the reports come from different kinds of runs, or split
+            different files or by different costs.
+    """
+    counts = {report.shard.count for report in reports if report.shard is not None}
+    if len(counts) > 1:
+        message = f"Reports split the run differently: {', '.join(str(r.shard) for r in reports)}"
+        raise ValueError(message)
+    if len({report.check for report in reports}) > 1:
+        message = "Reports mix --check and regular runs"
+        raise ValueError(message)
+    differing = [name for name in ("files", "costs") if len({report.digests.get(name) for report in reports}) > 1]
+    if differing:
+        message = (
+            f"Reports split different {' and '.join(differing)}: every shard must discover the same files"
+            " and restore the same costs file"
+        )
+        raise ValueError(message)
+    return counts.pop()
+
+
+def _check_complete(indexes: list[int], count: int) -> None:
+    """Make sure every shard of `count` reported exactly once.
+
+    Raises:
+        ValueError: Naming the missing and repeated shards.
+    """
+    seen = sorted(indexes)
+    if seen == list(range(1, count + 1)):
+        return
+    problems = []
+    missing = [f"{i}/{count}" for i in range(1, count + 1) if i not in seen]
+    if missing:
+        problems.append(f"missing {', '.join(missing)}")
+    repeated = sorted({f"{i}/{count}" for i in seen if seen.count(i) > 1})
+    if repeated:
+        problems.append(f"repeated {', '.join(repeated)}")
+    message = f"Incomplete shard reports: {'; '.join(problems)}"
+    raise ValueError(message)
+
+
+def merge_reports(reports: list[ShardReport]) -> ShardReport:
+    """Combine the reports of every shard of one run.
+
+    Raises:
+        ValueError: If a shard is missing or repeated, or the reports come from
+            different kinds of runs or split them differently.
+    """
+    if not reports:
+        message = "No reports to merge"
+        raise ValueError(message)
+    if any(report.shard is None for report in reports):
+        if len(reports) > 1:
+            message = "Only reports of sharded runs can be merged"
+            raise ValueError(message)
+        return reports[0]
+    _check_complete([report.shard.index for report in reports], _shard_count(reports))
+
+    merged = ShardReport(None, reports[0].check)
+    for report in reports:
+        merged.files.extend(report.files)
+        for key, value in report.counts.items():
+            merged.counts[key] = merged.counts.get(key, 0) + value
+    merged.files.sort(key=lambda record: record["path"])
+    return merged
+
+
+def report_costs(report: ShardReport, previous: dict[str, float] | None = None) -> dict[str, float]:
+    """Update per-file costs with the files a run actually rendered.
+
+    Files the manifest let the run skip keep their previous cost.
+    """
+    costs = dict(previous or {})
+    for record in report.files:
+        if record["action"] != "skipped":
+            costs[record["path"]] = round(record["seconds"], 6)
+    return costs
@@ -0,0 +1,314 @@
+import contextlib
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from collections.abc import Callable, Container, Iterable, Iterator
+from pathlib import Path
+
+from sour.core import parse_document
+from sour.deps import DependencyGraph
+from sour.extensions.tree import get_readme_index
+from sour.runner import FileResult, SyncSettings, block_inputs, sync_document
+from sour.scan import MARKDOWN_SUFFIXES, get_index
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+
+def _decode_events(data: bytes) -> Iterator[tuple[int, int, bytes]]:
+    """Split a read from an inotify descriptor into (watch descriptor, mask, name) events."""
+    offset = 0
+    while offset < len(data):
+        wd, mask, _, length = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        yield wd, mask, data[offset : offset + length].rstrip(b"\0")
+        offset += length
+
+
+class InotifyWatcher:
+    """Directory watcher backed by Linux inotify, loaded through ctypes."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, Path] = {}
+        self._watched: set[str] = set()
+
+    def watch(self, directories: Iterable[Path]) -> list[Path]:
+        """Start watching `directories` (already watched ones are skipped).
+
+        Returns:
+            The directories that were not watched before.
+        """
+        added = []
+        for directory in directories:
+            key = os.path.abspath(directory)
+            if key in self._watched:
+                continue
+            wd = self._add_watch(self._fd, os.fsencode(key), WATCH_MASK)
+            if wd >= 0:
+                self._dirs[wd] = directory
+                self._watched.add(key)
+                added.append(directory)
+        return added
+
+    def poll(self, timeout: float, debounce: float = 0.02) -> set[Path] | None:
+        """Wait for changes.
+
+        Args:
+            timeout: Seconds to wait for the first event.
+            debounce: Seconds to keep collecting events after the first one.
+
+        Returns:
+            The changed paths (empty on timeout), or None if events were lost
+            and everything must be rescanned.
+        """
+        changed: set[Path] = set()
+        wait = timeout
+        while select.select([self._fd], [], [], wait)[0]:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            for wd, mask, name in _decode_events(data):
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                path = self._event_path(wd, mask, name)
+                if path is not None:
+                    changed.add(path)
+            wait = debounce
+        return changed
+
+    def _event_path(self, wd: int, mask: int, name: bytes) -> Path | None:
+        """The path an event reports as changed; forgets watches the kernel removed."""
+        directory = self._dirs.get(wd)
+        if directory is None:
+            return None
+        if mask & IN_IGNORED:
+            self._watched.discard(os.path.abspath(directory))
+            del self._dirs[wd]
+            return None
+        return directory / os.fsdecode(name) if name else directory
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Portable fallback: compares directory snapshots at a fixed interval."""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self._snapshots: dict[Path, dict[str, tuple[int, int]]] = {}
+
+    @staticmethod
+    def _snapshot(directory: Path) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    try:
+                        stat = item.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    snapshot[item.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        return snapshot
+
+    def watch(self, directories: Iterable[Path]) -> list[Path]:
+        """Start watching `directories` (already watched ones are skipped).
+
+        Returns:
+            The directories that were not watched before.
+        """
+        added = []
+        for directory in directories:
+            if directory not in self._snapshots:
+                self._snapshots[directory] = self._snapshot(directory)
+                added.append(directory)
+        return added
+
+    def poll(self, timeout: float, debounce: float = 0.0) -> set[Path] | None:
+        """Wait up to `timeout` seconds for changes and return the changed paths."""
+        deadline = time.monotonic() + timeout
+        while True:
+            changed = self._rescan()
+            if changed or time.monotonic() >= deadline:
+                return changed
+            time.sleep(min(self.interval, max(0.0, deadline - time.monotonic())))
+
+    def _rescan(self) -> set[Path]:
+        """Take new snapshots and return the entries that differ from the previous ones."""
+        changed = set()
+        for directory, before in self._snapshots.items():
+            after = self._snapshot(directory)
+            if after != before:
+                self._snapshots[directory] = after
+                names = {n for n in before.keys() | after.keys() if before.get(n) != after.get(n)}
+                changed.update(directory / name for name in names)
+        return changed
+
+    def close(self) -> None:
+        self._snapshots.clear()
+
+
+def create_watcher(poll: bool = False) -> InotifyWatcher | PollingWatcher:
+    """Create an inotify watcher where available, else a polling one."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def invalidate_paths(changed: Iterable[Path]) -> None:
+    """Make the scan and README indexes forget what they know about changed paths."""
+    index = get_index()
+    readmes = get_readme_index()
+    for path in changed:
+        if path.name == ".gitignore":
+            index.invalidate()  # the rules of every directory below may have changed
+        index.invalidate(path.parent)
+        index.invalidate(path)
+        if path.name == "README.md":
+            readmes.invalidate(path.parent)
+
+
+class WatchSession:
+    """Keeps markdown files in sync, re-rendering only blocks whose inputs change."""
+
+    def __init__(
+        self,
+        roots: list[Path],
+        settings: SyncSettings,
+        watcher: InotifyWatcher | PollingWatcher,
+        report: Callable[[FileResult], None] = lambda result: None,
+    ):
+        self.roots = roots
+        self.settings = settings
+        self.watcher = watcher
+        self.report = report
+        self.graph = DependencyGraph()
+        self._written: dict[Path, int] = {}
+
+    def _discover(self) -> list[Path]:
+        index = get_index()
+        files = set()
+        for root in self.roots:
+            if root.is_file():
+                files.add(root)
+            elif root.is_dir():
+                files.update(index.markdown_files(root))
+        return sorted(files)
+
+    def _watch_all(self) -> None:
+        # Watch in a stable order so events for markdown files are reported
+        # relative to the roots, the same way discovery names them
+        index = get_index()
+        directories = []
+        for root in self.roots:
+            if root.is_dir():
+                directories.extend(index.directories(root))
+        for path in [*self.graph.files, *sorted(self.graph.input_paths())]:
+            directories.append(path if index.is_dir(path) else path.parent)
+        self.watcher.watch(d for d in directories if index.is_dir(d))
+
+    def refresh(self, path: Path, only: Container[int] | None = None) -> FileResult | None:
+        """Re-render the given blocks (or all) of one file and update its dependencies."""
+        try:
+            document = parse_document(path.read_text())
+        except (OSError, ValueError):
+            self.graph.remove(path)
+            return None
+        result = sync_document(path, document, self.settings, only)
+        if result.changed and not self.settings.check:
+            with contextlib.suppress(OSError):
+                self._written[path] = path.stat().st_mtime_ns
+        self.graph.update(path, block_inputs(document, path))
+        return result
+
+    def start(self) -> list[FileResult]:
+        """Sync every file once, build the dependency graph and start watching."""
+        results = [r for r in (self.refresh(path) for path in self._discover()) if r is not None]
+        self._watch_all()
+        return results
+
+    def _tracks(self, path: Path) -> bool:
+        """Whether a markdown file is (or, if new, should be) kept in sync."""
+        if path in self.graph:
+            return True
+        entry = get_index().entry(path)
+        if entry is not None and get_index().is_ignored(entry):
+            return False
+        return any(path == root or (root.is_dir() and path.is_relative_to(root)) for root in self.roots)
+
+    def _is_own_write(self, path: Path) -> bool:
+        recorded = self._written.get(path)
+        if recorded is None:
+            return False
+        try:
+            return path.stat().st_mtime_ns == recorded
+        except OSError:
+            return False
+
+    def handle(self, changed: set[Path] | None) -> list[FileResult]:
+        """React to a batch of changed paths.
+
+        Args:
+            changed: Paths reported by the watcher, or None to rescan everything.
+
+        Returns:
+            Results for the files that were re-rendered.
+        """
+        if changed is None:
+            get_index().invalidate()
+            return self.start()
+        if not changed:
+            return []
+
+        invalidate_paths(changed)
+        work: dict[Path, set[int] | None] = dict(self.graph.affected(changed))
+        if not all(self._is_own_write(path) for path in changed):
+            # Blocks whose inputs are unknown may depend on anything but the session's own writes
+            for path, blocks in self.graph.undeclared().items():
+                work.setdefault(path, set()).update(blocks)
+        for path in changed:
+            if path.suffix in MARKDOWN_SUFFIXES and not self._is_own_write(path) and self._tracks(path):
+                work[path] = None  # the file itself changed: re-render every block
+        if any(get_index().is_dir(path) for path in changed):
+            self._watch_all()
+
+        results = []
+        for path in sorted(work):
+            result = self.refresh(path, work[path])
+            if result is not None:
+                results.append(result)
+        return results
+
+    def run(self, timeout: float = 1.0, debounce: float = 0.02) -> None:
+        """Process change batches until interrupted."""
+        while True:
+            for result in self.handle(self.watcher.poll(timeout, debounce)):
+                self.report(result)
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+from generate import RepoShape, generate_repo
+from run import compare, measure, scenarios
+
+SHAPE = RepoShape(files=5, blocks_per_file=2, depth=2, fanout=2, readmes=2, recipes=3)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    from sour.scan import set_index
+
+    set_index(None)
+    yield
+    set_index(None)
+
+
+def test_generate_repo_shape(tmp_path):
+    files = generate_repo(tmp_path / "repo", SHAPE)
+    assert len(files) == 5
+    assert all(f.read_text().count("<!-- /docs -->") == 2 for f in files)
+    assert len(list((tmp_path / "repo").rglob("README.md"))) == 2
+    assert (tmp_path / "repo" / "justfile").read_text().count("recipe") == 3
+
+
+def test_generate_repo_is_deterministic(tmp_path):
+    first = [f.read_text() for f in generate_repo(tmp_path / "a", SHAPE)]
+    second = [f.read_text() for f in generate_repo(tmp_path / "b", SHAPE)]
+    assert first == second
+
+
+def test_render_scenarios_run(tmp_path):
+    root = tmp_path / "repo"
+    for scenario in scenarios(root, SHAPE):
+        if scenario.name.startswith("render-"):
+            assert measure(scenario, root, repeat=1, cold=False)[0] > 0
+
+
+def test_compare_flags_regressions():
+    baseline = {"shape": {}, "results": {"sync/warm": {"median": 1.0}, "render-just/warm": {"median": 0.001}}}
+    current = {"shape": {}, "results": {"sync/warm": {"median": 1.5}, "render-just/warm": {"median": 0.003}}}
+    regressions = compare(current, baseline)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("sync/warm")
+
+
+def test_compare_rejects_other_shapes():
+    assert compare({"shape": {"files": 1}, "results": {}}, {"shape": {"files": 2}, "results": {}})
+
+
+def test_compare_rejects_other_machines():
+    baseline = {"shape": {}, "python": "3.12.1", "platform": "Linux-x86_64", "results": {"sync/warm": {"median": 1.0}}}
+    current = {**baseline, "platform": "macOS-arm64", "results": {"sync/warm": {"median": 0.5}}}
+    regressions = compare(current, baseline)
+    assert len(regressions) == 1
+    assert "macOS-arm64" in regressions[0]
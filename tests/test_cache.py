@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from sour.cache import (
+    STREAM_THRESHOLD,
+    BlockCache,
+    RenderMemo,
+    get_render_memo,
+    reset_render_memo,
+    set_render_memo,
+)
+from sour.registry import ExtensionInfo
+
+
+def test_key_depends_on_inputs():
+    key = BlockCache.key("TREE", "1", {"path": "."}, "abc")
+    assert key == BlockCache.key("TREE", "1", {"path": "."}, "abc")
+    assert key != BlockCache.key("TREE", "2", {"path": "."}, "abc")
+    assert key != BlockCache.key("TREE", "1", {"path": "src"}, "abc")
+    assert key != BlockCache.key("TREE", "1", {"path": "."}, "abd")
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = BlockCache(tmp_path)
+    key = BlockCache.key("TEST", "0", {}, "x")
+    assert cache.get(key) is None
+    cache.put(key, "body")
+    assert cache.get(key) == "body"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_state_directory_is_ignored_by_git(tmp_path):
+    BlockCache(tmp_path / ".sour" / "cache").put("ab" * 32, "body")
+    assert (tmp_path / ".sour" / ".gitignore").read_text().splitlines()[-1] == "*"
+
+    # A state directory that already exists is left as it is
+    (tmp_path / ".sour" / ".gitignore").unlink()
+    BlockCache(tmp_path / ".sour" / "other").put("ab" * 32, "body")
+    assert not (tmp_path / ".sour" / ".gitignore").exists()
+
+
+def test_entries_are_readable_by_others_sharing_the_cache(tmp_path):
+    umask = os.umask(0o022)
+    os.umask(umask)
+    cache = BlockCache(tmp_path)
+    cache.put("ab" * 32, "body")
+    assert "".join(cache._tee("cd" * 32, iter(["streamed"]))) == "streamed"
+    for key in ("ab" * 32, "cd" * 32):
+        assert (tmp_path / key[:2] / key).stat().st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_render_reuses_stored_body(tmp_path):
+    calls = []
+
+    def func(content, options, file_path):
+        calls.append(file_path)
+        return "rendered"
+
+    info = ExtensionInfo(func, "1", lambda options, file_path: "inputs")
+    cache = BlockCache(tmp_path)
+    assert cache.render("TEST", info, "", {}, Path("a.md")) == "rendered"
+    assert cache.render("TEST", info, "", {}, Path("a.md")) == "rendered"
+    assert len(calls) == 1
+
+
+def test_streamed_body_is_stored_as_it_is_consumed(tmp_path):
+    chunk = "x" * (STREAM_THRESHOLD // 4)
+    info = ExtensionInfo(lambda content, options, file_path: (chunk for _ in range(5)), "1", lambda *_: "inputs")
+    cache = BlockCache(tmp_path)
+    body = cache.render("TEST", info, "", {}, Path("a.md"))
+    key = BlockCache.key("TEST", "1", {}, "inputs")
+    assert cache.get(key) is None  # nothing is stored before the body is consumed
+    assert "".join(body) == chunk * 5
+    cached = cache.get(key)
+    assert not isinstance(cached, str)  # large entries come back in chunks too
+    assert "".join(cached) == chunk * 5
+
+
+def test_partly_consumed_stream_is_not_stored(tmp_path):
+    info = ExtensionInfo(lambda content, options, file_path: iter(["a", "b"]), "1", lambda *_: "inputs")
+    cache = BlockCache(tmp_path)
+    body = cache.render("TEST", info, "", {}, Path("a.md"))
+    next(body)
+    body.close()
+    assert cache.get(BlockCache.key("TEST", "1", {}, "inputs")) is None
+    assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+
+def test_render_without_fingerprint_is_not_cached(tmp_path):
+    calls = []
+    info = ExtensionInfo(lambda content, options, file_path: calls.append(1) or "rendered")
+    cache = BlockCache(tmp_path)
+    cache.render("TEST", info, "", {}, Path("a.md"))
+    cache.render("TEST", info, "", {}, Path("a.md"))
+    assert len(calls) == 2
+    assert not any(tmp_path.iterdir())
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = BlockCache(tmp_path, max_size=10)
+    keys = [BlockCache.key("TEST", "0", {}, str(i)) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 5)
+        entry = tmp_path / key[:2] / key
+        os.utime(entry, ns=(i * 10**9, i * 10**9))
+
+    assert cache.prune() == 1
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == "xxxxx"
+
+
+def test_render_memo_key_requires_pure_extension_with_inputs(tmp_path):
+    memo = RenderMemo()
+    inputs = lambda _, file_path: [file_path.parent / "src"]
+    pure = ExtensionInfo(lambda *_: "body", inputs=inputs, name="X", pure=True)
+    assert memo.key(pure, {}, tmp_path / "a.md") == memo.key(pure, {}, tmp_path / "b.md")
+    assert memo.key(pure, {}, tmp_path / "a.md") != memo.key(pure, {"depth": "2"}, tmp_path / "a.md")
+    assert memo.key(pure, {}, tmp_path / "a.md") != memo.key(pure, {}, tmp_path / "sub" / "a.md")
+    assert memo.key(ExtensionInfo(lambda *_: "body", inputs=inputs, name="X"), {}, tmp_path / "a.md") is None
+    assert memo.key(ExtensionInfo(lambda *_: "body", name="X", pure=True), {}, tmp_path / "a.md") is None
+
+
+def test_render_memo_does_not_remember_failures():
+    memo = RenderMemo()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        memo.render("key", fail)
+    assert memo.render("key", lambda: "body") == ("body", False)
+    assert memo.render("key", fail) == ("body", True)
+
+
+def test_render_memo_waiters_retry_a_failed_render():
+    memo = RenderMemo()
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        await asyncio.sleep(0)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return "body"
+
+    async def main():
+        return await asyncio.gather(
+            memo.render_async("key", compute), memo.render_async("key", compute), return_exceptions=True
+        )
+
+    first, second = asyncio.run(main())
+    assert isinstance(first, ValueError)
+    assert second == ("body", False)
+    assert len(calls) == 2
+
+
+def test_render_memo_is_local_to_each_thread():
+    memo = RenderMemo()
+    seen = []
+    token = set_render_memo(memo)
+    try:
+        thread = threading.Thread(target=lambda: seen.append(get_render_memo()))
+        thread.start()
+        thread.join()
+        assert get_render_memo() is memo
+    finally:
+        reset_render_memo(token)
+    assert seen == [None]
+    assert get_render_memo() is None
@@ -0,0 +1,165 @@
+import shutil
+import subprocess
+
+import pytest
+from typer.testing import CliRunner
+
+import sour.extensions.just  # noqa: F401
+from sour import manifest as manifest_module
+from sour.changes import GitError, affected_files, git_changed_paths
+from sour.main import app
+from sour.manifest import Manifest
+from sour.runner import SyncSettings, sync_files
+from sour.scan import set_index
+
+
+def git(repo, *args):
+    subprocess.run(  # noqa: S603 - fixed git commands on a temporary repository
+        [shutil.which("git"), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest_module, "RACY_WINDOW_NS", 0)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("")
+    (tmp_path / "justfile").write_text("[doc('Say hello')]\nhello:\n    echo hi\n")
+    (tmp_path / "just.md").write_text('<!-- docs JUST recipe="hello" -->\n<!-- /docs -->\n')
+    (tmp_path / "tree.md").write_text('<!-- docs TREE path="src" -->\n<!-- /docs -->\n')
+    (tmp_path / "plain.md").write_text("# Plain\n")
+    set_index(None)
+    sync_files(sorted(tmp_path.glob("*.md")), SyncSettings(cache_dir=None))
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "init")
+    yield tmp_path
+    set_index(None)
+
+
+def _affected(repo, **kwargs):
+    changed = git_changed_paths(cwd=repo, **kwargs)
+    return [p.name for p in affected_files(sorted(repo.glob("*.md")), changed)]
+
+
+def test_no_changes(repo):
+    assert git_changed_paths(cwd=repo) == set()
+    assert _affected(repo) == []
+
+
+def test_changed_markdown_file_is_selected(repo):
+    (repo / "plain.md").write_text("# Edited\n")
+    assert _affected(repo) == ["plain.md"]
+
+
+def test_changed_justfile_selects_its_consumers(repo):
+    (repo / "justfile").write_text("[doc('Say bye')]\nhello:\n    echo bye\n")
+    assert _affected(repo) == ["just.md"]
+
+
+def test_untracked_file_under_tree_path(repo):
+    (repo / "src" / "new.py").write_text("")
+    assert _affected(repo) == ["tree.md"]
+
+
+def test_file_in_new_nested_directory(repo):
+    (repo / "src" / "pkg" / "sub").mkdir(parents=True)
+    (repo / "src" / "pkg" / "sub" / "mod.py").write_text("")
+    assert repo / "src" / "pkg" in git_changed_paths(cwd=repo)
+    assert _affected(repo) == ["tree.md"]
+
+
+def test_modified_file_under_tree_path_is_ignored(repo):
+    (repo / "src" / "app.py").write_text("print()\n")
+    assert _affected(repo) == []
+
+
+def test_staged_only_sees_the_index(repo):
+    (repo / "justfile").write_text("[doc('Say bye')]\nhello:\n    echo bye\n")
+    (repo / "plain.md").write_text("# Edited\n")
+    git(repo, "add", "plain.md")
+    assert _affected(repo, staged=True) == ["plain.md"]
+
+
+def test_changed_since_ref(repo):
+    (repo / "plain.md").write_text("# Edited\n")
+    git(repo, "commit", "-qam", "edit")
+    assert _affected(repo) == []
+    assert _affected(repo, ref="HEAD~1") == ["plain.md"]
+
+
+def test_manifest_inputs_are_reused(repo, monkeypatch):
+    manifest = Manifest(repo / ".sour" / "manifest.json")
+    sync_files([repo / "just.md"], SyncSettings(cache_dir=None), manifest=manifest)
+    monkeypatch.setattr("sour.changes.parse_document", lambda text: pytest.fail("file was parsed"))
+    assert affected_files([repo / "just.md"], {repo / "justfile"}, manifest) == [repo / "just.md"]
+
+
+def test_unknown_ref_raises(repo):
+    with pytest.raises(GitError):
+        git_changed_paths("no-such-ref", cwd=repo)
+
+
+def test_missing_git_raises(repo, monkeypatch):
+    monkeypatch.setattr("sour.changes.shutil.which", lambda name: None)
+    with pytest.raises(GitError, match="not found"):
+        git_changed_paths(cwd=repo)
+
+
+def test_cli_changed_since(repo):
+    (repo / "justfile").write_text("[doc('Say bye')]\nhello:\n    echo bye\n")
+    result = CliRunner().invoke(app, ["sync", "--check", "--no-cache", "--changed-since", "HEAD"])
+    assert result.exit_code == 1
+    assert "just.md" in result.output
+    assert "Files processed: 1" in result.output
+
+
+def test_cli_rejects_both_modes(repo):
+    result = CliRunner().invoke(app, ["sync", "--staged", "--changed-since", "HEAD"])
+    assert result.exit_code != 0
+
+
+def test_cli_affected_uses_the_graph_written_by_sync(repo, monkeypatch):
+    assert CliRunner().invoke(app, ["sync", "--no-daemon"]).exit_code == 0
+    assert (repo / ".sour" / "deps.json").exists()
+    (repo / "justfile").write_text("[doc('Say bye')]\nhello:\n    echo bye\n")
+    monkeypatch.setattr("sour.changes.index_dependencies", lambda files, graph: pytest.fail("files were scanned"))
+    result = CliRunner().invoke(app, ["affected", "justfile", "--check", "-q"])
+    assert result.exit_code == 1
+    assert result.output.splitlines()[0] == "would-update just.md"
+    assert "processed=1" in result.output  # the TREE block reads src, not the project root
+
+
+def test_cli_affected_builds_a_missing_graph(repo):
+    (repo / "src" / "new.py").write_text("")
+    result = CliRunner().invoke(app, ["affected", "src/new.py", "-q"])
+    assert result.exit_code == 0
+    assert "updated tree.md" in result.output
+    assert "new.py" in (repo / "tree.md").read_text()
+    assert (repo / ".sour" / "deps.json").exists()
+
+
+def test_cli_affected_file_in_new_subdirectory(repo):
+    assert CliRunner().invoke(app, ["sync", "--no-daemon"]).exit_code == 0
+    (repo / "src" / "d").mkdir()
+    (repo / "src" / "d" / "q.py").write_text("")
+    result = CliRunner().invoke(app, ["affected", "src/d/q.py", "--check", "-q"])
+    assert result.exit_code == 1
+    assert result.output.splitlines()[0] == "would-update tree.md"
+
+
+def test_cli_affected_renders_changed_markdown_files(repo):
+    (repo / "plain.md").write_text('<!-- docs TREE path="src" -->\n<!-- /docs -->\n')
+    result = CliRunner().invoke(app, ["affected", "plain.md", "-q"])
+    assert "updated plain.md" in result.output
+    assert "app.py" in (repo / "plain.md").read_text()
+
+
+def test_cli_affected_without_dependents(repo):
+    result = CliRunner().invoke(app, ["affected", "nowhere/else.txt"])
+    assert result.exit_code == 0
+    assert "No blocks depend on the changed paths." in result.output
@@ -1,4 +1,14 @@
-from sour.core import parse_block, process_content
+from sour.core import (
+    block_pieces,
+    clear_content,
+    format_block,
+    parse_block,
+    parse_document,
+    process_content,
+    render_document,
+    strip_chunks,
+)
+
 
 def test_parse_block_simple():
     block = '<!-- docs TREE path="." -->'
@@ -20,7 +30,7 @@ def test_parse_block_quoted_values():
 
 def test_process_content_no_blocks():
     content = "# Title\n\nSome text."
-    new_content = process_content(content, lambda n, o, p: "")
+    new_content = process_content(content, lambda *_: "")
     assert new_content == content
 
 def test_process_content_with_block():
@@ -48,3 +58,52 @@ New Content
 
     new_content = process_content(content, mock_transform)
     assert new_content.strip() == expected.strip()
+
+def test_parse_document_spans_and_blocks():
+    content = 'intro\n<!-- docs A x=1 -->old<!-- /docs -->\nmid\n<!--docs B--><!--  /docs  -->'
+    document = parse_document(content)
+    assert [type(n).__name__ for n in document.nodes] == ["Span", "Block", "Span", "Block"]
+
+    first, second = document.blocks
+    assert (first.name, first.options, first.body) == ("A", {"x": "1"}, "old")
+    assert content[first.start:first.end] == '<!-- docs A x=1 -->old<!-- /docs -->'
+    assert second.name == "B"
+    assert second.footer == "<!--  /docs  -->"
+
+def test_parse_document_unterminated_block_is_text():
+    content = "<!-- docs A -->\nno footer\n<!-- docs B -->"
+    document = parse_document(content)
+    assert document.blocks == ()
+    assert process_content(content, lambda *args: "x") is content
+
+def test_render_document_splices_only_changed_blocks():
+    content = "a\n<!-- docs A -->\n\nsame\n\n<!-- /docs -->\nb\n<!-- docs B -->old<!-- /docs -->\n"
+    document = parse_document(content)
+    new_content = render_document(document, lambda name, body, options, path: "same" if name == "A" else "new")
+    assert new_content == "a\n<!-- docs A -->\n\nsame\n\n<!-- /docs -->\nb\n<!-- docs B -->\n\nnew\n\n<!-- /docs -->\n"
+    assert render_document(document, lambda name, body, options, path: body.strip()) != content
+
+def test_render_document_reports_errors_inline():
+    def failing(name, body, options, path):
+        raise KeyError("boom")
+
+    assert "<!-- Error: 'boom' -->" in process_content("<!-- docs A -->x<!-- /docs -->", failing)
+
+def test_strip_chunks_matches_strip():
+    for chunks in (["  a ", " b\n", "\n"], ["", " ", "x"], ["\n\n", "  "], ["a", "", "  ", "b  "]):
+        assert "".join(strip_chunks(chunks)) == "".join(chunks).strip()
+
+def test_streamed_body_is_laid_out_like_a_string():
+    [block] = parse_document("<!-- docs A -->old<!-- /docs -->").blocks
+    assert "".join(block_pieces(block, iter(["\n one", "\ntwo  "]))) == format_block(block, " one\ntwo")
+
+    def failing():
+        yield "partial"
+        raise ValueError("boom")
+
+    assert "<!-- Error: boom -->" in format_block(block, failing())
+
+def test_clear_content():
+    content = "<!-- docs A -->\nbody\n<!--/docs-->\n"
+    assert clear_content(content) == "<!-- docs A -->\n\n<!-- /docs -->\n"
+    assert clear_content(clear_content(content)) == clear_content(content)
@@ -0,0 +1,73 @@
+import io
+import threading
+from pathlib import Path
+
+import pytest
+
+from sour.daemon import DEFAULT_SOCKET, Daemon, forward
+from sour.extensions.tree import set_readme_index
+from sour.main import SyncOptions
+from sour.scan import set_index
+from sour.watch import PollingWatcher
+
+TREE_DOC = '<!-- docs TREE path="src" add_docs=false -->\n<!-- /docs -->\n'
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").touch()
+    (tmp_path / "doc.md").write_text(TREE_DOC)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    set_index(None)
+    set_readme_index(None)
+
+
+@pytest.fixture
+def daemon(project):
+    server = Daemon(Path("."), DEFAULT_SOCKET, PollingWatcher())
+    server.start()
+    thread = threading.Thread(target=server.serve, args=(0.05,))
+    thread.start()
+    yield server
+    server.stop()
+    thread.join()
+    server.close()
+
+
+def _sync(**options) -> tuple[int | None, str]:
+    out = io.StringIO()
+    return forward(SyncOptions([Path(".")], **options), out=out), out.getvalue()
+
+
+def test_forward_without_daemon(project):
+    assert _sync() == (None, "")
+
+
+def test_forward_with_stale_socket(project):
+    DEFAULT_SOCKET.parent.mkdir()
+    DEFAULT_SOCKET.touch()
+    assert _sync() == (None, "")
+
+
+def test_daemon_syncs_and_sees_changes(daemon, project):
+    assert _sync(check=True)[0] == 1
+
+    exit_code, output = _sync()
+    assert exit_code == 0
+    assert "Files modified: 1" in output
+    assert "a.py" in (project / "doc.md").read_text()
+
+    # The daemon's directory listings are warm, but follow changes on disk
+    (project / "src" / "b.py").touch()
+    exit_code, output = _sync()
+    assert exit_code == 0
+    assert "b.py" in (project / "doc.md").read_text()
+
+
+def test_daemon_restarts_when_settings_change(daemon, project):
+    assert _sync()[0] == 0
+    (project / "pyproject.toml").write_text("[tool.sour]\ngitignore = false\n")
+    assert _sync() == (None, "")
+    assert daemon.restart_requested
@@ -0,0 +1,33 @@
+import json
+
+from sour.deps import DependencyGraph
+
+
+def test_save_and_load_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / ".sour" / "deps.json"
+    graph = DependencyGraph()
+    graph.update(tmp_path / "a.md", [[tmp_path / "justfile"], None, []])
+    graph.save(path)
+
+    loaded = DependencyGraph.load(path)
+    assert loaded.files == [tmp_path.joinpath("a.md").relative_to(tmp_path)]
+    assert loaded.affected([tmp_path / "justfile"]) == {loaded.files[0]: {0}}
+    assert loaded.undeclared() == {loaded.files[0]: {1}}
+
+
+def test_save_only_writes_changes(tmp_path):
+    path = tmp_path / "deps.json"
+    graph = DependencyGraph()
+    graph.save(path)
+    assert not path.exists()
+    assert graph.update(tmp_path / "a.md", [[tmp_path / "justfile"]])
+    assert not graph.update(tmp_path / "a.md", [[tmp_path / "justfile"]])
+    graph.save(path)
+    assert json.loads(path.read_text())["files"] == {str(tmp_path / "a.md"): [[str(tmp_path / "justfile")]]}
+
+
+def test_load_ignores_other_versions(tmp_path):
+    path = tmp_path / "deps.json"
+    path.write_text(json.dumps({"version": "0.0.0", "files": {"/a.md": [[]]}}))
+    assert DependencyGraph.load(path).files == []
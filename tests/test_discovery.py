@@ -0,0 +1,77 @@
+import json
+import subprocess
+import sys
+
+import pytest
+from typer.testing import CliRunner
+
+from sour import registry
+from sour.config import load_config
+from sour.discovery import discover_extensions, entry_point_providers
+from sour.main import app
+
+
+@pytest.fixture(autouse=True)
+def restore_registry():
+    saved = dict(registry._PROVIDERS)
+    yield
+    registry._PROVIDERS.clear()
+    registry._PROVIDERS.update(saved)
+
+
+def test_entry_point_discovery_is_cached(tmp_path, monkeypatch):
+    calls = []
+
+    def entry_points(group):
+        calls.append(group)
+        return []
+
+    monkeypatch.setattr("importlib.metadata.entry_points", entry_points)
+    cache = tmp_path / "extensions.json"
+    assert entry_point_providers(cache) == {}
+    assert entry_point_providers(cache) == {}
+    assert calls == ["sour.extensions"]
+    assert json.loads(cache.read_text())["providers"] == {}
+
+
+def test_stale_discovery_cache_is_ignored(tmp_path):
+    cache = tmp_path / "extensions.json"
+    cache.write_text(json.dumps({"key": "stale", "providers": {"GONE": "gone"}}))
+    assert "GONE" not in entry_point_providers(cache)
+
+
+def test_pyproject_extensions_are_declared(tmp_path):
+    (tmp_path / "pyproject.toml").write_text('[tool.sour.extensions]\nHELLO = "scripts/ext.py"\nMOD = "pkg.mod:func"\n')
+    discover_extensions(load_config(tmp_path), None)
+    assert registry._PROVIDERS["HELLO"] == str(tmp_path / "scripts/ext.py")
+    assert registry._PROVIDERS["MOD"] == "pkg.mod:func"
+
+
+def test_cli_syncs_custom_extension(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "scripts").mkdir()
+    (tmp_path / "scripts" / "ext.py").write_text(
+        "from sour.registry import register_extension\n"
+        "@register_extension('GREET')\n"
+        "def greet(content, options, path):\n"
+        "    return 'Hello ' + options.get('name', 'World')\n"
+    )
+    (tmp_path / "pyproject.toml").write_text('[tool.sour.extensions]\nGREET = "scripts/ext.py"\n')
+    (tmp_path / "doc.md").write_text('<!-- docs GREET name="Sour" -->\n<!-- /docs -->\n')
+    result = CliRunner().invoke(app, ["sync", "--no-cache", "doc.md"])
+    assert result.exit_code == 0, result.output
+    assert "Hello Sour" in (tmp_path / "doc.md").read_text()
+
+
+def test_cli_import_is_lazy():
+    code = "import sys, sour.main; print(sorted(m for m in ('yaml', 'rich', 'asyncio', 'sour.extensions.just', 'sour.extensions.tree') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout  # noqa: S603
+    assert output.strip() == "[]"
+
+
+def test_package_import_loads_nothing_else():
+    # Startup is paid by every pre-commit run, even for `sour version`. Check what is
+    # imported rather than timing it: the CLI, rich and the extensions load on demand.
+    code = "import sys, sour; print(sorted(m for m in sys.modules if m.startswith(('sour.', 'rich', 'typer'))))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout  # noqa: S603
+    assert output.strip() == "[]"
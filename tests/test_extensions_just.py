@@ -1,5 +1,9 @@
+import os
+
 import pytest
-from sour.extensions.just import get_just_recipe
+
+from sour.extensions.just import get_just_recipe, load_justfile, parse_justfile
+
 
 @pytest.fixture
 def justfile_content(tmp_path):
@@ -43,3 +47,60 @@ def test_get_recipe_formats(justfile_content):
     recipe = get_just_recipe(justfile_content, "test", format_str="command")
     assert "Run tests" not in recipe
     assert "just test" in recipe
+
+def test_parse_justfile_index(tmp_path):
+    content = """set shell := ["bash", "-c"]
+FLAGS := "-v"
+
+[doc('Say hello')]
+[group('demo')]
+hello name="World" +rest:
+    echo "Hello {{name}}!"
+
+    echo done
+
+# Not part of the recipe above
+[private, group("demo")]
+@quiet: hello
+    true
+import 'common.just'
+mod sub
+"""
+    justfile = parse_justfile(content, tmp_path / "justfile")
+    assert list(justfile.recipes) == ["hello", "quiet"]
+
+    hello = justfile.recipes["hello"]
+    assert hello.parameters == ('name="World"', "+rest")
+    assert hello.doc == "Say hello"
+    assert hello.groups == ("demo",)
+    assert hello.body == 'echo "Hello {{name}}!"\n\necho done'
+    assert hello.code.startswith('hello name="World" +rest:\n')
+
+    quiet = justfile.recipes["quiet"]
+    assert quiet.attributes == ("private", "group")
+    assert quiet.doc is None
+    assert [r.name for r in justfile.group("demo")] == ["hello", "quiet"]
+    assert justfile.imports == (tmp_path / "common.just",)
+    assert justfile.modules == {"sub": tmp_path / "sub.just"}
+
+def test_recipe_lookup_follows_imports_and_modules(tmp_path):
+    (tmp_path / "justfile").write_text("import 'common.just'\nmod tools\n")
+    (tmp_path / "common.just").write_text("[doc('Shared')]\nshared:\n    echo shared\n")
+    (tmp_path / "tools").mkdir()
+    (tmp_path / "tools" / "mod.just").write_text("[doc('Tool')]\nlint:\n    ruff check\n")
+
+    justfile = load_justfile(tmp_path / "justfile")
+    assert justfile.recipe("shared").doc == "Shared"
+    assert justfile.recipe("tools::lint").body == "ruff check"
+    assert justfile.recipe("tools::missing") is None
+    assert "Tool" in get_just_recipe(tmp_path / "justfile", "tools::lint")
+
+def test_load_justfile_is_cached_until_modified(justfile_content):
+    first = load_justfile(justfile_content)
+    assert load_justfile(justfile_content) is first
+
+    justfile_content.write_text(justfile_content.read_text() + "\n[doc('New')]\nnew:\n    true\n")
+    os.utime(justfile_content, ns=(1, 1))
+    reloaded = load_justfile(justfile_content)
+    assert reloaded is not first
+    assert reloaded.recipe("new").doc == "New"
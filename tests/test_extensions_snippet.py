@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from sour.extensions import snippet
+from sour.extensions.snippet import get_snippet, load_source, snippet_extension, snippet_inputs
+
+SOURCE = """import os
+
+# sour:start setup
+def setup():
+    # sour:start inner
+    return os.getcwd()
+    # sour:end inner
+# sour:end setup
+
+# sour:start open
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "app.py"
+    path.write_text(SOURCE)
+    return path
+
+
+@pytest.mark.parametrize(
+    "lines, expected",
+    [
+        ("1", "import os\n"),
+        ("4-6", "def setup():\n    # sour:start inner\n    return os.getcwd()\n"),
+        ("10-", "# sour:start open\n"),
+        ("10-99", "# sour:start open\n"),
+        ("20-30", ""),
+        ("3-1", "<!-- Error: invalid line range '3-1' -->"),
+        ("x", "<!-- Error: invalid line range 'x' -->"),
+    ],
+)
+def test_get_snippet_lines(source, lines, expected):
+    assert get_snippet(source, lines=lines) == expected
+
+
+def test_get_snippet_marker(source):
+    assert get_snippet(source, marker="setup") == "def setup():\n    return os.getcwd()\n"
+    assert get_snippet(source, marker="inner") == "    return os.getcwd()\n"
+    assert "Marker 'open' not found" in get_snippet(source, marker="open")
+    assert "Marker 'missing' not found" in get_snippet(source, marker="missing")
+
+
+def test_get_snippet_missing_file(tmp_path):
+    assert "file not found" in get_snippet(tmp_path / "missing.py")
+
+
+def test_source_index_is_cached_until_the_file_changes(source, tmp_path):
+    index = load_source(source)
+    assert load_source(source) is index
+    assert load_source(tmp_path / "app.py") is index
+    source.write_text("changed\n")
+    assert load_source(source) is not index
+    assert get_snippet(source) == "changed\n"
+
+
+def test_source_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(snippet, "_SOURCES", {})
+    monkeypatch.setattr(snippet, "MAX_CACHED_SOURCES", 10)
+    for name in ("a", "b", "c"):
+        (tmp_path / name).write_text("1234\n")
+        load_source(tmp_path / name)
+    assert [os.path.basename(key) for key in snippet._SOURCES] == ["b", "c"]
+
+
+def test_empty_and_unterminated_files(tmp_path):
+    (tmp_path / "empty.txt").write_text("")
+    (tmp_path / "last.txt").write_text("a\nb")
+    assert get_snippet(tmp_path / "empty.txt") == ""
+    assert get_snippet(tmp_path / "last.txt", lines="2") == "b"
+
+
+def test_snippet_block(source, tmp_path):
+    doc = tmp_path / "doc.md"
+    assert snippet_extension("", {"path": "app.py", "marker": "inner"}, doc) == "```py\nreturn os.getcwd()\n```"
+    options = {"path": "app.py", "lines": "1", "lang": "python"}
+    assert snippet_extension("", options, doc) == "```python\nimport os\n```"
+    assert "'path' option required" in snippet_extension("", {}, doc)
+
+
+def test_snippet_that_looks_like_an_error_is_fenced(tmp_path):
+    (tmp_path / "notes.txt").write_text("<!-- Error: not really -->\n")
+    assert snippet_extension("", {"path": "notes.txt"}, tmp_path / "doc.md") == (
+        "```txt\n<!-- Error: not really -->\n```"
+    )
+    assert snippet_extension("", {"path": "missing.txt"}, tmp_path / "doc.md").startswith("<!-- Error: file not found")
+
+
+def test_snippet_inputs(tmp_path):
+    doc = tmp_path / "doc.md"
+    assert snippet_inputs({"path": "app.py"}, doc) == [tmp_path / "app.py"]
+    assert snippet_inputs({}, doc) == []
@@ -1,6 +1,21 @@
-import pytest
+import inspect
+import os
+import sys
 from pathlib import Path
-from sour.extensions.tree import generate_tree_content
+
+import pytest
+
+from sour import scan
+from sour.extensions.tree import (
+    ReadmeIndex,
+    exclude_matcher,
+    generate_tree_content,
+    read_frontmatter,
+    set_readme_index,
+    tree_inputs,
+)
+from sour.scan import set_index
+
 
 @pytest.fixture
 def temp_dir_structure(tmp_path):
@@ -43,3 +58,132 @@ def test_tree_exclude(temp_dir_structure):
     output = generate_tree_content(temp_dir_structure, {"exclude": "dir2"})
     assert "dir1" in output
     assert "dir2" not in output
+
+@pytest.fixture
+def described_structure(temp_dir_structure):
+    (temp_dir_structure / "dir1" / "README.md").write_text("---\ndescription: First dir\n---\n# Dir 1\n")
+    (temp_dir_structure / "dir1" / "subdir" / "README.md").write_text("---\ndescription: Deep dir\n---\n")
+    (temp_dir_structure / "dir2" / "README.md").write_text("# No frontmatter\n")
+    set_index(None)
+    set_readme_index(None)
+    yield temp_dir_structure
+    set_readme_index(None)
+
+def test_tree_descriptions(described_structure):
+    output = generate_tree_content(described_structure, {"depth": "2"})
+    assert "├── dir1 # First dir" in output
+    assert "subdir # Deep dir" in output
+    assert "dir2 #" not in output
+
+def test_tree_descriptions_limited_to_displayed_dirs(described_structure, monkeypatch):
+    looked_up = []
+    monkeypatch.setattr("sour.extensions.tree.parse_description", lambda readme: looked_up.append(readme.parent.name))
+    generate_tree_content(described_structure, {"depth": "1"})
+    assert sorted(looked_up) == ["dir1", "dir2"]
+
+def test_read_frontmatter_stops_at_closing_marker(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("---\ndescription: x\n---\n" + "body\n" * 1000)
+    assert read_frontmatter(readme) == "description: x\n"
+    readme.write_text("---\ndescription: x\n")
+    assert read_frontmatter(readme) is None
+
+def test_readme_index_persists_and_revalidates(described_structure, tmp_path):
+    store = tmp_path / "readmes.json"
+    index = ReadmeIndex(store)
+    assert index.description(described_structure / "dir1") == "First dir"
+    index.save()
+
+    readme = described_structure / "dir1" / "README.md"
+    readme.write_text("---\ndescription: Changed description\n---\n")
+    os.utime(readme, ns=(1, 1))
+    assert ReadmeIndex(store).description(described_structure / "dir1") == "Changed description"
+
+@pytest.mark.parametrize("pattern", ["*.py", "src", "src/*.py", "a/src", "*/b", "[ab]*", "?.md", "/abs/src", "x[!0-9]"])
+@pytest.mark.parametrize("path", ["src", "a/src", "a/src/m.py", "b", "x/b", "a.md", "abs/src", "/abs/src", "x1", "xy"])
+def test_exclude_matcher_agrees_with_path_match(pattern, path):
+    expected = Path(path).match(pattern) or Path(path).name == pattern
+    assert (exclude_matcher((pattern,)).search(path) is not None) == expected
+
+def test_tree_deeper_than_recursion_limit(tmp_path):
+    set_index(None)
+    deep = tmp_path
+    for _ in range(300):
+        deep = deep / "d"
+        deep.mkdir()
+    # Leave less headroom above the current stack than the tree is deep
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(inspect.stack()) + 150)
+    try:
+        content = generate_tree_content(tmp_path, {"depth": "400", "add_docs": "false"})
+    finally:
+        sys.setrecursionlimit(limit)
+    assert content.count("d") == 300
+
+def test_tree_lists_each_directory_once(temp_dir_structure, monkeypatch):
+    set_index(None)
+    calls = []
+    scandir = os.scandir
+    monkeypatch.setattr(scan.os, "scandir", lambda path: calls.append(os.path.abspath(path)) or scandir(path))
+    generate_tree_content(temp_dir_structure, {"depth": "3"})
+    assert len(calls) == len(set(calls))
+
+@pytest.fixture
+def wide_structure(tmp_path):
+    (tmp_path / "data" / "nested").mkdir(parents=True)
+    for i in range(50):
+        (tmp_path / "data" / f"f{i:02}.csv").touch()
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "main.py").touch()
+    set_index(None)
+    return tmp_path
+
+def test_tree_max_per_dir_summarizes_the_rest(wide_structure):
+    output = generate_tree_content(wide_structure, {"depth": "2", "max_per_dir": "3", "add_docs": "false"})
+    assert output.splitlines() == [
+        ".",
+        "├── data",
+        "│   ├── nested",
+        "│   ├── f00.csv",
+        "│   ├── f01.csv",
+        "│   └── … 48 more files",
+        "└── src",
+        "    └── main.py",
+    ]
+
+def test_tree_max_entries_closes_open_directories(wide_structure):
+    output = generate_tree_content(wide_structure, {"depth": "2", "max_entries": "3", "add_docs": "false"})
+    assert output.splitlines() == [
+        ".",
+        "├── data",
+        "│   ├── nested",
+        "│   ├── f00.csv",
+        "│   └── … 49 more files",
+        "└── … 1 more directory",
+    ]
+
+def test_tree_limits_without_summary(wide_structure):
+    output = generate_tree_content(
+        wide_structure, {"depth": "2", "max_per_dir": "2", "summary": "false", "add_docs": "false"}
+    )
+    assert "more" not in output
+    assert len(output.splitlines()) == 1 + 2 + 2 + 1
+
+def test_tree_max_entries_stops_listing(wide_structure, monkeypatch):
+    calls = []
+    scandir = os.scandir
+    monkeypatch.setattr(scan.os, "scandir", lambda path: calls.append(os.path.basename(path)) or scandir(path))
+    generate_tree_content(wide_structure, {"depth": "3", "max_entries": "1", "add_docs": "false"})
+    assert "src" not in calls
+    assert "nested" not in calls
+
+def test_tree_inputs_follow_limits(wide_structure):
+    inputs = tree_inputs({"depth": "3", "max_entries": "1", "add_docs": "false"}, wide_structure / "doc.md")
+    assert [path for path in inputs if path.name != ".gitignore"] == [wide_structure, wide_structure / "data"]
+    # The rules filtering every displayed listing count as inputs too
+    assert wide_structure / "data" / ".gitignore" in inputs
+    assert inputs.index(Path(os.path.abspath(wide_structure), ".gitignore")) > 0
+
+def test_tree_rejects_negative_limits(wide_structure):
+    with pytest.raises(ValueError):
+        generate_tree_content(wide_structure, {"max_entries": "-1"})
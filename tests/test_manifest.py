@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+import sour.extensions.just  # noqa: F401
+from sour import manifest as manifest_module
+from sour.config import load_config
+from sour.manifest import Manifest
+from sour.registry import register_extension
+from sour.runner import SyncSettings, sync_files
+from sour.scan import ScanIndex, set_index
+
+DOC = '<!-- docs JUST recipe="hello" format="docs" -->\n<!-- /docs -->\n<!-- docs TREE path="src" -->\n<!-- /docs -->\n'
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest_module, "RACY_WINDOW_NS", 0)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "justfile").write_text("[doc('Say hello')]\nhello:\n    echo hi\n")
+    (tmp_path / "doc.md").write_text(DOC)
+    set_index(None)
+    yield tmp_path
+    set_index(None)
+
+
+def _sync(project):
+    # A fresh scan index per run, as the CLI does
+    set_index(ScanIndex.from_config(load_config(project)))
+    manifest = Manifest(project / ".sour" / "manifest.json")
+    results = sync_files([project / "doc.md"], SyncSettings(cache_dir=None), manifest=manifest)
+    manifest.save()
+    return results[0]
+
+
+def test_second_run_skips_unchanged_file(project):
+    assert _sync(project).changed
+    result = _sync(project)
+    assert result.skipped
+    assert not result.changed
+
+
+def test_edited_file_is_processed(project):
+    _sync(project)
+    (project / "doc.md").write_text(DOC)
+    result = _sync(project)
+    assert not result.skipped
+    assert result.changed
+
+
+def test_changed_input_is_processed(project):
+    _sync(project)
+    (project / "justfile").write_text("[doc('Say goodbye')]\nhello:\n    echo bye\n")
+    result = _sync(project)
+    assert not result.skipped
+    assert "Say goodbye" in (project / "doc.md").read_text()
+
+
+def test_recipe_edited_in_nested_import_is_processed(project):
+    (project / "justfile").write_text("import 'common.just'\n")
+    (project / "common.just").write_text("import 'nested.just'\n")
+    (project / "nested.just").write_text("[doc('Say hello')]\nhello:\n    echo hi\n")
+    _sync(project)
+    assert _sync(project).skipped
+    (project / "nested.just").write_text("[doc('Say goodbye')]\nhello:\n    echo bye\n")
+    result = _sync(project)
+    assert not result.skipped
+    assert "Say goodbye" in (project / "doc.md").read_text()
+
+
+def test_new_file_in_tree_directory_is_processed(project):
+    _sync(project)
+    (project / "src" / "new.py").touch()
+    result = _sync(project)
+    assert not result.skipped
+    assert "new.py" in (project / "doc.md").read_text()
+
+
+def test_gitignore_edited_in_place_is_processed(project):
+    (project / "src" / "kept.py").touch()
+    (project / "src" / "dropped.py").touch()
+    (project / ".gitignore").write_text("*.log\n")
+    _sync(project)
+    listing = os.stat(project / "src").st_mtime_ns
+    (project / ".gitignore").write_text("dropped.py\n")
+    assert os.stat(project / "src").st_mtime_ns == listing
+    result = _sync(project)
+    assert not result.skipped
+    assert "dropped.py" not in (project / "doc.md").read_text()
+    assert "kept.py" in (project / "doc.md").read_text()
+
+
+def test_changed_ignore_settings_are_processed(project):
+    (project / "src" / "build").mkdir()
+    (project / "pyproject.toml").write_text("[tool.sour]\n")
+    _sync(project)
+    assert "build" in (project / "doc.md").read_text()
+    (project / "pyproject.toml").write_text('[tool.sour]\nextra_prune = ["build"]\n')
+    result = _sync(project)
+    assert not result.skipped
+    assert "build" not in (project / "doc.md").read_text()
+
+
+def test_blocks_without_declared_inputs_are_not_recorded(project):
+    register_extension("NO_INPUTS")(lambda content, options, file_path: "x")
+    (project / "doc.md").write_text("<!-- docs NO_INPUTS -->\n<!-- /docs -->\n")
+    _sync(project)
+    assert not _sync(project).skipped
+
+
+def test_racy_entry_is_verified_by_content(project, monkeypatch):
+    monkeypatch.setattr(manifest_module, "RACY_WINDOW_NS", 10**17)
+    for input_path in (project / "justfile", project / "src"):
+        os.utime(input_path, ns=(10**18, 10**18))
+    path = project / "doc.md"
+    _sync(project)
+    manifest = Manifest(project / ".sour" / "manifest.json")
+    assert manifest.is_fresh(path)
+
+    # Same size and mtime, different content: only the hash can tell
+    stat = path.stat()
+    content = path.read_text()
+    path.write_text(content.replace("Say hello", "Say jello"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not manifest.is_fresh(path)
+
+
+def test_manifest_from_other_version_is_ignored(project):
+    _sync(project)
+    store = project / ".sour" / "manifest.json"
+    store.write_text(store.read_text().replace(manifest_module.__version__, "0.0.0-other"))
+    assert Manifest(store).entries == {}
+
+
+def test_skipped_files_fill_the_dependency_graph(project, monkeypatch):
+    from sour.deps import DependencyGraph
+    from sour.runner import stream_sync
+
+    monkeypatch.chdir(project)
+    _sync(project)
+    graph = DependencyGraph()
+    manifest = Manifest(project / ".sour" / "manifest.json")
+    [result] = stream_sync([project / "doc.md"], SyncSettings(cache_dir=None), manifest=manifest, dependencies=graph)
+    assert result.skipped
+    assert graph.affected([project / "justfile"]) == {project.joinpath("doc.md").relative_to(project): {0}}
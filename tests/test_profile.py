@@ -0,0 +1,102 @@
+import json
+from contextlib import contextmanager
+
+from typer.testing import CliRunner
+
+from sour.main import app
+from sour.profile import Span, profiling, span, summarize, write_trace
+from sour.registry import add_extension_hook, register_extension, remove_extension_hook
+from sour.runner import SyncSettings, sync_file
+
+
+def _span(name, category, wall_ms, **args):
+    return Span(name, category, 0, int(wall_ms * 1e6), 0, 0, 0, 1, 1, args)
+
+
+def test_span_is_a_no_op_without_profiler():
+    with span("parse", "parse"):
+        pass
+
+
+def test_profiling_records_spans():
+    with profiling() as profiler, span("parse", "parse", {"file": "a.md"}):
+        sum(range(1000))
+    (recorded,) = profiler.spans
+    assert (recorded.name, recorded.category, recorded.args) == ("parse", "parse", {"file": "a.md"})
+    assert recorded.wall_ns > 0
+    with span("parse", "parse"):
+        pass
+    assert len(profiler.spans) == 1
+
+
+def test_sync_file_profiles_custom_extensions(tmp_path):
+    register_extension("PROFILED_TEST")(lambda content, options, file_path: "body")
+    path = tmp_path / "doc.md"
+    path.write_text('<!-- docs PROFILED_TEST name="x" -->\n<!-- /docs -->\n')
+    result = sync_file(path, SyncSettings(cache_dir=None, profile=True))
+    categories = [s.category for s in result.spans]
+    assert categories == ["read", "parse", "extension", "write", "file"]
+    extension = result.spans[2]
+    assert extension.name == "PROFILED_TEST"
+    assert extension.args == {"file": str(path), "options": 'name="x"'}
+
+
+def test_sync_file_without_profile_records_nothing(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("# Nothing\n")
+    assert sync_file(path, SyncSettings(cache_dir=None)).spans == []
+
+
+def test_extension_hooks_wrap_calls(tmp_path):
+    calls = []
+
+    @contextmanager
+    def hook(info, options, file_path):
+        calls.append(("enter", info.name))
+        yield
+        calls.append(("exit", info.name))
+
+    register_extension("HOOKED_TEST")(lambda content, options, file_path: calls.append(("call", "")) or "body")
+    path = tmp_path / "doc.md"
+    path.write_text("<!-- docs HOOKED_TEST -->\n<!-- /docs -->\n")
+    add_extension_hook(hook)
+    try:
+        sync_file(path, SyncSettings(cache_dir=None))
+    finally:
+        remove_extension_hook(hook)
+    assert calls == [("enter", "HOOKED_TEST"), ("call", ""), ("exit", "HOOKED_TEST")]
+
+
+def test_summarize():
+    spans = [
+        _span("a.md", "file", 30),
+        _span("b.md", "file", 10),
+        _span("TREE", "extension", 25, file="a.md", options='path="."'),
+        _span("JUST", "extension", 5, file="b.md", options='recipe="test"'),
+    ]
+    lines = summarize(spans, top=1)
+    assert lines[1].startswith("file ")
+    assert lines[2].startswith("extension TREE")
+    assert "Slowest files:" in lines
+    assert any("a.md" in line for line in lines)
+    assert not any("b.md" in line for line in lines)
+    assert any('TREE path="." in a.md' in line for line in lines)
+
+
+def test_write_trace(tmp_path):
+    output = tmp_path / "trace.json"
+    write_trace([_span("parse", "parse", 2, file="a.md")], output)
+    (event,) = json.loads(output.read_text())["traceEvents"]
+    assert event["ph"] == "X"
+    assert event["dur"] == 2000
+    assert event["args"]["file"] == "a.md"
+
+
+def test_cli_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.md").write_text('<!-- docs TREE path="." -->\n<!-- /docs -->\n')
+    result = CliRunner().invoke(app, ["sync", "--no-cache", "--profile", "--profile-output", "trace.json"])
+    assert result.exit_code == 0, result.output
+    assert "Slowest files:" in result.output
+    categories = {event["cat"] for event in json.loads((tmp_path / "trace.json").read_text())["traceEvents"]}
+    assert {"discovery", "file", "read", "parse", "extension", "write"} <= categories
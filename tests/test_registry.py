@@ -1,10 +1,15 @@
 import pytest
-from sour.registry import register_extension, get_extension, clear_registry
+from sour import registry
+from sour.registry import register_extension, get_extension, get_extension_info, clear_registry, declare_extension
 
 @pytest.fixture(autouse=True)
 def clean_registry():
+    saved = dict(registry._EXTENSIONS), dict(registry._PROVIDERS)
     clear_registry()
     yield
+    clear_registry()
+    registry._EXTENSIONS.update(saved[0])
+    registry._PROVIDERS.update(saved[1])
 
 def test_register_extension():
     @register_extension("TEST")
@@ -30,3 +35,43 @@ def test_register_duplicate_extension():
         return "2"
     
     assert get_extension("TEST") is test_func2
+
+def test_register_extension_metadata():
+    def fingerprint(options, path):
+        return "digest"
+
+    @register_extension("TEST", version="2", fingerprint=fingerprint)
+    def test_func(content, options, path):
+        return "result"
+
+    info = get_extension_info("TEST")
+    assert info.func is test_func
+    assert info.version == "2"
+    assert info.fingerprint is fingerprint
+
+def test_declared_extension_is_imported_on_first_use(tmp_path):
+    module = tmp_path / "hello_ext.py"
+    module.write_text(
+        "from sour.registry import register_extension\n"
+        "@register_extension('HELLO')\n"
+        "def hello(content, options, path):\n"
+        "    return 'hi'\n"
+    )
+    declare_extension("HELLO", str(module))
+    assert "HELLO" not in registry._EXTENSIONS
+    assert get_extension("HELLO")("", {}, tmp_path) == "hi"
+
+def test_declared_function_provider(tmp_path, monkeypatch):
+    (tmp_path / "plain_ext.py").write_text("def shout(content, options, path):\n    return content.upper()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    declare_extension("SHOUT", "plain_ext:shout")
+    assert get_extension("SHOUT")("hey", {}, tmp_path) == "HEY"
+
+def test_broken_provider_raises_key_error():
+    declare_extension("BROKEN", "sour_no_such_module")
+    with pytest.raises(KeyError, match="could not be loaded"):
+        get_extension_info("BROKEN")
+
+def test_builtins_are_declared_lazily():
+    assert registry.BUILTIN_PROVIDERS["TREE"] == "sour.extensions.tree"
+    assert registry.BUILTIN_PROVIDERS["JUST"] == "sour.extensions.just"
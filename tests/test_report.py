@@ -0,0 +1,57 @@
+import io
+import json
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from sour.main import app
+from sour.report import OutputFormat, Reporter
+
+BLOCK = '<!-- docs TREE path="." -->\nstale\n<!-- /docs -->\n'
+
+
+def test_reporter_batches_records():
+    stream = io.StringIO()
+    reporter = Reporter("sync", OutputFormat.JSONL, stream, batch_size=2)
+    reporter.file(Path("a.md"), "updated")
+    assert stream.getvalue() == ""
+    reporter.file(Path("b.md"), "unchanged", ["Unknown extension 'X' in b.md"])
+    assert len(stream.getvalue().splitlines()) == 2
+    reporter.summary(processed=3, modified=1)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0] == {"type": "file", "path": "a.md", "action": "updated", "warnings": []}
+    assert records[1]["warnings"] == ["Unknown extension 'X' in b.md"]
+    assert records[2]["type"] == "summary"
+    assert records[2]["command"] == "sync"
+    assert records[2]["processed"] == 3
+    assert "seconds" in records[2]
+
+
+def test_reporter_text():
+    stream = io.StringIO()
+    reporter = Reporter("clear", OutputFormat.TEXT, stream)
+    reporter.file(Path("a.md"), "cleared")
+    reporter.error("Path not found: b.md")
+    reporter.summary(processed=1, modified=1)
+    lines = stream.getvalue().splitlines()
+    assert lines[:2] == ["cleared a.md", "error: Path not found: b.md"]
+    assert lines[2].startswith("clear: processed=1 modified=1 seconds=")
+
+
+def test_cli_jsonl_reports_changed_files_only(tmp_path):
+    (tmp_path / "stale.md").write_text(BLOCK)
+    (tmp_path / "plain.md").write_text("# No blocks\n")
+    runner = CliRunner()
+
+    result = runner.invoke(app, ["sync", "--check", "--no-cache", "--no-daemon", "--format", "jsonl", str(tmp_path)])
+    assert result.exit_code == 1
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [(r["type"], r.get("action")) for r in records] == [("file", "would-update"), ("summary", None)]
+    assert records[1]["processed"] == 2
+    assert records[1]["modified"] == 1
+
+    result = runner.invoke(app, ["clear", "--quiet", str(tmp_path)])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0] == f"cleared {tmp_path / 'stale.md'}"
+    assert result.output.splitlines()[1].startswith("clear: processed=2 modified=1")
@@ -0,0 +1,302 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from typer.testing import CliRunner
+
+from sour.main import app, discover_files
+from sour.registry import register_extension
+from sour.runner import (
+    SyncSettings,
+    clear_file,
+    clear_worker,
+    run_files,
+    stream_sync,
+    sync_file,
+    sync_files,
+    sync_worker,
+)
+
+BLOCK = '<!-- docs TREE path="." -->\nstale\n<!-- /docs -->\n'
+
+
+@pytest.fixture
+def docs(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(BLOCK if i % 2 else "# No blocks\n")
+        paths.append(path)
+    return paths
+
+
+def test_sync_file_writes_changes(docs):
+    result = sync_file(docs[1], SyncSettings(cache_dir=None))
+    assert result.changed
+    assert "stale" not in docs[1].read_text()
+
+
+def test_sync_file_check_does_not_write(docs):
+    result = sync_file(docs[1], SyncSettings(check=True, cache_dir=None))
+    assert result.changed
+    assert docs[1].read_text() == BLOCK
+
+
+def test_sync_file_collects_unknown_extension_warning(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("<!-- docs MISSING -->\n<!-- /docs -->\n")
+    result = sync_file(path, SyncSettings(cache_dir=None))
+    assert result.warnings == [f"Unknown extension 'MISSING' in {path}"]
+
+
+def test_clear_file(docs):
+    sync_file(docs[1], SyncSettings(cache_dir=None))
+    assert clear_file(docs[1], check=False).changed
+    assert docs[1].read_text() == '<!-- docs TREE path="." -->\n\n<!-- /docs -->\n'
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_run_files_preserves_order(docs, executor):
+    results = run_files(sync_worker(SyncSettings(check=True, cache_dir=None)), docs, jobs=3, executor=executor)
+    assert [r.path for r in results] == docs
+    assert [r.changed for r in results] == [False, True] * 3
+
+
+def test_run_files_in_process(docs):
+    results = run_files(clear_worker(True), docs, jobs=1)
+    assert [r.path for r in results] == docs
+
+
+def test_run_files_rejects_unknown_executor(docs):
+    with pytest.raises(ValueError):
+        run_files(clear_worker(True), docs, jobs=2, executor="fiber")
+
+
+def test_thread_executor_sees_custom_extensions(tmp_path):
+    register_extension("RUNNER_TEST")(lambda content, options, file_path: "custom")
+    paths = [tmp_path / "a.md", tmp_path / "b.md"]
+    for path in paths:
+        path.write_text("<!-- docs RUNNER_TEST -->\n<!-- /docs -->\n")
+    results = run_files(sync_worker(SyncSettings(cache_dir=None)), paths, jobs=2, executor="thread")
+    assert all(r.changed for r in results)
+    assert all("custom" in path.read_text() for path in paths)
+
+
+def test_cli_parallel_check_matches_serial(docs, tmp_path):
+    runner = CliRunner()
+    serial = runner.invoke(app, ["sync", "--check", "--no-cache", str(tmp_path)])
+    parallel = runner.invoke(app, ["sync", "--check", "--no-cache", "--jobs", "3", str(tmp_path)])
+    assert serial.exit_code == parallel.exit_code == 1
+    assert serial.output == parallel.output
+
+
+def test_async_extension_renders(tmp_path):
+    async def greet(content, options, file_path):
+        await asyncio.sleep(0)
+        return f"Hello {options['name']}"
+
+    register_extension("ASYNC_TEST")(greet)
+    path = tmp_path / "doc.md"
+    path.write_text('<!-- docs ASYNC_TEST name="Sour" -->\n<!-- /docs -->\n')
+    assert sync_file(path, SyncSettings(cache_dir=None)).changed
+    assert "Hello Sour" in path.read_text()
+
+
+def test_concurrent_blocks_overlap(tmp_path):
+    async def slow(content, options, file_path):
+        await asyncio.sleep(0.2)
+        return options["n"]
+
+    register_extension("SLOW_TEST")(slow)
+    register_extension("SLOW_SYNC_TEST")(lambda content, options, file_path: time.sleep(0.2) or options["n"])
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(
+            f'<!-- docs SLOW_TEST n="{i}a" -->\n<!-- /docs -->\n'
+            f'<!-- docs SLOW_SYNC_TEST n="{i}b" -->\n<!-- /docs -->\n'
+            "<!-- docs MISSING -->\n<!-- /docs -->\n"
+        )
+        paths.append(path)
+
+    start = time.monotonic()
+    results = sync_files(paths, SyncSettings(cache_dir=None, concurrency=8))
+    assert time.monotonic() - start < 0.6
+    assert [r.path for r in results] == paths
+    assert all(r.warnings == [f"Unknown extension 'MISSING' in {r.path}"] for r in results)
+    for i, path in enumerate(paths):
+        text = path.read_text()
+        assert text.index(f"{i}a") < text.index(f"{i}b") < text.index("<!-- Error:")
+
+
+def test_concurrency_limit_is_respected(tmp_path):
+    running = peak = 0
+
+    async def tracked(content, options, file_path):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return "done"
+
+    register_extension("TRACKED_TEST")(tracked)
+    path = tmp_path / "doc.md"
+    path.write_text("<!-- docs TRACKED_TEST -->\n<!-- /docs -->\n" * 10)
+    sync_file(path, SyncSettings(cache_dir=None, concurrency=3))
+    assert peak == 3
+    assert path.read_text().count("done") == 10
+
+
+@pytest.mark.parametrize("concurrency", [1, 8])
+def test_identical_blocks_render_once_per_run(tmp_path, concurrency):
+    calls = []
+
+    def shared(content, options, file_path):
+        calls.append(file_path.name)
+        return "shared"
+
+    register_extension("SHARED_TEST", inputs=lambda options, file_path: [file_path.parent / "src"], pure=True)(shared)
+    register_extension("IMPURE_TEST", inputs=lambda options, file_path: [file_path.parent / "src"])(shared)
+    paths = []
+    for name in ("README.md", "AGENTS.md", "CLAUDE.md"):
+        path = tmp_path / name
+        path.write_text("<!-- docs SHARED_TEST -->\n<!-- /docs -->\n<!-- docs IMPURE_TEST -->\n<!-- /docs -->\n")
+        paths.append(path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "README.md").write_text("<!-- docs SHARED_TEST -->\n<!-- /docs -->\n")
+    paths.append(tmp_path / "sub" / "README.md")
+
+    results = sync_files(paths, SyncSettings(cache_dir=None, concurrency=concurrency))
+    assert all(path.read_text().count("shared") == 2 - (path.parent.name == "sub") for path in paths)
+    # One pure call per distinct directory, one impure call per block
+    assert len(calls) == 2 + 3
+    assert sum(r.reused for r in results) == 2
+
+    sync_files(paths, SyncSettings(cache_dir=None, concurrency=concurrency))
+    assert len(calls) == 2 * (2 + 3)  # nothing is shared between runs
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_slow_block_keeps_previous_body(tmp_path, concurrency):
+    release = threading.Event()
+
+    def slow(content, options, file_path):
+        release.wait(1)
+        return "late"
+
+    async def slow_async(content, options, file_path):
+        await asyncio.sleep(1)
+        return "late"
+
+    register_extension("SLOW_TEST")(slow)
+    register_extension("SLOW_ASYNC_TEST")(slow_async)
+    register_extension("FAST_TEST")(lambda content, options, file_path: "fast")
+    path = tmp_path / "doc.md"
+    path.write_text(
+        '<!-- docs SLOW_TEST timeout="0.1" -->\nold\n<!-- /docs -->\n'
+        "<!-- docs SLOW_ASYNC_TEST -->\nold\n<!-- /docs -->\n"
+        "<!-- docs FAST_TEST -->\n<!-- /docs -->\n"
+    )
+    start = time.perf_counter()
+    settings = SyncSettings(cache_dir=None, concurrency=concurrency, timeout=10, timeouts={"SLOW_ASYNC_TEST": 0.1})
+    result = sync_file(path, settings)
+    assert time.perf_counter() - start < 1
+    assert path.read_text().count("old") == 2
+    assert "fast" in path.read_text()
+    assert len(result.warnings) == 2
+    assert all("timed out after 0.1s" in warning for warning in result.warnings)
+    release.set()  # let the abandoned thread finish
+
+
+def test_invalid_block_timeout_is_reported_inline(tmp_path):
+    register_extension("TIMEOUT_OPTION_TEST")(lambda content, options, file_path: "body")
+    path = tmp_path / "doc.md"
+    path.write_text('<!-- docs TIMEOUT_OPTION_TEST timeout="soon" -->\n<!-- /docs -->\n')
+    sync_file(path, SyncSettings(cache_dir=None))
+    assert "Error" in path.read_text()
+
+
+def test_streamed_body_is_written_and_compared_incrementally(tmp_path):
+    register_extension("CHUNKS_TEST")(lambda content, options, file_path: (f"line {i}\n" for i in range(1000)))
+    path = tmp_path / "doc.md"
+    path.write_text("intro\n<!-- docs CHUNKS_TEST -->\nold\n<!-- /docs -->\n<!-- docs MISSING -->\n<!-- /docs -->\n")
+    path.chmod(0o640)
+    lines = "\n".join(f"line {i}" for i in range(1000))
+    expected = (
+        f"intro\n<!-- docs CHUNKS_TEST -->\n\n{lines}\n\n<!-- /docs -->\n"
+        "<!-- docs MISSING -->\n\n<!-- Error: \"Extension 'MISSING' not found\" -->\n\n<!-- /docs -->\n"
+    )
+
+    assert sync_file(path, SyncSettings(check=True, cache_dir=None)).changed
+    assert "old" in path.read_text()
+    assert sync_file(path, SyncSettings(cache_dir=None)).changed
+    assert path.read_text() == expected
+    assert path.stat().st_mode & 0o777 == 0o640
+    mtime = path.stat().st_mtime_ns
+    result = sync_file(path, SyncSettings(cache_dir=None, track_blocks=True))
+    assert not result.changed
+    assert [b.status for b in result.blocks] == ["unchanged", "error"]
+    assert path.stat().st_mtime_ns == mtime
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_error_mid_stream_is_reported_inline(tmp_path):
+    def failing(content, options, file_path):
+        yield "partial output\n"
+        message = "stream broke"
+        raise RuntimeError(message)
+
+    register_extension("BROKEN_STREAM_TEST")(failing)
+    path = tmp_path / "doc.md"
+    path.write_text("<!-- docs BROKEN_STREAM_TEST -->\nold\n<!-- /docs -->\ntail\n")
+    result = sync_file(path, SyncSettings(cache_dir=None, track_blocks=True))
+    assert result.changed
+    assert [(b.status, b.error) for b in result.blocks] == [("error", "stream broke")]
+    assert (
+        path.read_text() == "<!-- docs BROKEN_STREAM_TEST -->\n\n<!-- Error: stream broke -->\n\n<!-- /docs -->\ntail\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "jobs, executor, concurrency", [(1, "thread", 1), (1, "thread", 4), (3, "thread", 1), (2, "process", 1)]
+)
+def test_stream_sync_keeps_input_order(docs, jobs, executor, concurrency):
+    settings = SyncSettings(check=True, cache_dir=None, concurrency=concurrency)
+    results = list(stream_sync(reversed(docs), settings, jobs, executor))
+    assert [r.path for r in results] == docs[::-1]
+    assert [r.changed for r in results] == [True, False] * 3
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_stream_sync_reads_ahead_boundedly(tmp_path, concurrency):
+    consumed = 0
+
+    def files():
+        nonlocal consumed
+        for i in range(500):
+            path = tmp_path / f"doc{i}.md"
+            path.write_text("# No blocks\n")
+            consumed += 1
+            yield path
+
+    threads = threading.active_count()
+    results = stream_sync(files(), SyncSettings(cache_dir=None, concurrency=concurrency), depth=4)
+    assert next(results).path.name == "doc0.md"
+    assert consumed < 100
+    results.close()
+    assert threading.active_count() == threads
+
+
+def test_stream_sync_raises_stage_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(stream_sync([tmp_path / "missing.md"], SyncSettings(cache_dir=None)))
+
+
+def test_discover_files_order(tmp_path):
+    for name in ("b.md", "a/z.md", "a.md", "a b.md", "notes.txt"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("")
+    files = list(discover_files([tmp_path, tmp_path / "b.md"]))
+    assert files == sorted(tmp_path / name for name in ("b.md", "a/z.md", "a.md", "a b.md"))
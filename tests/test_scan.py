@@ -0,0 +1,93 @@
+import pytest
+
+from sour.config import load_config
+from sour.scan import IgnoreRule, ScanIndex
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n/top.md\n!keep.log\n")
+    for rel in [
+        "README.md",
+        "top.md",
+        "docs/guide.md",
+        "docs/notes.qmd",
+        "docs/top.md",
+        "docs/debug.log",
+        "docs/keep.log",
+        "build/out.md",
+        "node_modules/pkg/README.md",
+        "sub/.gitignore",
+        "sub/a.md",
+        "sub/b.md",
+    ]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    (tmp_path / "sub" / ".gitignore").write_text("b.md\n")
+    return tmp_path
+
+
+def test_markdown_files_honor_gitignore_and_prune(repo):
+    index = ScanIndex()
+    found = [p.relative_to(repo).as_posix() for p in index.markdown_files(repo)]
+    assert found == ["README.md", "docs/guide.md", "docs/notes.qmd", "docs/top.md", "sub/a.md"]
+
+
+def test_negated_pattern(repo):
+    index = ScanIndex()
+    names = [e.name for e in index.visible(repo / "docs")]
+    assert "keep.log" in names
+    assert "debug.log" not in names
+
+
+def test_find_skips_pruned_directories(repo):
+    assert [p.relative_to(repo).as_posix() for p in ScanIndex().find(repo, "README.md")] == ["README.md"]
+    unpruned = ScanIndex(prune=())
+    assert len(list(unpruned.find(repo, "README.md"))) == 2
+
+
+def test_gitignore_can_be_disabled(repo):
+    found = {p.name for p in ScanIndex(gitignore=False).markdown_files(repo)}
+    assert {"out.md", "b.md", "top.md"} <= found
+
+
+def test_entries_are_memoized(repo):
+    index = ScanIndex()
+    first = index.entries(repo)
+    (repo / "new.md").touch()
+    assert index.entries(repo) is first
+    index.invalidate(repo)
+    assert "new.md" in [e.name for e in index.entries(repo)]
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "is_dir", "expected"),
+    [
+        ("*.py[cod]", "/r/a/b.pyc", False, True),
+        ("docs/*.md", "/r/docs/a.md", False, True),
+        ("docs/*.md", "/r/x/docs/a.md", False, False),
+        ("**/gen", "/r/a/b/gen", True, True),
+        ("out/", "/r/out", False, False),
+    ],
+)
+def test_ignore_rule_match(pattern, path, is_dir, expected):
+    rule = IgnoreRule.parse(pattern, "/r")
+    assert rule.match(path, is_dir) is expected
+
+
+def test_load_config(tmp_path):
+    (tmp_path / "pyproject.toml").write_text('[tool.sour]\nextra_prune = ["vendor"]\ngitignore = false\n')
+    config = load_config(tmp_path)
+    assert "vendor" in config.prune
+    assert ".git" in config.prune
+    assert config.gitignore is False
+    assert config.timeout is None
+
+
+def test_load_config_timeouts(tmp_path):
+    (tmp_path / "pyproject.toml").write_text("[tool.sour]\ntimeout = 30\n\n[tool.sour.timeouts]\nJUST = 5\n")
+    config = load_config(tmp_path)
+    assert config.timeout == 30.0
+    assert config.timeouts == {"JUST": 5.0}
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+
+import pytest
+
+import sour
+from sour.registry import register_extension
+from sour.session import Session
+
+BLOCK = '<!-- docs TREE path="docs" -->\nstale\n<!-- /docs -->\n'
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "README.md").write_text(BLOCK)
+    (tmp_path / "docs" / "guide.md").write_text("# Guide\n")
+    return tmp_path
+
+
+def test_check_reports_out_of_date_files_without_writing(project):
+    with Session(project) as session:
+        result = session.check()
+    assert result.changed == [project / "README.md"]
+    assert not result.ok
+    assert (project / "README.md").read_text() == BLOCK
+    readme = next(f for f in result.files if f.path == project / "README.md")
+    assert [(b.name, b.status) for b in readme.blocks] == [("TREE", "updated")]
+
+
+def test_sync_writes_then_check_is_clean(project):
+    with Session(project, cache=False) as session:
+        assert session.sync().changed == [project / "README.md"]
+        assert "guide.md" in (project / "README.md").read_text()
+        result = session.check()
+    assert result.ok
+    assert [b.status for f in result.files for b in f.blocks] == ["unchanged"]
+
+
+@pytest.mark.parametrize("watch", [False, True])
+def test_sync_sees_changes_between_runs(project, watch):
+    with Session(project, cache=False, watch=watch) as session:
+        session.sync(["README.md"])
+        (project / "docs" / "new.md").write_text("# New\n")
+        assert session.check(["README.md"]).changed == [project / "README.md"]
+
+
+def test_sync_reports_block_errors_and_missing_paths(project):
+    (project / "docs" / "guide.md").write_text("<!-- docs MISSING -->\n<!-- /docs -->\n")
+    with Session(project, cache=False) as session:
+        result = session.sync(["docs", "nope"])
+    assert result.errors == [f"Path not found: {project / 'nope'}"]
+    [(path, block)] = result.failed
+    assert path == project / "docs" / "guide.md"
+    assert block.status == "error"
+    assert "MISSING" in block.error
+
+
+def test_sync_reports_timeouts(project):
+    import threading
+
+    release = threading.Event()
+
+    @register_extension("SESSION_SLOW")
+    def slow(content, options, file_path):
+        release.wait(5)
+        return "late"
+
+    (project / "slow.md").write_text('<!-- docs SESSION_SLOW timeout="0.05" -->\nkept\n<!-- /docs -->\n')
+    try:
+        with Session(project, cache=False) as session:
+            result = session.sync(["slow.md"])
+    finally:
+        release.set()
+    [(_, block)] = result.failed
+    assert block.status == "timeout"
+    assert "kept" in (project / "slow.md").read_text()
+
+
+def test_render_block(project):
+    with Session(project, cache=False) as session:
+        body = session.render_block("TREE", {"path": "docs"})
+        assert "guide.md" in body
+        with pytest.raises(KeyError):
+            session.render_block("MISSING")
+
+
+def test_package_exports_are_lazy():
+    code = (
+        "import sys, sour; assert 'sour.session' not in sys.modules; sour.Session; assert 'sour.session' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
+    assert sour.register_extension is register_extension
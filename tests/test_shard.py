@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from sour.main import app
+from sour.shard import Shard, ShardReport, load_costs, merge_reports, partition, save_costs, split_digests
+
+BLOCK = '<!-- docs TREE path="." -->\nstale\n<!-- /docs -->\n'
+
+FILES = [Path(f"docs/page{i}.md") for i in range(40)]
+
+
+@pytest.mark.parametrize("spec", ["1", "0/3", "4/3", "a/b", "1/"])
+def test_shard_parse_rejects(spec):
+    with pytest.raises(ValueError):
+        Shard.parse(spec)
+
+
+def test_shard_parse():
+    assert Shard.parse("2/4") == Shard(2, 4)
+    assert str(Shard(2, 4)) == "2/4"
+
+
+@pytest.mark.parametrize("costs", [None, {"docs/page3.md": 5.0, "docs/page7.md": 0.5}])
+def test_partition_covers_every_file_once(costs):
+    shards = [partition(reversed(FILES), Shard(i, 3), costs) for i in (1, 2, 3)]
+    assert sorted(path for shard in shards for path in shard) == sorted(FILES)
+    assert all(shards)
+    assert partition(FILES, Shard(2, 3), costs) == shards[1]
+
+
+def test_partition_by_hash_is_stable_when_files_are_added():
+    before = partition(FILES, Shard(1, 4))
+    after = partition([*FILES, Path("docs/new.md")], Shard(1, 4))
+    assert set(before) <= set(after)
+
+
+def test_partition_balances_by_cost():
+    costs = {"docs/page0.md": 30.0, **{f"docs/page{i}.md": 1.0 for i in range(1, 40)}}
+    shards = [partition(FILES, Shard(i, 2), costs) for i in (1, 2)]
+    loads = sorted(sum(costs[path.as_posix()] for path in shard) for shard in shards)
+    assert loads == [34.0, 35.0]
+
+
+def test_merge_reports_requires_every_shard():
+    reports = [ShardReport(Shard(1, 3), True), ShardReport(Shard(3, 3), True), ShardReport(Shard(3, 3), True)]
+    with pytest.raises(ValueError, match="missing 2/3; repeated 3/3"):
+        merge_reports(reports)
+    with pytest.raises(ValueError, match="mix"):
+        merge_reports([ShardReport(Shard(1, 2), True), ShardReport(Shard(2, 2), False)])
+
+
+def test_merge_reports_requires_the_same_split():
+    digests = split_digests(FILES)
+    reports = [ShardReport(Shard(1, 2), True, digests=digests), ShardReport(Shard(2, 2), True, digests=digests)]
+    assert merge_reports(reports).shard is None
+    reports[1].digests = split_digests(FILES, {"docs/page3.md": 5.0})
+    with pytest.raises(ValueError, match="split different costs"):
+        merge_reports(reports)
+    reports[1].digests = split_digests(FILES[1:])
+    with pytest.raises(ValueError, match="split different files"):
+        merge_reports(reports)
+
+
+def test_cli_merge_rejects_shards_balanced_by_other_costs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for i in range(4):
+        (tmp_path / f"doc{i}.md").write_text(BLOCK)
+    save_costs({"doc0.md": 3.0}, tmp_path / "stale.json")
+    runner = CliRunner()
+    for i, costs in ((1, "missing.json"), (2, "stale.json")):
+        args = ["--shard", f"{i}/2", "--costs", costs, "--report", f"{i}.json"]
+        runner.invoke(app, ["sync", "--check", "--no-cache", "--no-daemon", *args])
+    merged = runner.invoke(app, ["merge-reports", "1.json", "2.json"])
+    assert merged.exit_code == 1
+    assert "split different costs" in merged.output
+
+
+def test_cli_sharded_check_merges_to_the_serial_result(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for i in range(6):
+        (tmp_path / f"doc{i}.md").write_text(BLOCK if i % 2 else "# No blocks\n")
+    runner = CliRunner()
+    serial = runner.invoke(app, ["sync", "--check", "--no-cache", "--no-daemon"])
+
+    reports = []
+    for i in (1, 2, 3):
+        report = tmp_path / "reports" / f"{i}.json"
+        result = runner.invoke(
+            app, ["sync", "--check", "--no-cache", "--no-daemon", "--shard", f"{i}/3", "--report", str(report)]
+        )
+        assert result.exit_code in (0, 1)
+        reports.append(str(report))
+
+    merged = runner.invoke(app, ["merge-reports", *reports, "--write-costs", "costs.json"])
+    assert merged.exit_code == serial.exit_code == 1
+    assert merged.output == serial.output
+    assert set(load_costs(tmp_path / "costs.json")) == {f"doc{i}.md" for i in range(6)}
+
+    records = [
+        json.loads(line)
+        for line in runner.invoke(app, ["merge-reports", "--format", "jsonl", *reports]).output.splitlines()
+    ]
+    assert records[-1]["processed"] == 6
+    assert records[-1]["shards"] == 3
+
+    incomplete = runner.invoke(app, ["merge-reports", *reports[:2]])
+    assert incomplete.exit_code == 1
+    assert "missing 3/3" in incomplete.output
+
+
+def test_cli_rejects_bad_shard(tmp_path):
+    result = CliRunner().invoke(app, ["sync", "--no-daemon", "--shard", "3/2", str(tmp_path)])
+    assert result.exit_code == 2
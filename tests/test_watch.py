@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import sour.extensions.just  # noqa: F401
+from sour.extensions.tree import set_readme_index
+from sour.registry import register_extension
+from sour.runner import SyncSettings
+from sour.scan import set_index
+from sour.watch import DependencyGraph, InotifyWatcher, PollingWatcher, WatchSession, create_watcher
+
+TREE_DOC = '<!-- docs TREE path="src" -->\n<!-- /docs -->\n'
+JUST_DOC = '<!-- docs JUST recipe="hello" format="docs" -->\n<!-- /docs -->\n'
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").touch()
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "tree.md").write_text(TREE_DOC.replace('"src"', '"../src"'))
+    (tmp_path / "docs" / "justfile").write_text("[doc('Say hello')]\nhello:\n    echo hi\n")
+    (tmp_path / "docs" / "just.md").write_text(JUST_DOC)
+    set_index(None)
+    set_readme_index(None)
+    yield tmp_path
+    set_index(None)
+    set_readme_index(None)
+
+
+def test_dependency_graph_affected(tmp_path):
+    graph = DependencyGraph()
+    graph.update(tmp_path / "a.md", [[tmp_path / "justfile"], [tmp_path / "src"]])
+    assert graph.affected([tmp_path / "justfile"]) == {tmp_path / "a.md": {0}}
+    assert graph.affected([tmp_path / "src" / "new.py"]) == {tmp_path / "a.md": {1}}
+    assert graph.affected([tmp_path / "other"]) == {}
+    graph.remove(tmp_path / "a.md")
+    assert graph.affected([tmp_path / "justfile"]) == {}
+
+
+def _session(project, watcher):
+    return WatchSession([project / "docs"], SyncSettings(cache_dir=None), watcher)
+
+
+def test_session_rerenders_affected_blocks_only(project):
+    session = _session(project, PollingWatcher())
+    assert [r.path.name for r in session.start()] == ["just.md", "tree.md"]
+    assert "a.py" in (project / "docs" / "tree.md").read_text()
+
+    (project / "src" / "b.py").touch()
+    results = session.handle({project / "src" / "b.py"})
+    assert [r.path.name for r in results] == ["tree.md"]
+    assert "b.py" in (project / "docs" / "tree.md").read_text()
+
+    (project / "docs" / "justfile").write_text("[doc('Say goodbye')]\nhello:\n    echo bye\n")
+    results = session.handle({project / "docs" / "justfile"})
+    assert [r.path.name for r in results] == ["just.md"]
+    assert "Say goodbye" in (project / "docs" / "just.md").read_text()
+
+
+def test_session_picks_up_edited_and_new_markdown(project):
+    session = _session(project, PollingWatcher())
+    session.start()
+
+    new = project / "docs" / "new.md"
+    new.write_text(JUST_DOC)
+    results = session.handle({new})
+    assert [r.path for r in results] == [new]
+    assert "Say hello" in new.read_text()
+
+    # The session's own write is not processed again
+    assert session.handle({new}) == []
+
+
+def test_session_rerenders_blocks_without_declared_inputs_on_any_change(project):
+    state = {"calls": 0}
+
+    def counter(content, options, file_path):
+        state["calls"] += 1
+        return str(state["calls"])
+
+    register_extension("WATCH_COUNTER_TEST")(counter)
+    doc = project / "docs" / "counter.md"
+    doc.write_text("<!-- docs WATCH_COUNTER_TEST -->\n<!-- /docs -->\n")
+    session = _session(project, PollingWatcher())
+    session.start()
+
+    (project / "src" / "b.py").touch()
+    results = session.handle({project / "src" / "b.py"})
+    assert "counter.md" in [r.path.name for r in results]
+    assert "\n2\n" in doc.read_text()
+
+    # The session's own write is not a change to re-render for
+    assert session.handle({doc}) == []
+
+
+def test_polling_watcher_reports_changes(tmp_path):
+    watcher = PollingWatcher(interval=0.01)
+    watcher.watch([tmp_path])
+    assert watcher.poll(0.01) == set()
+    (tmp_path / "new.md").touch()
+    assert watcher.poll(1.0) == {tmp_path / "new.md"}
+
+
+def test_inotify_watcher_reports_changes(tmp_path):
+    watcher = create_watcher()
+    if not isinstance(watcher, InotifyWatcher):
+        pytest.skip("inotify not available")
+    try:
+        watcher.watch([tmp_path])
+        start = time.monotonic()
+        (tmp_path / "new.md").write_text("x")
+        assert tmp_path / "new.md" in watcher.poll(1.0)
+        assert time.monotonic() - start < 0.5
+    finally:
+        watcher.close()